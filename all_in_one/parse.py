@@ -1,17 +1,29 @@
-import csv
+from __future__ import annotations
+
 import os
-from dataclasses import dataclass, fields, astuple
-from typing import List
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Collection, Dict, List, Optional, Tuple
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
+from common.changefeed import CHANGEFEED, publish as publish_changes
+from common.failures import FAILURES, gather_with_retries
+from common.fetch import AsyncFetcher, run_sync
+from common.identity import ProductCache, parse_unknown, product_key
+from common.normalize import extract_records, reporting_run
+from common.output import OUTPUT_FORMAT, write_items
+from common.soup import Region, make_soup
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
 
-BASE_URL = "https://webscraper.io/"
+BASE_URL = os.environ.get("WEBSCRAPER_BASE_URL", "https://webscraper.io/")
 HOME_URL = urljoin(BASE_URL, "test-sites/e-commerce/static/")
 DATA_PATH = "all_in_one/products/"
+COMBINED_PAGE = "all_products"  # every product once, across categories
 
+# Only these subtrees are built into the soup
+PARSE_REGION = Region(class_="thumbnail")
 
 PAGES = {
     "home": HOME_URL,
@@ -30,47 +42,112 @@ class Product:
     num_of_reviews: int
 
 
-PRODUCT_FIELDS = [field.name for field in fields(Product)]
+ProductEntry = Tuple[str, Optional[Product]]  # key, None when already known
+
+PRODUCT_SCHEMA = {
+    "title": "text",
+    "description": "text",
+    "price": "price",
+    "rating": "count",
+    "num_of_reviews": "count",
+}
+
+
+def raw_product_fields(product_soup: BeautifulSoup) -> Dict[str, str]:
+    return {
+        "title": product_soup.select_one(".title")["title"],
+        "description": product_soup.select_one(".description").text,
+        "price": product_soup.select_one(".price").text,
+        "rating": product_soup.select_one("p[data-rating]")["data-rating"],
+        "num_of_reviews": product_soup.select_one(".ratings > p.pull-right").text,
+    }
+
+
+def product_soup_key(product_soup: BeautifulSoup) -> str:
+    return product_key(BASE_URL, product_soup.select_one(".title")["href"])
+
+
+def parse_products(product_soups: List[BeautifulSoup]) -> List[Optional[Product]]:
+    """Products of a page at once, None for malformed ones (dead-lettered)."""
+    rows = extract_records(product_soups, raw_product_fields, PRODUCT_SCHEMA)
+    return [None if row is None else Product(**row) for row in rows]
+
+
+def parse_single_product(product_soup: BeautifulSoup) -> Optional[Product]:
+    return parse_products([product_soup])[0]
+
+
+def parse_page_products(content: bytes) -> List[Product]:
+    soup = make_soup(content, PARSE_REGION)
+    all_products = parse_products(soup.select(".thumbnail"))  # css-selectors
 
+    return [product for product in all_products if product is not None]
 
-def parse_single_product(product_soup: BeautifulSoup) -> Product:
-    return Product(
-        title=product_soup.select_one(".title")["title"],
-        description=product_soup.select_one(".description").text,
-        price=float(product_soup.select_one(".price").text.replace("$", "")),
-        rating=int(product_soup.select_one("p[data-rating]")["data-rating"]),
-        num_of_reviews=int(
-            product_soup.select_one(".ratings > p.pull-right").text.split()[0]
-        ),
+
+def get_single_page_entries(
+    page_soup: BeautifulSoup, known_keys: Collection[str] = frozenset()
+) -> List[ProductEntry]:
+    product_soups = page_soup.select(".thumbnail")
+    keys = FAILURES.isolate(product_soup_key, product_soups)
+    return parse_unknown(keys, product_soups, known_keys, parse_products)
+
+
+def parse_page_entries(
+    content: bytes, known_keys: Collection[str] = frozenset()
+) -> List[ProductEntry]:
+    return get_single_page_entries(make_soup(content, PARSE_REGION), known_keys)
+
+
+async def fetch_page_products(
+    fetcher: AsyncFetcher, url: str, cache: Optional[ProductCache] = None
+) -> List[Product]:
+    cache = ProductCache() if cache is None else cache
+    content = await fetcher.get(url)
+    # workers in other processes would get a copy of the keys with every page:
+    # they parse every product instead, and the cache keeps the first copy
+    known_keys = frozenset() if fetcher.parses_in_processes else cache.known_keys()
+    entries = await fetcher.parse(parse_page_entries, content, known_keys)
+
+    return [cache.add(key, product) for key, product in entries]
+
+
+async def fetch_all_products(
+    fetcher: AsyncFetcher, cache: Optional[ProductCache] = None
+) -> Dict[str, List[Product]]:
+    """Products per page; a page that keeps failing is left out."""
+    cache = ProductCache() if cache is None else cache
+    return await gather_with_retries(
+        lambda page: fetch_page_products(fetcher, PAGES[page], cache), list(PAGES)
     )
 
 
 def get_page_products(url: str) -> List[Product]:
-    page = requests.get(url)
-    soup = BeautifulSoup(page.content, "html.parser")
-    all_products = soup.select(".thumbnail")  # css-selectors
-
-    return [parse_single_product(product_soup=product) for product in all_products]
+    return run_sync(fetch_page_products, url)
 
 
-def write_products_to_csv(page: str, products: List[Product]):
-    with open(
-        os.path.join(
-            DATA_PATH,
-            f"{page}.csv",
-        ),
-        "w",
-    ) as f:
-        writer = csv.writer(f)
-        writer.writerow(PRODUCT_FIELDS)
-        writer.writerows([astuple(product) for product in products])
+def write_products(page: str, products: List[Product], keys: Optional[List[str]] = None) -> None:
+    write_items(os.path.join(DATA_PATH, page), Product, products, OUTPUT_FORMAT, keys)
 
 
-def get_all_products():
-    for page, page_url in PAGES.items():
-        page_products = get_page_products(page_url)
+def write_all_products(
+    pages: Dict[str, List[Product]], cache: ProductCache, combined: bool = False
+) -> None:
+    """Write every page, the combined page and the changes of the products in ``cache``."""
+    for page, page_products in pages.items():
         print("Page:", page, page_products)
-        write_products_to_csv(page, page_products)
+        write_products(page, page_products, cache.keys_of(page_products))
+
+    if combined:
+        write_products(COMBINED_PAGE, cache.products(), list(cache.known_keys()))
+    if CHANGEFEED:
+        print("Changes:", dict(publish_changes(cache.items(), DATA_PATH, complete=not FAILURES)))
+
+
+def get_all_products(combined: bool = False):
+    cache = ProductCache()
+
+    with reporting_run("products"):
+        write_all_products(run_sync(fetch_all_products, cache), cache, combined)
 
 
 def main():
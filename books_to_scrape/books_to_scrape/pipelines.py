@@ -7,7 +7,13 @@
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from common.scrapy_ext import SQLitePipeline
+
 
 class BooksToScrapePipeline:
     def process_item(self, item, spider):
         return item
+
+
+class BooksSQLitePipeline(SQLitePipeline):
+    item_type = "Book"
@@ -7,12 +7,30 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import sys
+from pathlib import Path
+
+# Shared crawl components live in the top-level ``common`` package
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+# The production profile shared by both projects: robots.txt, AutoThrottle,
+# the SQLite HTTP cache (see common.scrapy_settings); the settings below
+# override it
+from common.scrapy_settings import *  # noqa: E402,F401,F403
+
 BOT_NAME = 'books_to_scrape'
 
 SPIDER_MODULES = ['books_to_scrape.spiders']
 NEWSPIDER_MODULE = 'books_to_scrape.spiders'
 
 
+# Deduplicate canonical urls (trailing slash, query order, ?page=1) with a
+# Bloom filter instead of an unbounded set of fingerprints
+REQUEST_FINGERPRINTER_CLASS = 'common.scrapy_ext.CanonicalRequestFingerprinter'
+DUPEFILTER_CLASS = 'common.scrapy_ext.BloomDupeFilter'
+BLOOM_CAPACITY = 1_000_000
+BLOOM_ERROR_RATE = 0.001
+
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
 #USER_AGENT = 'books_to_scrape (+http://www.yourdomain.com)'
 
@@ -30,6 +48,39 @@ ROBOTSTXT_OBEY = True
 #CONCURRENT_REQUESTS_PER_DOMAIN = 16
 #CONCURRENT_REQUESTS_PER_IP = 16
 
+# Request priorities (higher is scheduled first). Listing pages are discovered
+# ahead of the detail pages, so the downloader never runs out of queued work.
+BOOKS_LISTING_PRIORITY = 10
+BOOKS_DETAIL_PRIORITY = 0
+
+# Scheduler queues. The memory queue is FIFO per priority so detail pages are
+# fetched in catalog order. For very large catalogs run with a job directory
+# (scrapy crawl books -s JOBDIR=crawls/books-1): requests are then kept in the
+# disk queue instead of memory, and the crawl can be paused and resumed.
+SCHEDULER_MEMORY_QUEUE = 'scrapy.squeues.FifoMemoryQueue'
+SCHEDULER_DISK_QUEUE = 'scrapy.squeues.PickleFifoDiskQueue'
+SCHEDULER_PRIORITY_QUEUE = 'scrapy.pqueues.ScrapyPriorityQueue'
+
+# Sharded runs (python -m common.sharding books --project books_to_scrape)
+# split the detail pages between processes by url hash, and are merged by upc
+SHARD_CALLBACKS = ['parse_book']
+SHARD_KEY = 'upc'
+
+# Failed pages and items go to a dead-letter file instead of only the log
+# (see common.scrapy_ext.DeadLetterMiddleware); after FAILURE_BUDGET of them
+# the spider is closed. Failed downloads are retried first: a retried request
+# is rescheduled with a lower priority, so it waits behind the fresh ones.
+DEAD_LETTER_PATH = 'dead_letters.jl'
+FAILURE_BUDGET = 100
+RETRY_TIMES = 3
+RETRY_HTTP_CODES = [500, 502, 503, 504, 522, 524, 408, 429]
+RETRY_PRIORITY_ADJUST = -1
+
+# Keep the raw pages in a compressed archive (-s ARCHIVE_DIR=archive), and
+# re-run changed parsers over it without the network (-s REPLAY_DIR=archive)
+ARCHIVE_DIR = None
+REPLAY_DIR = None
+
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
 
@@ -44,15 +95,19 @@ ROBOTSTXT_OBEY = True
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
+SPIDER_MIDDLEWARES = {
 #    'books_to_scrape.middlewares.BooksToScrapeSpiderMiddleware': 543,
-#}
+    'common.scrapy_ext.DeadLetterMiddleware': 60,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
+DOWNLOADER_MIDDLEWARES = {
 #    'books_to_scrape.middlewares.BooksToScrapeDownloaderMiddleware': 543,
-#}
+    'common.scrapy_ext.ShardDownloaderMiddleware': 100,
+    'common.scrapy_ext.DeadLetterMiddleware': 540,
+    'common.scrapy_ext.ArchiveDownloaderMiddleware': 580,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -62,27 +117,16 @@ ROBOTSTXT_OBEY = True
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
+ITEM_PIPELINES = {
 #    'books_to_scrape.pipelines.BooksToScrapePipeline': 300,
-#}
-
-# Enable and configure the AutoThrottle extension (disabled by default)
+    'books_to_scrape.pipelines.BooksSQLitePipeline': 800,
+}
+# Upsert the books into SQLite, with a price snapshot per run; off unless a
+# path is given (scrapy crawl books -s SQLITE_PATH=books.sqlite)
+SQLITE_PATH = None
+SQLITE_BATCH_SIZE = 1000
+
+# AutoThrottle and the HTTP cache are configured by the production profile;
+# e.g. -s HTTPCACHE_ENABLED=False crawls without the cache
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-#AUTOTHROTTLE_ENABLED = True
-# The initial download delay
-#AUTOTHROTTLE_START_DELAY = 5
-# The maximum download delay to be set in case of high latencies
-#AUTOTHROTTLE_MAX_DELAY = 60
-# The average number of requests Scrapy should be sending in parallel to
-# each remote server
-#AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
-# Enable showing throttling stats for every response received:
-#AUTOTHROTTLE_DEBUG = False
-
-# Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = 'httpcache'
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
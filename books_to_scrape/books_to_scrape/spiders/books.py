@@ -1,49 +1,67 @@
-import re
-from urllib.parse import urljoin
+import os
+from urllib.parse import urljoin, urlsplit
 
 import scrapy
 from scrapy.http import Response
 
+from common.failures import FAILURES
+from common.normalize import extract_records
+
+BASE_URL = os.environ.get("BOOKS_BASE_URL", "https://books.toscrape.com/")
+
 global_var = 0
 
+BOOK_SCHEMA = {"title": "text", "price": "price", "amount_in_stock": "count"}
+
 
 class BooksSpider(scrapy.Spider):
     name = "books"
-    allowed_domains = ["books.toscrape.com"]
-    start_urls = ["https://books.toscrape.com/"]
+    allowed_domains = [urlsplit(BASE_URL).hostname]
+    start_urls = [BASE_URL]
 
     def close(spider, reason):
         print(f"ENDING: {global_var}")
 
     def parse(self, response: Response, **kwargs):
+        # Listing pages go first and with a higher priority, so the frontier
+        # always holds the next page while the detail pages are downloading.
+        next_page = response.css(".next > a::attr(href)").get()
+        if next_page is not None:
+            yield response.follow(
+                next_page,
+                callback=self.parse,
+                priority=self.settings.getint("BOOKS_LISTING_PRIORITY"),
+            )
+
         books = response.css(".product_pod")
         global global_var
         global_var += len(books)
         for book in books:
-            book_detail_url = urljoin(
-                response.url, book.css(".product_pod > h3 > a::attr(href)").get()
-            )
-            yield scrapy.Request(book_detail_url, callback=self.parse_book)
+            href = book.css(".product_pod > h3 > a::attr(href)").get()
+            if href is None:
+                FAILURES.record("item", ValueError("Book without a detail link"), book.get())
+                continue
 
-        next_page = response.css(".next > a::attr(href)").get()
-        if next_page is not None:
-            yield response.follow(next_page, callback=self.parse)
+            book_detail_url = urljoin(response.url, href)
+            yield scrapy.Request(
+                book_detail_url,
+                callback=self.parse_book,
+                priority=self.settings.getint("BOOKS_DETAIL_PRIORITY"),
+            )
 
     def parse_book(self, response: Response):
-        if response.status == 404:
-            print(response.url)
-            exit(0)
-        yield {
+        # error responses (a 404) never get here, DeadLetterMiddleware records them;
+        # a malformed page is dead-lettered by extract_records and skipped
+        (book,) = extract_records([response], self._book_fields, BOOK_SCHEMA)
+
+        if book is not None:
+            yield book
+
+    def _book_fields(self, response: Response) -> dict:
+        return {
             "title": response.css(".product_main > h1::text").get(),
-            "price": float(response.css(".price_color::text").get().replace("£", "")),
-            "amount_in_stock": int(
-                re.findall(
-                    r"\d+",
-                    "".join(response.css(".instock ::text").getall())
-                    .strip()
-                    .replace("£", ""),
-                )[0]
-            ),
+            "price": response.css(".price_color::text").get(),
+            "amount_in_stock": "".join(response.css(".instock ::text").getall()),
             "rating": self._str_to_int(response.css(".star-rating::attr(class)").get().split()[-1]),
             "category": response.css(".breadcrumb > li > a::text")[-1].get(),
             "description": response.css("#product_description + p::text").get(),
@@ -0,0 +1,242 @@
+"""Append-only archive of raw responses, for re-parsing without the network.
+
+Responses are appended to segment files (``segment-{writer}-00000.gz``...),
+each record its own gzip member: a JSON header line (url, status, headers, time)
+followed by the body. Concatenated members are still one valid gzip file, so
+``zcat`` reads a whole segment, while a record is read alone by seeking to
+its offset. ``index.tsv`` lists every record as ``key, segment, offset,
+length``; a later record of the same key replaces the earlier one. A segment
+is closed once it reaches ``SEGMENT_SIZE`` and a new one started. Every
+writer has its own segments, named by its start time and pid, so the worker
+processes of a sharded run can archive into the same directory.
+
+Keys are canonical urls (``common.frontier.canonicalize_url``), so
+``laptops/`` and ``laptops?page=1`` are one page.
+
+    archive = ArchiveWriter("archive/")            # while crawling
+    archive.write(url, response.content, response.status_code, dict(response.headers))
+
+    replay = ArchiveReader("archive/")             # later, without the network
+    replay.get(url).body
+    for response in replay: ...                    # every page, in segment order
+
+Pages saved as plain files, e.g. by ``wget --mirror``, are read the same way
+with ``PageDirectory``; ``open_replay`` picks whichever a directory holds.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+from urllib.parse import unquote, urlencode, urlsplit
+
+from common.frontier import canonicalize_url
+
+SEGMENT_SIZE = 64 * 1024 * 1024  # bytes of compressed records per segment
+INDEX_FILE = "index.tsv"
+COMPRESS_LEVEL = 6
+# bodies are stored decoded, so these would no longer describe them
+STRIPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+DIRECTORY_INDEX = "index.html"  # the file of a url ending in "/"
+
+
+def archive_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    if params:
+        url = f"{url}{'&' if '?' in url else '?'}{urlencode(params)}"
+    return canonicalize_url(url)
+
+
+@dataclass
+class ArchivedResponse:
+    url: str
+    status: int
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    time: float = 0.0
+
+
+class ArchiveWriter:
+    def __init__(self, directory: str, segment_size: int = SEGMENT_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+        self._start()
+
+    def _start(self) -> None:
+        self._pid = os.getpid()
+        self._writer = f"{time.time_ns()}-{self._pid}"
+        self._index = open(os.path.join(self.directory, INDEX_FILE), "a")
+        self._segment = None
+        self._segment_name = ""
+        self._segment_number = 0
+
+    def _open_segment(self):
+        if self._pid != os.getpid():  # a forked worker: the parent's segment is not its own
+            self._start()
+
+        if self._segment is None or self._segment.tell() >= self.segment_size:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment_number += 1
+            self._segment_name = f"segment-{self._writer}-{self._segment_number:05d}.gz"
+            self._segment = open(os.path.join(self.directory, self._segment_name), "ab")
+        return self._segment
+
+    def write(
+        self,
+        url: str,
+        body: bytes,
+        status: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+        key: Optional[str] = None,
+    ) -> None:
+        headers = {
+            name: value for name, value in (headers or {}).items()
+            if name.lower() not in STRIPPED_HEADERS
+        }
+        header = {"url": url, "status": status, "headers": headers, "time": time.time()}
+        record = gzip.compress(
+            json.dumps(header).encode() + b"\n" + body, compresslevel=COMPRESS_LEVEL
+        )
+
+        with self._lock:
+            segment = self._open_segment()
+            offset = segment.tell()
+            segment.write(record)
+            segment.flush()
+            self._index.write(
+                f"{key or archive_key(url)}\t{self._segment_name}\t{offset}\t{len(record)}\n"
+            )
+            self._index.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            self._index.close()
+
+
+def _parse_record(record: bytes) -> ArchivedResponse:
+    header, _, body = gzip.decompress(record).partition(b"\n")
+    header = json.loads(header)
+    return ArchivedResponse(
+        header["url"], header["status"], body, header["headers"], header["time"]
+    )
+
+
+class ArchiveReader:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._records: Dict[str, Tuple[str, int, int]] = {}
+        self._files: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            for line in f:
+                key, segment, offset, length = line.rstrip("\n").split("\t")
+                self._records[key] = (segment, int(offset), int(length))
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._records
+
+    def keys(self):
+        return self._records.keys()
+
+    def _read(self, segment: str, offset: int, length: int) -> bytes:
+        with self._lock:
+            if segment not in self._files:
+                self._files[segment] = open(os.path.join(self.directory, segment), "rb")
+            file = self._files[segment]
+            file.seek(offset)
+            return file.read(length)
+
+    def get(
+        self, url: str, params: Optional[Dict[str, Any]] = None
+    ) -> Optional[ArchivedResponse]:
+        location = self._records.get(archive_key(url, params))
+        return None if location is None else _parse_record(self._read(*location))
+
+    def __iter__(self) -> Iterator[ArchivedResponse]:
+        """Every archived page once, reading the segments front to back."""
+        for segment, offset, length in sorted(self._records.values()):
+            yield _parse_record(self._read(segment, offset, length))
+
+    def close(self) -> None:
+        with self._lock:
+            for file in self._files.values():
+                file.close()
+            self._files = {}
+
+
+def _location(key: str) -> str:
+    """``host[:port]/path[?query]`` of a canonical url, the scheme is not kept."""
+    parts = urlsplit(key)
+    location = f"{parts.netloc}{unquote(parts.path)}"
+    return f"{location}?{parts.query}" if parts.query else location
+
+
+class PageDirectory:
+    """Saved pages laid out as ``{host}/{path}[?query]``, like ``wget --mirror``.
+
+    A page saved as ``{path}/index.html`` is the url of ``{path}``; the files
+    are read as they are, with status 200 and no headers.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._files: Dict[str, str] = {}
+
+        for root, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                location = os.path.relpath(path, directory).replace(os.sep, "/")
+                page, _, query = location.partition("?")
+                if page == DIRECTORY_INDEX or page.endswith(f"/{DIRECTORY_INDEX}"):
+                    page = page[:-len(DIRECTORY_INDEX)]
+                url = f"http://{page}?{query}" if query else f"http://{page}"
+                self._files[_location(canonicalize_url(url))] = path
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def __contains__(self, key: str) -> bool:
+        return _location(key) in self._files
+
+    def get(
+        self, url: str, params: Optional[Dict[str, Any]] = None
+    ) -> Optional[ArchivedResponse]:
+        path = self._files.get(_location(archive_key(url, params)))
+        if path is None:
+            return None
+
+        with open(path, "rb") as f:
+            return ArchivedResponse(url, 200, f.read(), time=os.path.getmtime(path))
+
+    def __iter__(self) -> Iterator[ArchivedResponse]:
+        for location in sorted(self._files):
+            yield self.get(f"http://{location}")
+
+    def close(self) -> None:
+        pass
+
+
+ReplaySource = Union[ArchiveReader, PageDirectory]
+
+# One writer per directory and process, shared by every fetcher
+open_archive = lru_cache(maxsize=None)(ArchiveWriter)
+
+
+@lru_cache(maxsize=None)
+def open_replay(directory: str) -> ReplaySource:
+    """The archive in directory, or its saved pages if it has no index."""
+    if os.path.exists(os.path.join(directory, INDEX_FILE)):
+        return ArchiveReader(directory)
+    return PageDirectory(directory)
@@ -0,0 +1,92 @@
+"""One place to start Chrome for the Selenium scrapers.
+
+Drivers are headless and do not download images, fonts, stylesheets or
+analytics by default; pages are considered loaded once the DOM is ready
+(``eager``), not after every subresource. With ``CHROME_PROFILE_DIR`` set the
+browser keeps its profile between runs, so the cookie banner is only accepted
+once. ``HEADLESS=0`` shows the window for debugging.
+
+Selenium is imported by ``make_driver``, not with this module.
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+HEADLESS = os.environ.get("HEADLESS", "1") != "0"
+PROFILE_DIR = os.environ.get("CHROME_PROFILE_DIR")
+
+IMAGE_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.webp", "*.ico"]
+FONT_PATTERNS = ["*.woff", "*.woff2", "*.ttf", "*.otf"]
+STYLESHEET_PATTERNS = ["*.css"]
+THIRD_PARTY_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*hotjar.com*",
+    "*fonts.googleapis.com*",
+]
+
+
+@dataclass
+class BrowserOptions:
+    headless: bool = HEADLESS
+    block_images: bool = True
+    block_stylesheets: bool = True  # keep them when is_displayed() matters
+    block_third_party: bool = True
+    profile_dir: Optional[str] = PROFILE_DIR
+    page_load_strategy: str = "eager"  # "normal" waits for every subresource
+    window_size: str = "1366,768"
+    extra_arguments: List[str] = field(default_factory=list)
+
+    @property
+    def blocked_urls(self) -> List[str]:
+        patterns = []
+        if self.block_images:
+            patterns += IMAGE_PATTERNS + FONT_PATTERNS
+        if self.block_stylesheets:
+            patterns += STYLESHEET_PATTERNS
+        if self.block_third_party:
+            patterns += THIRD_PARTY_PATTERNS
+        return patterns
+
+
+def make_driver(options: Optional[BrowserOptions] = None) -> WebDriver:
+    from selenium import webdriver
+
+    options = options or BrowserOptions()
+    chrome_options = webdriver.ChromeOptions()
+    chrome_options.page_load_strategy = options.page_load_strategy
+
+    if options.headless:
+        chrome_options.add_argument("--headless=new")
+    if options.profile_dir:
+        chrome_options.add_argument(f"--user-data-dir={os.path.abspath(options.profile_dir)}")
+    if options.block_images:
+        chrome_options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+
+    for argument in [
+        f"--window-size={options.window_size}",
+        "--disable-extensions",
+        "--disable-gpu",
+        "--disable-dev-shm-usage",
+        "--no-first-run",
+        "--mute-audio",
+        *options.extra_arguments,
+    ]:
+        chrome_options.add_argument(argument)
+
+    driver = webdriver.Chrome(options=chrome_options)
+
+    if blocked_urls := options.blocked_urls:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_urls})
+
+    return driver
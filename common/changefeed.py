@@ -0,0 +1,96 @@
+"""Change events between two runs of a scraper, instead of the full catalog.
+
+The previous run is remembered as a snapshot of ``key<TAB>digest`` lines: the
+``ProductCache`` key (the canonical detail url) and a short blake2b digest of
+the item, not the item itself. ``publish`` compares the current items with it
+and writes only what changed, as JSONL:
+
+    {"op": "insert", "key": ".../product/31", "item": {...}}
+    {"op": "update", "key": ".../product/31", "item": {...}}
+    {"op": "delete", "key": ".../product/32"}
+
+then replaces the snapshot. The first run has no snapshot, so every item is
+an insert. A run that is not ``complete`` (pages were dead-lettered) emits no
+deletes and keeps the digests of the items it did not see. Set
+``CHANGEFEED=0`` in the environment to skip the stage.
+"""
+import hashlib
+import json
+import os
+from collections import Counter
+from dataclasses import asdict, is_dataclass
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+from common.jsonl import DIGEST_SIZE
+
+CHANGEFEED = os.environ.get("CHANGEFEED", "1") != "0"
+CHANGES_FILE = "changes.jl"
+SNAPSHOT_FILE = "snapshot.idx"
+
+
+def _record(item: Any) -> Dict[str, Any]:
+    return asdict(item) if is_dataclass(item) else dict(item)
+
+
+def item_digest(record: Dict[str, Any]) -> str:
+    canonical = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode(), digest_size=DIGEST_SIZE).hexdigest()
+
+
+def load_snapshot(path: str) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as f:
+        return dict(line.rstrip("\n").split("\t") for line in f if line.strip())
+
+
+def save_snapshot(path: str, digests: Dict[str, str]) -> None:
+    temporary = f"{path}.tmp"
+
+    with open(temporary, "w") as f:
+        f.writelines(f"{key}\t{digest}\n" for key, digest in digests.items())
+
+    os.replace(temporary, path)  # a crash mid-write keeps the previous snapshot
+
+
+def changes(
+    previous: Dict[str, str],
+    items: Iterable[Tuple[str, Any]],
+    digests: Dict[str, str],
+    complete: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """Events turning ``previous`` into ``items``; fills ``digests`` on the way."""
+    for key, item in items:
+        record = _record(item)
+        digest = digests[key] = item_digest(record)
+
+        if key not in previous:
+            yield {"op": "insert", "key": key, "item": record}
+        elif previous[key] != digest:
+            yield {"op": "update", "key": key, "item": record}
+
+    for key in previous:
+        if key in digests:
+            continue
+        if complete:
+            yield {"op": "delete", "key": key}
+        else:
+            digests[key] = previous[key]
+
+
+def publish(items: Iterable[Tuple[str, Any]], directory: str, complete: bool = True) -> Counter:
+    """Write the changes since the last run to ``directory``, return counts per op."""
+    os.makedirs(directory or ".", exist_ok=True)
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+    previous = load_snapshot(snapshot_path)
+    digests: Dict[str, str] = {}
+    counts: Counter = Counter()
+
+    with open(os.path.join(directory, CHANGES_FILE), "w") as f:
+        for event in changes(previous, items, digests, complete):
+            counts[event["op"]] += 1
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    save_snapshot(snapshot_path, digests)
+    return counts
@@ -0,0 +1,56 @@
+"""Batched extraction from the live DOM with one ``execute_script`` each.
+
+Instead of serializing the page through ``driver.page_source`` and parsing it
+again, or making a WebDriver round-trip per ``find_element``/``click``, these
+scripts collect everything in the browser and return plain JSON. Values are
+the raw texts/attributes the BeautifulSoup parsers read, so the same
+conversions apply. ``BATCHED_EXTRACTION=0`` switches back to the old paths.
+"""
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Dict, List
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+BATCHED_EXTRACTION = os.environ.get("BATCHED_EXTRACTION", "1") != "0"
+
+THUMBNAILS_SCRIPT = """
+return Array.from(document.querySelectorAll(".thumbnail")).map(function (thumbnail) {
+  function find(selector) { return thumbnail.querySelector(selector); }
+  function text(selector) { var element = find(selector); return element && element.textContent; }
+  var title = find(".title");
+  var rating = find("p[data-rating]");
+  return {
+    title: title && title.getAttribute("title"),
+    href: title && title.getAttribute("href"),
+    description: text(".description"),
+    price: text(".price"),
+    rating: rating && rating.getAttribute("data-rating"),
+    stars: thumbnail.querySelectorAll(".glyphicon-star").length,
+    reviews: text(".ratings > p.pull-right")
+  };
+});
+"""
+
+SWATCH_PRICES_SCRIPT = """
+var prices = {};
+document.querySelectorAll(".swatches button").forEach(function (button) {
+  if (!button.disabled) {
+    button.click();
+    prices[button.value] = document.querySelector(".price").textContent;
+  }
+});
+return prices;
+"""
+
+
+def extract_thumbnails(driver: WebDriver) -> List[Dict[str, str]]:
+    """Raw fields of every ``.thumbnail`` on the current page."""
+    return driver.execute_script(THUMBNAILS_SCRIPT)
+
+
+def collect_swatch_prices(driver: WebDriver) -> Dict[str, str]:
+    """Click every enabled HDD swatch, return ``{value: price text}``."""
+    return driver.execute_script(SWATCH_PRICES_SCRIPT)
@@ -0,0 +1,186 @@
+"""Keeping a long crawl going when single items or pages fail.
+
+``FailureLog.isolate`` runs a function over items one by one and turns an
+exception into a None result plus a dead letter: a JSONL line with the kind
+("item" or "page"), the error and the item's markup or url, so the failed
+input can be inspected or replayed later. ``gather_with_retries`` fetches
+pages concurrently and puts the ones that failed in a retry queue that is
+worked off in later rounds, with a growing delay; pages that still fail are
+dead-lettered and the rest of the results are kept.
+
+Every failure counts against the run's budget. Once more than ``budget``
+failures are recorded ``FailureBudgetExceeded`` is raised: a site that is
+down or has changed its layout stops the crawl early instead of producing
+hours of dead letters. ``DEAD_LETTER_PATH`` and ``FAILURE_BUDGET`` configure
+the process-wide ``FAILURES``; parsers running in worker processes hand
+their letters back to it with ``collect_failures``.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import (
+    Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+)
+
+K = TypeVar("K")
+T = TypeVar("T")
+R = TypeVar("R")
+
+PAYLOAD_LIMIT = 4096  # characters of markup kept per dead letter
+RETRY_ROUNDS = 2
+RETRY_DELAY = 1.0  # seconds before the first retry round, doubled for each next
+
+logger = logging.getLogger(__name__)
+
+
+class FailureBudgetExceeded(RuntimeError):
+    pass
+
+
+def _payload(item: Any) -> Any:
+    if isinstance(item, (dict, list, int, float)) or item is None:
+        return item
+    return str(item)[:PAYLOAD_LIMIT]
+
+
+class FailureLog:
+    """Dead letters and failure counts of one run."""
+
+    def __init__(self, path: Optional[str] = None, budget: Optional[int] = None):
+        self.path = path
+        self.budget = budget
+        self.counts: Counter = Counter()
+        self.letters: Optional[List[Dict[str, Any]]] = None  # kept instead of written
+        self._file = None
+        self._lock = threading.Lock()  # parsers record from executor threads
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
+    def configure(self, path: Optional[str] = None, budget: Optional[int] = None) -> None:
+        self.close()
+        self.path = path
+        self.budget = budget
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def record(self, kind: str, error: BaseException, payload: Any = None) -> None:
+        letter = {
+            "time": time.time(),
+            "kind": kind,
+            "error": f"{type(error).__name__}: {error}",
+            "payload": _payload(payload),
+        }
+        logger.warning(f"Failed {kind}: {letter['error']}")
+        self.add_letters([letter])
+
+    def add_letters(self, letters: Sequence[Dict[str, Any]]) -> None:
+        """Count and write dead letters, e.g. the ones a worker process collected."""
+        with self._lock:
+            for letter in letters:
+                self.counts[letter["kind"]] += 1
+
+                if self.letters is not None:
+                    self.letters.append(letter)
+                elif self.path is not None:
+                    if self._file is None:
+                        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                        self._file = open(self.path, "a")
+                    self._file.write(json.dumps(letter, ensure_ascii=False, default=str) + "\n")
+            if self._file is not None:
+                self._file.flush()
+
+        if self.budget is not None and len(self) > self.budget:
+            raise FailureBudgetExceeded(f"{len(self)} failures, the budget is {self.budget}")
+
+    def isolate(
+        self, function: Callable[[T], R], items: Iterable[T], kind: str = "item"
+    ) -> List[Optional[R]]:
+        """``function(item)`` for every item, None where it raised."""
+        results = []
+
+        for item in items:
+            try:
+                results.append(function(item))
+            except FailureBudgetExceeded:
+                raise
+            except Exception as error:
+                self.record(kind, error, item)
+                results.append(None)
+
+        return results
+
+    def summary(self) -> str:
+        return ", ".join(f"{kind}: {count}" for kind, count in self.counts.most_common())
+
+
+def _budget_from_env() -> Optional[int]:
+    budget = os.environ.get("FAILURE_BUDGET")
+    return int(budget) if budget else None
+
+
+# Failures of the whole process, unless a caller passes its own
+FAILURES = FailureLog(os.environ.get("DEAD_LETTER_PATH"), _budget_from_env())
+
+
+def collect_failures(
+    function: Callable[..., R], *args
+) -> Tuple[R, List[Dict[str, Any]]]:
+    """``function(*args)`` and the dead letters it recorded in ``FAILURES``.
+
+    Run in a worker process, so that the parent adds the letters to its own
+    ``FAILURES``: one budget, one summary and one writer for the whole run.
+    """
+    FAILURES.letters, budget, FAILURES.budget = [], FAILURES.budget, None
+    try:
+        return function(*args), FAILURES.letters
+    finally:
+        FAILURES.letters, FAILURES.budget = None, budget
+
+
+async def gather_with_retries(
+    fetch: Callable[[K], Awaitable[T]],
+    keys: Sequence[K],
+    failures: Optional[FailureLog] = None,
+    rounds: int = RETRY_ROUNDS,
+    delay: float = RETRY_DELAY,
+) -> Dict[K, T]:
+    """``fetch(key)`` for every key concurrently, failed keys retried in rounds.
+
+    Returns the results of the keys that succeeded, in the order of ``keys``.
+    """
+    failures = FAILURES if failures is None else failures
+    results: Dict[K, T] = {}
+    pending = list(keys)
+    errors: Dict[K, BaseException] = {}
+
+    for retry_round in range(rounds + 1):
+        if retry_round:
+            logger.info(f"Retrying {len(pending)} failed pages, round {retry_round}")
+            await asyncio.sleep(delay * 2 ** (retry_round - 1))
+
+        outcomes = await asyncio.gather(*(fetch(key) for key in pending), return_exceptions=True)
+        errors = {}
+        for key, outcome in zip(pending, outcomes):
+            if isinstance(outcome, FailureBudgetExceeded):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                errors[key] = outcome
+            else:
+                results[key] = outcome
+
+        pending = list(errors)
+        if not pending:
+            break
+
+    for key, error in errors.items():
+        failures.record("page", error, key)
+
+    return {key: results[key] for key in keys if key in results}
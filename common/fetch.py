@@ -0,0 +1,238 @@
+"""Asyncio fetching shared by the requests-based scrapers.
+
+One ``AsyncFetcher`` owns a single httpx client (one connection pool) and a
+semaphore bounding the requests in flight. Parsing is handed off to an
+executor so the event loop keeps downloading while BeautifulSoup works; pass
+a ``ProcessPoolExecutor`` to parse on several cores (the dead letters of the
+workers are then added to this process's ``FAILURES``).
+
+Several fetchers can share one client (``make_client``) and a
+``ResponseCache``, e.g. the jobs of ``python -m crawl``: each keeps its own
+concurrency and rate limit while connections and identical downloads are
+shared; the cache holds at most ``FETCH_CACHE_MB`` of bodies. httpx is
+imported when the first fetcher opens, not with this module.
+
+With an ``archive`` (``FETCH_ARCHIVE_DIR`` in the environment) every response
+is also appended to a ``common.archive`` directory; with ``replay``
+(``FETCH_REPLAY_DIR``) responses are read back from one and the network is
+not used at all, so changed parsers can be re-run over a past crawl.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import (
+    TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Protocol, Tuple, TypeVar
+)
+from urllib.parse import urlencode
+
+from common.archive import ArchiveWriter, ReplaySource, archive_key, open_archive, open_replay
+from common.failures import FAILURES, collect_failures
+
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_TIMEOUT = 30.0
+ARCHIVE_DIR = os.environ.get("FETCH_ARCHIVE_DIR")
+REPLAY_DIR = os.environ.get("FETCH_REPLAY_DIR")
+CACHE_MAX_BYTES = int(os.environ.get("FETCH_CACHE_MB", "64")) * 2 ** 20
+
+T = TypeVar("T")
+
+# httpx logs every request at INFO, requests/urllib3 used DEBUG
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+class RateLimiter(Protocol):
+    def reserve(self) -> float:
+        """Book the next request slot, return seconds to wait for it."""
+
+
+class IntervalRateLimiter:
+    """At most ``rate`` requests per second, within one event loop."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate else 0.0
+        self._next_slot = 0.0
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+
+        return slot - now
+
+
+class ResponseCache:
+    """Bodies of the GETs of one run, by url and query.
+
+    Concurrent requests for the same url wait for one download; a failed
+    download is forgotten so the next request tries again. Once the bodies
+    pass ``max_bytes`` the least recently requested ones are dropped, so a
+    long run keeps what is shared (home and category pages) and not every
+    page it ever downloaded.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0  # bytes of the bodies held
+        self._responses: OrderedDict[Tuple[str, str], asyncio.Future] = OrderedDict()
+        self._sizes: Dict[Tuple[str, str], int] = {}
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    async def get_or_fetch(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        fetch: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        key = (url, urlencode(sorted((params or {}).items())))
+
+        if key in self._responses:
+            self.hits += 1
+            self._responses.move_to_end(key)
+            return await asyncio.shield(self._responses[key])
+
+        self._responses[key] = response = asyncio.ensure_future(fetch())
+        try:
+            body = await asyncio.shield(response)
+        except Exception:
+            if self._responses.get(key) is response:
+                del self._responses[key]
+            raise
+
+        if self._responses.get(key) is response and key not in self._sizes:
+            self._sizes[key] = len(body)
+            self.size += len(body)
+            self._evict()
+        return body
+
+    def _evict(self) -> None:
+        for key in list(self._responses):
+            if self.size <= self.max_bytes:
+                return
+            if key in self._sizes:  # downloads in flight stay
+                del self._responses[key]
+                self.size -= self._sizes.pop(key)
+
+
+def make_client(
+    max_connections: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT
+) -> httpx.AsyncClient:
+    import httpx
+
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+    )
+
+
+class AsyncFetcher:
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        executor: Optional[Executor] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        rate_limiter: Optional[RateLimiter] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[ResponseCache] = None,
+        archive: Optional[ArchiveWriter] = None,
+        replay: Optional[ReplaySource] = None,
+    ):
+        """``client`` is shared and left open; without one the fetcher owns its own."""
+        self.concurrency = concurrency
+        self.executor = executor
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        if archive is None and ARCHIVE_DIR:
+            archive = open_archive(ARCHIVE_DIR)
+        if replay is None and REPLAY_DIR:
+            replay = open_replay(REPLAY_DIR)
+        self.archive = archive
+        self.replay = replay
+        self._client: Optional[httpx.AsyncClient] = client
+        self._owns_client = client is None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> AsyncFetcher:
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self._owns_client and self.replay is None:
+            self._client = make_client(self.concurrency, self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None) -> bytes:
+        if self.cache is not None:
+            return await self.cache.get_or_fetch(url, params, lambda: self._download(url, params))
+
+        return await self._download(url, params)
+
+    async def _download(self, url: str, params: Optional[Dict[str, Any]]) -> bytes:
+        if self.replay is not None:
+            archived = self.replay.get(url, params)
+            if archived is None:
+                raise LookupError(f"{archive_key(url, params)} is not in the archive")
+            return archived.body
+
+        async with self._semaphore:
+            if self.rate_limiter is not None:
+                await asyncio.sleep(self.rate_limiter.reserve())
+            response = await self._client.get(url, params=params)
+
+        # an error page is a failed download, not content to parse
+        response.raise_for_status()
+        if self.archive is not None:
+            self.archive.write(
+                str(response.url),
+                response.content,
+                response.status_code,
+                dict(response.headers),
+                key=archive_key(url, params),
+            )
+        return response.content
+
+    @property
+    def parses_in_processes(self) -> bool:
+        return isinstance(self.executor, ProcessPoolExecutor)
+
+    async def parse(self, parser: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        if not self.parses_in_processes:
+            return await loop.run_in_executor(self.executor, parser, *args)
+
+        result, letters = await loop.run_in_executor(
+            self.executor, collect_failures, parser, *args
+        )
+        FAILURES.add_letters(letters)
+        return result
+
+
+def run_sync(
+    coroutine_function: Callable[..., Awaitable[T]], *args, **fetcher_kwargs
+) -> T:
+    """Run ``coroutine_function(fetcher, *args)`` with a fresh fetcher.
+
+    This is what keeps the plain synchronous API of every scraper working.
+    """
+
+    async def runner() -> T:
+        async with AsyncFetcher(**fetcher_kwargs) as fetcher:
+            return await coroutine_function(fetcher, *args)
+
+    return asyncio.run(runner())
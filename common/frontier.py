@@ -0,0 +1,93 @@
+import hashlib
+import math
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+DEFAULT_QUERY_PARAMS = {("page", "1")}  # first page is the same as no page at all
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize url so that the same page always has the same string.
+
+    Scheme and host are lowercased, default ports, fragments and trailing
+    slashes are dropped, query parameters are sorted and ``?page=1`` removed.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.hostname or ""
+
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+
+    path = parts.path.rstrip("/") or "/"
+
+    query = sorted(
+        param
+        for param in parse_qsl(parts.query, keep_blank_values=True)
+        if param not in DEFAULT_QUERY_PARAMS
+    )
+
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def url_shard(url: str, shards: int) -> int:
+    """Stable shard number of url, the same in every process and run."""
+    digest = hashlib.blake2b(canonicalize_url(url).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % shards
+
+
+class BloomFilter:
+    """Compact set of seen keys with a configurable false-positive rate.
+
+    Memory is fixed when the filter is created: about 1.2 MB per million keys
+    at a 1% error rate. Keys are never reported as missing once added.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate in (0, 1)")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: bytes):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def add(self, key: bytes) -> bool:
+        """Add key and return True if it was (probably) already present."""
+        seen = True
+
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                seen = False
+
+        return seen
+
+    def dump(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.bits)
+
+    def load(self, path: str) -> None:
+        with open(path, "rb") as f:
+            bits = f.read()
+
+        if len(bits) != len(self.bits):
+            raise ValueError(f"{path} was saved with a different capacity/error rate")
+
+        self.bits = bytearray(bits)
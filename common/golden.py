@@ -0,0 +1,91 @@
+"""Streaming comparison of a scraper's CSV output with a golden file.
+
+Both files are read in chunks of rows; a chunk is only compared row by row
+when its digest differs, and at most one chunk of each file is held in
+memory. Missing or extra rows at the end count as divergences too.
+"""
+import csv
+import hashlib
+from dataclasses import dataclass, field
+from itertools import islice, zip_longest
+from typing import Iterator, List, Optional
+
+CHUNK_SIZE = 1000
+MAX_DIVERGENCES = 10
+
+
+@dataclass
+class Divergence:
+    row: int  # 1-based, the header is row 1
+    expected: Optional[List[str]]
+    actual: Optional[List[str]]
+
+    def __str__(self) -> str:
+        return f"row {self.row}:\n  expected: {self.expected}\n  actual:   {self.actual}"
+
+
+@dataclass
+class Comparison:
+    expected_path: str
+    actual_path: str
+    rows: int = 0
+    divergences: List[Divergence] = field(default_factory=list)
+
+    @property
+    def equal(self) -> bool:
+        return not self.divergences
+
+    def __str__(self) -> str:
+        if self.equal:
+            return f"{self.actual_path} matches {self.expected_path} ({self.rows} rows)"
+
+        return "\n".join(
+            [f"{self.actual_path} differs from {self.expected_path}:"]
+            + [str(divergence) for divergence in self.divergences]
+        )
+
+
+def _chunks(path: str, chunk_size: int) -> Iterator[List[List[str]]]:
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        while chunk := list(islice(reader, chunk_size)):
+            yield chunk
+
+
+def _digest(chunk: List[List[str]]) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    for row in chunk:
+        digest.update("\x1f".join(row).encode())
+        digest.update(b"\x1e")
+    return digest.digest()
+
+
+def compare_csv(
+    expected_path: str,
+    actual_path: str,
+    chunk_size: int = CHUNK_SIZE,
+    max_divergences: int = MAX_DIVERGENCES,
+) -> Comparison:
+    comparison = Comparison(expected_path, actual_path)
+    chunks = zip_longest(
+        _chunks(expected_path, chunk_size), _chunks(actual_path, chunk_size), fillvalue=[]
+    )
+
+    for expected_chunk, actual_chunk in chunks:
+        if _digest(expected_chunk) != _digest(actual_chunk):
+            for i, (expected, actual) in enumerate(zip_longest(expected_chunk, actual_chunk)):
+                if expected != actual:
+                    comparison.divergences.append(
+                        Divergence(comparison.rows + i + 1, expected, actual)
+                    )
+                    if len(comparison.divergences) >= max_divergences:
+                        return comparison
+
+        comparison.rows += max(len(expected_chunk), len(actual_chunk))
+
+    return comparison
+
+
+def assert_csv_matches(expected_path: str, actual_path: str, **kwargs) -> None:
+    comparison = compare_csv(expected_path, actual_path, **kwargs)
+    assert comparison.equal, str(comparison)
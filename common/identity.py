@@ -0,0 +1,107 @@
+"""Product identity across the categories of one crawl.
+
+The same product shows up on "home", on its parent category and on its own
+subcategory. A product is identified by its canonical detail url; the
+``ProductCache`` of a crawl keeps the first parsed copy, and every later copy
+references it. ``products()`` is the deduplicated catalog in first-seen order.
+
+Parsers get ``known_keys()``, a live read-only view of the stored keys, and
+skip the products already in it. How much that skips depends on timing: the
+categories of a crawl are fetched concurrently, so a page parsed before the
+pages holding its products are stored parses them again, and the cache keeps
+the first copy.
+"""
+from typing import (
+    Callable, Collection, Dict, Generic, Iterable, KeysView, List, Optional, Sequence, Tuple,
+    TypeVar,
+)
+from urllib.parse import urljoin
+
+from common.frontier import canonicalize_url
+
+T = TypeVar("T")
+S = TypeVar("S")
+
+
+def product_key(base_url: str, href: str) -> str:
+    return canonicalize_url(urljoin(base_url, href))
+
+
+class ProductCache(Generic[T]):
+    def __init__(self):
+        self._products: Dict[str, T] = {}
+        self.hits = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._products
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def known_keys(self) -> KeysView[str]:
+        """The keys stored so far, growing as products are added; not a copy."""
+        return self._products.keys()
+
+    def add(self, key: str, product: Optional[T]) -> T:
+        """Store product unless key is known; return the stored copy.
+
+        ``product`` may be None when the caller skipped parsing a known key.
+        """
+        if key in self._products:
+            self.hits += 1
+            return self._products[key]
+
+        if product is None:
+            raise KeyError(f"{key} was skipped as known but is not in the cache")
+
+        self._products[key] = product
+        return product
+
+    def get_or_parse(self, key: str, parse: Callable[[], T]) -> T:
+        if key in self._products:
+            self.hits += 1
+            return self._products[key]
+
+        return self.add(key, parse())
+
+    def products(self) -> List[T]:
+        return list(self._products.values())
+
+    def items(self) -> List[Tuple[str, T]]:
+        return list(self._products.items())
+
+    def keys_of(self, products: Iterable[T]) -> List[str]:
+        """Keys of products as stored, e.g. the copies ``add`` returned."""
+        keys = {id(product): key for key, product in self._products.items()}
+        return [keys[id(product)] for product in products]
+
+
+def parse_unknown(
+    keys: Sequence[Optional[str]],
+    items: Sequence[S],
+    known_keys: Collection[str],
+    parse_batch: Callable[[List[S]], List[Optional[T]]],
+) -> List[Tuple[str, Optional[T]]]:
+    """``(key, product)`` entries, None for known keys, parsing the rest at once.
+
+    Items ``parse_batch`` could not parse (it returned None for) are left out,
+    as are items without a key (None, e.g. the key extraction failed).
+    """
+    # known_keys may grow meanwhile: look every key up once
+    known = [key is not None and key in known_keys for key in keys]
+    unknown = [
+        item for key, item, is_known in zip(keys, items, known)
+        if key is not None and not is_known
+    ]
+    parsed = iter(parse_batch(unknown))
+    entries = []
+
+    for key, is_known in zip(keys, known):
+        if key is None:
+            continue
+        if is_known:
+            entries.append((key, None))
+        elif (product := next(parsed)) is not None:
+            entries.append((key, product))
+
+    return entries
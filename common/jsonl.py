@@ -0,0 +1,206 @@
+"""Reading large JSONL crawl outputs such as ``books_to_scrape/books.jl``.
+
+``JsonlReader`` builds a sidecar index next to the file (``books.jl.upc.idx``)
+with the key, byte offset, length and a short digest of every line, sorted by
+key. The index is binary, with fixed-width entries (keys padded to the
+longest one), and is memory-mapped rather than loaded: opening a reader costs
+the same for a million lines as for ten, and lookups binary-search the map.
+Lookups and key range scans then read single lines through a memory map of
+the file, and two crawl outputs are diffed by comparing their indexes only -
+no item is parsed unless it is asked for. The index is rebuilt when the file
+changes.
+
+    books = JsonlReader("books.jl", key="upc")
+    books.get("a897fe39b1053632")
+    for title, price in books.iter_items(fields=["title", "price"]): ...
+    for change, upc in diff(JsonlReader("yesterday.jl"), books): ...
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DIGEST_SIZE = 8
+INDEX_VERSION = 2
+INDEX_MAGIC = b"JLINDX"
+# magic, version, size and mtime of the indexed file, key width, entries
+INDEX_HEADER = struct.Struct("<6sHQqII")
+
+
+def _entry_struct(key_width: int) -> struct.Struct:
+    # UTF-8 key padded with NULs, byte offset and length of the line, digest
+    return struct.Struct(f"<{key_width}sQI{DIGEST_SIZE}s")
+
+
+class JsonlReader:
+    def __init__(self, path: str, key: str = "upc"):
+        self.path = path
+        self.key = key
+        self.index_path = f"{path}.{key}.idx"
+
+        self._count = 0
+        self._entry = _entry_struct(0)
+        self._index: Optional[mmap.mmap] = None
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+
+        self._load_index()
+
+    def __enter__(self) -> "JsonlReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def _signature(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _load_index(self) -> None:
+        if os.path.exists(self.index_path) and self._open_index():
+            return
+
+        self.build_index()
+
+    def _open_index(self) -> bool:
+        """Map the index if it is of this version and of the file as it is now."""
+        with open(self.index_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < INDEX_HEADER.size:
+                return False
+            index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, size, mtime_ns, key_width, count = INDEX_HEADER.unpack_from(index)
+        if (magic, version, (size, mtime_ns)) != (INDEX_MAGIC, INDEX_VERSION, self._signature()):
+            index.close()
+            return False
+
+        self._index, self._count, self._entry = index, count, _entry_struct(key_width)
+        return True
+
+    def build_index(self) -> None:
+        signature = self._signature()
+        entries = []
+
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                record = line.strip()
+                if record:
+                    key = str(json.loads(record)[self.key]).encode()
+                    digest = hashlib.blake2b(record, digest_size=DIGEST_SIZE).digest()
+                    entries.append((key, offset, len(line), digest))
+                offset += len(line)
+
+        # UTF-8 bytes sort like the code points of the keys
+        entries.sort(key=lambda entry: entry[0])
+        key_width = max((len(entry[0]) for entry in entries), default=0)
+        entry_struct = _entry_struct(key_width)
+
+        temporary = f"{self.index_path}.tmp"
+        with open(temporary, "wb") as f:
+            header = (INDEX_MAGIC, INDEX_VERSION, *signature, key_width, len(entries))
+            f.write(INDEX_HEADER.pack(*header))
+            for entry in entries:
+                f.write(entry_struct.pack(*entry))
+        os.replace(temporary, self.index_path)
+
+        self.close()
+        if not self._open_index():
+            raise RuntimeError(f"{self.path} changed while it was indexed")
+
+    def _unpack(self, position: int) -> Tuple[bytes, int, int, bytes]:
+        key, offset, length, digest = self._entry.unpack_from(
+            self._index, INDEX_HEADER.size + position * self._entry.size
+        )
+        return key.rstrip(b"\0"), offset, length, digest
+
+    def _bisect(self, key: str) -> int:
+        """Position of the first entry with a key not below ``key``."""
+        target = key.encode()
+        low, high = 0, self._count
+
+        while low < high:
+            middle = (low + high) // 2
+            if self._unpack(middle)[0] < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def _read(self, position: int) -> Dict[str, Any]:
+        if self._mmap is None:
+            self._file = open(self.path, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        _, offset, length, _ = self._unpack(position)
+        return json.loads(self._mmap[offset: offset + length])
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        position = self._bisect(key)
+
+        if position < self._count and self._unpack(position)[0] == key.encode():
+            return self._read(position)
+
+        return None
+
+    def range(self, start: str, stop: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Items with ``start <= key < stop``, in key order."""
+        first = self._bisect(start)
+        last = self._count if stop is None else self._bisect(stop)
+
+        for position in range(first, last):
+            yield self._read(position)
+
+    def digests(self) -> Iterator[Tuple[str, bytes]]:
+        """``(key, digest)`` of every line, in key order."""
+        for position in range(self._count):
+            key, _, _, digest = self._unpack(position)
+            yield key.decode(), digest
+
+    def keys(self) -> List[str]:
+        return [key for key, _ in self.digests()]
+
+    def iter_items(self, fields: Optional[Sequence[str]] = None) -> Iterator[Any]:
+        """Items in file order, lazily; with ``fields`` yields tuples of them."""
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                yield item if fields is None else tuple(item.get(field) for field in fields)
+
+
+def diff(old: JsonlReader, new: JsonlReader) -> Iterator[Tuple[str, str]]:
+    """Yield ``("added" | "removed" | "changed", key)`` in key order.
+
+    Only the indexes are compared: a record changed when its digest did.
+    """
+    old_entries, new_entries = old.digests(), new.digests()
+    old_entry, new_entry = next(old_entries, None), next(new_entries, None)
+
+    while old_entry is not None or new_entry is not None:
+        if new_entry is None or (old_entry is not None and old_entry[0] < new_entry[0]):
+            yield "removed", old_entry[0]
+            old_entry = next(old_entries, None)
+        elif old_entry is None or new_entry[0] < old_entry[0]:
+            yield "added", new_entry[0]
+            new_entry = next(new_entries, None)
+        else:
+            if old_entry[1] != new_entry[1]:
+                yield "changed", new_entry[0]
+            old_entry, new_entry = next(old_entries, None), next(new_entries, None)
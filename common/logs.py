@@ -0,0 +1,23 @@
+"""Logging of the scrapers, set up by their ``main()`` and never on import.
+
+Importing a scraper module opens no files, so tests, benchmarks and worker
+processes can import it from any directory.
+"""
+import logging
+import os
+import sys
+from typing import List, Optional
+
+LOG_FORMAT = "[%(levelname)8s]:  %(message)s"
+LOG_FILE = "parser.log"
+
+
+def configure_logging(log_dir: Optional[str] = None, level: int = logging.INFO) -> None:
+    """Log to stdout, and to ``log_dir/parser.log`` when given (created if missing)."""
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+        handlers.insert(0, logging.FileHandler(os.path.join(log_dir, LOG_FILE)))
+
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=handlers)
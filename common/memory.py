@@ -0,0 +1,259 @@
+"""Keeping long browser runs within their memory.
+
+A run grows in two places: Python objects (soups of ``driver.page_source``
+kept alive, caches) and the browser, whose renderers keep growing over
+thousands of pages. ``MemoryMonitor`` samples both every ``MEMORY_SAMPLE_EVERY``
+pages and logs them: the resident memory of the browser's process tree and,
+with ``MEMORY_TRACEMALLOC=1`` (tracing slows every allocation), the Python
+heap and the lines it grew at most since the run started. A page that keeps
+loading items ("more" clicks) counts its steps with ``step_done`` and is
+sampled every ``MEMORY_SAMPLE_EVERY`` steps too; ``stop`` takes a last
+sample of what was counted since the previous one.
+
+``RecyclingDriver`` hands out one driver and replaces it with a fresh one once
+its browser passes ``BROWSER_MAX_RSS_MB`` or has served ``DRIVER_MAX_PAGES``
+pages:
+
+    with RecyclingDriver(make_driver, monitor=MemoryMonitor()) as browser:
+        for url in urls:
+            with browser.page() as driver:
+                driver.get(url)
+
+Process memory is read with psutil when it is installed, from ``/proc``
+otherwise (Linux); elsewhere the browser is not measured.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+SAMPLE_EVERY = int(os.environ.get("MEMORY_SAMPLE_EVERY", "100"))  # pages, 0 for never
+TRACEMALLOC = os.environ.get("MEMORY_TRACEMALLOC", "0") == "1"
+BROWSER_MAX_RSS = int(os.environ.get("BROWSER_MAX_RSS_MB", "2048")) * 2 ** 20  # 0 for no limit
+DRIVER_MAX_PAGES = int(os.environ.get("DRIVER_MAX_PAGES", "0"))  # 0 for no limit
+TOP_LINES = 5
+
+logger = logging.getLogger(__name__)
+
+
+def _proc_children() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                # the command in parentheses may hold spaces, the fields after it do not
+                ppid = int(f.read().rpartition(")")[2].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue  # exited meanwhile
+        children.setdefault(ppid, []).append(int(name))
+
+    return children
+
+
+def _proc_rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """Resident bytes of the process and all its descendants, None if unknown."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            tree = [process, *process.children(recursive=True)]
+        except psutil.Error:
+            return None
+        rss = 0
+        for member in tree:
+            try:
+                rss += member.memory_info().rss
+            except psutil.Error:
+                pass  # exited meanwhile
+        return rss
+
+    if not os.path.exists(f"/proc/{pid}"):
+        return None
+
+    children = _proc_children()
+    rss, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        rss += _proc_rss(current)
+        pending.extend(children.get(current, []))
+    return rss
+
+
+def browser_rss(driver: WebDriver) -> Optional[int]:
+    """Resident bytes of chromedriver and the browser it started."""
+    process = getattr(getattr(driver, "service", None), "process", None)
+    return None if process is None else process_tree_rss(process.pid)
+
+
+@dataclass
+class MemorySample:
+    pages: int
+    steps: int  # within pages, e.g. "more" clicks
+    browser_rss: Optional[int]  # bytes
+    python_current: Optional[int] = None  # bytes traced by tracemalloc
+    python_peak: Optional[int] = None
+    growth: List[str] = field(default_factory=list)  # top lines since the start
+
+
+def _mib(size: Optional[int]) -> str:
+    return "n/a" if size is None else f"{size / 2 ** 20:.1f} MiB"
+
+
+class MemoryMonitor:
+    def __init__(self, every: int = SAMPLE_EVERY, trace: bool = TRACEMALLOC):
+        self.every = every
+        self.trace = trace
+        self.pages = 0
+        self.steps = 0
+        self.samples: List[MemorySample] = []
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._started_tracing = False
+
+    def _counted_since_sample(self) -> bool:
+        last = self.samples[-1] if self.samples else MemorySample(0, 0, None)
+        return (self.pages, self.steps) != (last.pages, last.steps)
+
+    def start(self) -> None:
+        if self.trace and self._baseline is None:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            self._baseline = tracemalloc.take_snapshot()
+
+    def stop(self, driver: Optional[WebDriver] = None) -> Optional[MemorySample]:
+        """Sample what was counted since the last sample, and stop tracing."""
+        sample = None
+        if self.every and self._counted_since_sample():
+            sample = self.sample(driver)
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._baseline = None
+        return sample
+
+    def sample(self, driver: Optional[WebDriver] = None) -> MemorySample:
+        self.start()
+        sample = MemorySample(
+            self.pages, self.steps, None if driver is None else browser_rss(driver)
+        )
+
+        if self._baseline is not None:
+            sample.python_current, sample.python_peak = tracemalloc.get_traced_memory()
+            growth = tracemalloc.take_snapshot().compare_to(self._baseline, "lineno")
+            sample.growth = [str(stat) for stat in growth[:TOP_LINES] if stat.size_diff > 0]
+
+        self.samples.append(sample)
+        logger.info(
+            f"Memory after {sample.pages} pages, {sample.steps} steps: "
+            f"browser {_mib(sample.browser_rss)}, python {_mib(sample.python_current)} "
+            f"(peak {_mib(sample.python_peak)})"
+        )
+        for line in sample.growth:
+            logger.info(f"  grew: {line}")
+        return sample
+
+    def page_done(self, driver: Optional[WebDriver] = None) -> Optional[MemorySample]:
+        """Count a page, and sample every ``every`` pages."""
+        self.pages += 1
+        if self.every and self.pages % self.every == 0:
+            return self.sample(driver)
+        return None
+
+    def step_done(self, driver: Optional[WebDriver] = None) -> Optional[MemorySample]:
+        """Count a step within a page, and sample every ``every`` steps."""
+        self.steps += 1
+        if self.every and self.steps % self.every == 0:
+            return self.sample(driver)
+        return None
+
+
+class RecyclingDriver:
+    """One driver at a time, replaced when its browser grows too big."""
+
+    def __init__(
+        self,
+        make: Callable[[], WebDriver],
+        max_rss: int = BROWSER_MAX_RSS,
+        max_pages: int = DRIVER_MAX_PAGES,
+        monitor: Optional[MemoryMonitor] = None,
+    ):
+        self.make = make
+        self.max_rss = max_rss
+        self.max_pages = max_pages
+        self.monitor = monitor
+        self.recycled = 0
+        self._driver: Optional[WebDriver] = None
+        self._pages = 0  # served by the current driver
+
+    def __enter__(self) -> RecyclingDriver:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def driver(self) -> WebDriver:
+        if self._driver is None:
+            self._driver = self.make()
+            self._pages = 0
+        return self._driver
+
+    @property
+    def current(self) -> Optional[WebDriver]:
+        """The running driver, None between recycles (does not start one)."""
+        return self._driver
+
+    @contextmanager
+    def page(self) -> Iterator[WebDriver]:
+        """The driver for one page; it may be recycled once the page is done."""
+        try:
+            yield self.driver
+        finally:
+            self.page_done()
+
+    def page_done(self) -> None:
+        self._pages += 1
+        if self.monitor is not None:
+            self.monitor.page_done(self._driver)
+
+        if self.max_pages and self._pages >= self.max_pages:
+            self.recycle(f"{self._pages} pages")
+        elif self.max_rss and self._driver is not None:
+            rss = browser_rss(self._driver)
+            if rss is not None and rss > self.max_rss:
+                self.recycle(f"{_mib(rss)} resident")
+
+    def recycle(self, reason: str) -> None:
+        logger.info(f"Restarting the browser after {reason}")
+        self.close()
+        self.recycled += 1
+
+    def close(self) -> None:
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            finally:
+                self._driver = None
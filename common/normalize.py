@@ -0,0 +1,304 @@
+"""Typed columns from the raw strings a page yields.
+
+A parser collects the raw texts of every item on the page first, then turns
+each field into a typed column at once: ``prices``, ``counts`` and ``texts``
+take a sequence of strings and return a NumPy masked array. Every value
+must match the whole of ``price_pattern(locale)`` or ``COUNT``: "$12abc",
+"$20 - $30", "3x" or "nan" are not read as the number they start with. The
+matched numbers are joined into one string and parsed with a single
+``np.fromstring`` (``astype`` from a string array measured slower than
+``float()`` per value); the values that did not match are masked and counted
+in ``NormalizationErrors`` instead of raising.
+
+    rows = normalize_records(raw_rows, {"price": "price", "num_of_reviews": "count"})
+
+``extract_records`` runs the raw field extraction item by item first, so a
+malformed item is dead-lettered (see ``common.failures``) instead of failing
+the whole page, and dead-letters the items whose fields did not convert too.
+
+Prices accept currency symbols and locale separators ("$1,299.99",
+"£51.77", "1.299,99 €" with ``locale="de"``). A run resets ``ERRORS`` when
+it starts and reports it when it is done, which ``reporting_run`` does for
+every scraper:
+
+    with reporting_run("products"):
+        ...
+
+NumPy is imported with the first column, not with this module.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from common.failures import FAILURES, FailureLog
+
+if TYPE_CHECKING:
+    import numpy as np
+
+CURRENCY_SYMBOLS = ("$", "£", "€", "¥", "₴", "USD", "GBP", "EUR")
+LOCALES = {  # thousands separator, decimal separator
+    "en": (",", "."),
+    "de": (".", ","),
+    "fr": (" ", ","),
+}
+DEFAULT_LOCALE = "en"
+
+# the one whole number in the text: "14 reviews", "In stock (22 available)"
+COUNT = re.compile(r"[^\d]*?(?<![\w.,-])(?P<number>\d{1,3}(?:,\d{3})+|\d+)(?![\w.,-])[^\d]*")
+
+logger = logging.getLogger(__name__)
+
+
+class NormalizationErrors:
+    """Values that did not convert, counted per field, with a few samples."""
+
+    def __init__(self, samples: int = 5):
+        self.samples = samples
+        self.counts: Counter = Counter()
+        self.examples: Dict[str, List[str]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, field: str, raw: Any) -> None:
+        self.counts[field] += 1
+        if len(self.examples[field]) < self.samples:
+            self.examples[field].append(repr(raw))
+        logger.warning(f"Could not normalize {field} from {raw!r}")
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{field}: {count} (e.g. {', '.join(self.examples[field])})"
+            for field, count in self.counts.most_common()
+        )
+
+    def reset(self) -> None:
+        self.counts.clear()
+        self.examples.clear()
+
+
+# Errors of the current run, unless a caller passes its own
+ERRORS = NormalizationErrors()
+
+
+@contextmanager
+def reporting_run(
+    items: str = "products",
+    errors: Optional[NormalizationErrors] = None,
+    failures: Optional[FailureLog] = None,
+) -> Iterator[NormalizationErrors]:
+    """Start a run with no normalization errors; log them and the dead letters after it."""
+    errors = ERRORS if errors is None else errors
+    failures = FAILURES if failures is None else failures
+    errors.reset()
+    try:
+        yield errors
+    finally:
+        if errors:
+            logger.warning(f"Skipped {items} with bad fields: {errors.summary()}")
+        if failures:
+            destination = f" to {failures.path}" if failures.path else ""
+            logger.warning(f"Dead-lettered{destination}: {failures.summary()}")
+
+
+@lru_cache(maxsize=None)
+def price_pattern(locale: str = DEFAULT_LOCALE) -> re.Pattern:
+    """A whole price: an amount with an optional currency before or after it."""
+    thousands, decimal = LOCALES[locale]
+    thousands = r"[ \xa0\u202f]" if thousands.isspace() else re.escape(thousands)
+    fraction = rf"(?:{re.escape(decimal)}\d+)?"
+    amount = rf"-?(?:\d{{1,3}}(?:{thousands}\d{{3}})+{fraction}|\d+{fraction})"
+    currency = "|".join(re.escape(symbol) for symbol in CURRENCY_SYMBOLS)
+    return re.compile(rf"\s*(?:(?:{currency})\s*)?(?P<number>{amount})\s*(?:{currency})?\s*")
+
+
+def _price_number(text: Any, locale: str) -> Optional[str]:
+    """The amount of a price as "1299.99", None if the text is not a price."""
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        return str(float(text)) if math.isfinite(text) else None
+    if not isinstance(text, str):
+        return None
+
+    match = price_pattern(locale).fullmatch(text)
+    if match is None:
+        return None
+
+    thousands, decimal = LOCALES[locale]
+    number = match.group("number")
+    number = re.sub(r"\s", "", number) if thousands.isspace() else number.replace(thousands, "")
+    return number.replace(decimal, ".")
+
+
+def _count_number(text: Any) -> Optional[str]:
+    if isinstance(text, int) and not isinstance(text, bool):
+        return str(text)
+    if not isinstance(text, str):
+        return None
+
+    match = COUNT.fullmatch(text)
+    return None if match is None else match.group("number").replace(",", "")
+
+
+def parse_price(text: Any, locale: str = DEFAULT_LOCALE) -> float:
+    number = _price_number(text, locale)
+    if number is None:
+        raise ValueError(f"Not a price: {text!r}")
+    return float(number)
+
+
+def parse_count(text: Any) -> int:
+    """The one whole number in the text: "14 reviews", "In stock (22 available)"."""
+    number = _count_number(text)
+    if number is None:
+        raise ValueError(f"Not a count: {text!r}")
+    return int(number)
+
+
+def clean_text(text: str) -> str:
+    """Whitespace runs collapsed to single spaces, ends stripped."""
+    return " ".join(text.split())
+
+
+def _empty(dtype) -> np.ma.MaskedArray:
+    import numpy as np
+
+    return np.ma.masked_array(np.zeros(0, dtype=dtype), mask=np.zeros(0, dtype=bool))
+
+
+def _convert(
+    raw: Sequence[Any],
+    numbers: List[Optional[str]],
+    dtype,
+    errors: Optional[NormalizationErrors],
+    field: str,
+) -> np.ma.MaskedArray:
+    """The matched ``numbers`` parsed at once, the values without one masked."""
+    import numpy as np
+
+    errors = ERRORS if errors is None else errors
+    mask = np.fromiter((number is None for number in numbers), dtype=bool, count=len(raw))
+    for value, number in zip(raw, numbers):
+        if number is None:
+            errors.add(field, value)
+
+    values = np.zeros(len(raw), dtype=dtype)
+    if not mask.all():
+        column = "\n".join(number for number in numbers if number is not None)
+        values[~mask] = np.fromstring(column, dtype=dtype, sep="\n")
+
+    return np.ma.masked_array(values, mask=mask)
+
+
+def prices(
+    raw: Sequence[Any],
+    locale: str = DEFAULT_LOCALE,
+    errors: Optional[NormalizationErrors] = None,
+    field: str = "price",
+) -> np.ma.MaskedArray:
+    import numpy as np
+
+    if not len(raw):
+        return _empty(np.float64)
+
+    numbers = [_price_number(value, locale) for value in raw]
+    return _convert(raw, numbers, np.float64, errors, field)
+
+
+def counts(
+    raw: Sequence[Any],
+    errors: Optional[NormalizationErrors] = None,
+    field: str = "count",
+) -> np.ma.MaskedArray:
+    import numpy as np
+
+    if not len(raw):
+        return _empty(np.int64)
+
+    return _convert(raw, [_count_number(value) for value in raw], np.int64, errors, field)
+
+
+def texts(
+    raw: Sequence[Any],
+    errors: Optional[NormalizationErrors] = None,
+    field: str = "text",
+) -> np.ma.MaskedArray:
+    import numpy as np
+
+    mask = np.asarray([value is None for value in raw], dtype=bool)
+    for value in (value for value, missing in zip(raw, mask) if missing):
+        (ERRORS if errors is None else errors).add(field, value)
+
+    values = np.empty(len(raw), dtype=object)
+    values[:] = ["" if value is None else clean_text(value) for value in raw]
+    return np.ma.masked_array(values, mask=mask)
+
+
+CONVERTERS = {"price": prices, "count": counts, "text": texts}
+
+
+def normalize_records(
+    records: Sequence[Optional[Dict[str, Any]]],
+    schema: Dict[str, str],
+    errors: Optional[NormalizationErrors] = None,
+    locale: str = DEFAULT_LOCALE,
+) -> List[Optional[Dict[str, Any]]]:
+    """Convert the ``schema`` fields of every record, a column at a time.
+
+    ``schema`` maps field names to "price", "count" or "text"; other fields
+    are passed through. A record with a field that did not convert becomes
+    None, the others plain dicts of Python values. None records stay None.
+    """
+    import numpy as np
+
+    if any(record is None for record in records):
+        rows = iter(normalize_records(
+            [record for record in records if record is not None], schema, errors, locale
+        ))
+        return [None if record is None else next(rows) for record in records]
+
+    invalid = np.zeros(len(records), dtype=bool)
+    columns = {}
+
+    for name, kind in schema.items():
+        raw = [record.get(name) for record in records]
+        options = {"locale": locale} if kind == "price" else {}
+        column = CONVERTERS[kind](raw, errors=errors, field=name, **options)
+        invalid |= np.ma.getmaskarray(column)
+        columns[name] = column.tolist()
+
+    return [
+        None if invalid[position] else {
+            **record, **{name: column[position] for name, column in columns.items()}
+        }
+        for position, record in enumerate(records)
+    ]
+
+
+def extract_records(
+    items: Sequence[Any],
+    extract: Callable[[Any], Dict[str, Any]],
+    schema: Dict[str, str],
+    errors: Optional[NormalizationErrors] = None,
+    failures: Optional[FailureLog] = None,
+    locale: str = DEFAULT_LOCALE,
+) -> List[Optional[Dict[str, Any]]]:
+    """``normalize_records`` of ``extract(item)`` for every item.
+
+    An item ``extract`` raised for, or with a field that did not convert,
+    becomes None and a dead letter with the item as payload.
+    """
+    failures = FAILURES if failures is None else failures
+    records = failures.isolate(extract, items)
+    rows = normalize_records(records, schema, errors, locale)
+
+    for item, record, row in zip(items, records, rows):
+        if record is not None and row is None:
+            failures.record("item", ValueError(f"Fields did not normalize: {record!r}"), item)
+
+    return rows
@@ -0,0 +1,58 @@
+"""Writing scraped dataclass items as CSV (the scrapers' format), JSONL or SQLite.
+
+CSV rows are ``astuple(item)`` under a header of the dataclass fields; JSONL
+has one ``asdict(item)`` object per line, so nested values like
+``additional_info`` stay structured.
+SQLite upserts the items into ``items.sqlite`` next to the page files, which
+keeps them, and their prices, across runs (see ``common.storage``).
+
+``OUTPUT_FORMAT`` in the environment selects the format of the scrapers' own
+``main()``.
+"""
+import csv
+import json
+import os
+from dataclasses import asdict, astuple, fields
+from typing import Iterable, Optional, Sequence, Type
+
+FORMATS = ("csv", "jsonl", "sqlite")
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "csv")
+STORAGE_FILE = "items.sqlite"
+
+
+def write_items(
+    path: str,
+    item_type: Type,
+    items: Iterable,
+    output_format: str = "csv",
+    keys: Optional[Sequence[str]] = None,
+) -> str:
+    """Write items to ``path`` plus the format's extension, return the file name.
+
+    ``keys`` (the ``product_key`` of every item) are what SQLite keys products by.
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {FORMATS}")
+
+    if output_format == "sqlite":
+        from common.storage import SQLiteStorage
+
+        file_name = os.path.join(os.path.dirname(path), STORAGE_FILE)
+        # the runs of a scraper are told apart by its package: static_pagination.parse
+        with SQLiteStorage(file_name, item_type.__module__.split(".")[0]) as storage:
+            storage.write(items, item_type.__name__, keys)
+        return file_name
+
+    file_name = f"{path}.{output_format}"
+    os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+
+    with open(file_name, "w") as f:
+        if output_format == "csv":
+            writer = csv.writer(f)
+            writer.writerow([field.name for field in fields(item_type)])
+            writer.writerows(astuple(item) for item in items)
+        else:
+            for item in items:
+                f.write(json.dumps(asdict(item), ensure_ascii=False) + "\n")
+
+    return file_name
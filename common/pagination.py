@@ -0,0 +1,160 @@
+"""Finding every page of a listing, whatever its pagination widget shows.
+
+``read_pagination`` reads the widget of a listing page into a ``Pagination``:
+
+- numbered, ``1 2 3 4 5 ›``: the last page is known;
+- truncated, ``1 … 7 8 9 … 40 ›``: still known, from the last number;
+- truncated at the end, ``1 2 3 … ›``, or a next link alone, ``‹ ›``: only
+  that there are more pages, and the highest one linked so far;
+- no widget: a single page.
+
+Infinite-scroll listings load pages of items until one comes back empty;
+``scroll_pagination`` describes such a page. A page without items is past
+the last one in every layout.
+
+``fetch_pages`` fetches the rest of a listing concurrently. While the last
+page is unknown it keeps ``prefetch`` pages in flight beyond the highest
+page known to exist, so the pipe stays full, and once a page shows where
+the listing ends the requests beyond it are cancelled.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+from common.failures import FailureLog, gather_with_retries
+
+T = TypeVar("T")
+
+PREFETCH = 4  # pages requested beyond the highest one known to exist
+ELLIPSES = {"…", "..."}
+NEXT_MARKS = {"›", "»", ">", "next", "next ›", "next →", "→"}
+
+
+@dataclass(frozen=True)
+class Pagination:
+    """What a listing page tells about the pages of its listing."""
+
+    page: int
+    last_page: Optional[int]  # None when the widget does not show it
+    highest_page: int  # highest page linked, known to exist
+    more: bool  # pages may follow this one
+    empty: bool = False  # no items: past the last page
+
+    @property
+    def end(self) -> Optional[int]:
+        """The last page, if this page tells it."""
+        if self.empty:
+            return self.page - 1
+        if self.last_page is not None:
+            return self.last_page
+        return None if self.more else self.page
+
+
+def read_pagination(page_soup, page: int = 1, items: int = 1) -> Pagination:
+    """The ``.pagination`` widget of a listing page holding ``items`` items."""
+    widget = page_soup.select_one(".pagination")
+    if items == 0:
+        return Pagination(page, None, page - 1, False, empty=True)
+    if widget is None:
+        return Pagination(page, page, page, False)
+
+    numbers = []
+    truncated_at_end = has_next = False
+    for item in widget.select("li"):
+        text = item.get_text(strip=True)
+        link = item.select_one("a[href]")
+
+        if text.isdigit():
+            numbers.append(int(text))
+            truncated_at_end = False
+        elif text in ELLIPSES:
+            truncated_at_end = True
+        elif link is not None and (link.get("rel") == ["next"] or text.lower() in NEXT_MARKS):
+            has_next = True
+
+    highest_page = max([page, *numbers])
+    # a window that ends at the current page may not reach the last one
+    shows_last = numbers and not truncated_at_end and not (has_next and highest_page == page)
+    last_page = highest_page if shows_last else None
+    more = has_next or truncated_at_end or (last_page is not None and page < last_page)
+
+    return Pagination(page, last_page, highest_page, more)
+
+
+def scroll_pagination(page: int, items: int, last: Optional[bool] = None) -> Pagination:
+    """A page of an infinite-scroll listing; ``last`` if the site says so."""
+    return Pagination(
+        page, page if last else None, page if items else page - 1, not last, empty=items == 0
+    )
+
+
+async def fetch_pages(
+    fetch: Callable[[int], Awaitable[Tuple[Pagination, T]]],
+    first: Pagination,
+    failures: Optional[FailureLog] = None,
+    prefetch: int = PREFETCH,
+) -> Dict[int, T]:
+    """``fetch(page)`` for every page after ``first``, by page number.
+
+    Pages that keep failing are dead-lettered by ``gather_with_retries`` and
+    left out; pages found to be past the end are dropped.
+    """
+    end, highest_page = first.end, first.highest_page
+    next_page = first.page + 1
+    in_flight: Dict[int, asyncio.Task] = {}
+    results: Dict[int, T] = {}
+
+    def start(page: int) -> asyncio.Task:
+        return asyncio.ensure_future(gather_with_retries(fetch, [page], failures))
+
+    try:
+        while True:
+            horizon = end if end is not None else highest_page + prefetch
+            for page in range(next_page, horizon + 1):
+                in_flight[page] = start(page)
+            next_page = max(next_page, horizon + 1)
+
+            if not in_flight:
+                return dict(sorted(results.items()))
+
+            done, _ = await asyncio.wait(in_flight.values(), return_when=asyncio.FIRST_COMPLETED)
+            for page in [page for page, task in in_flight.items() if task in done]:
+                fetched = in_flight.pop(page).result()
+                if page not in fetched:  # dead-lettered
+                    continue
+
+                pagination, result = fetched[page]
+                if not pagination.empty:
+                    results[page] = result
+                    highest_page = max(highest_page, pagination.highest_page)
+                if pagination.end is not None:
+                    end = pagination.end if end is None else min(end, pagination.end)
+
+            if end is not None:
+                overfetched = [page for page in in_flight if page > end]
+                for page in overfetched:
+                    in_flight.pop(page).cancel()
+                if overfetched:
+                    logging.debug(f"Cancelled {len(overfetched)} pages past the last, {end}")
+                results = {page: result for page, result in results.items() if page <= end}
+    finally:
+        for task in in_flight.values():
+            task.cancel()
+
+
+def walk_pages(
+    fetch: Callable[[int], Tuple[Pagination, T]], first: Pagination
+) -> Iterator[Tuple[int, T]]:
+    """``(page, fetch(page))`` for the pages after ``first``, one at a time."""
+    page, end = first.page, first.end
+
+    while end is None or page < end:
+        page += 1
+        pagination, result = fetch(page)
+        if pagination.empty:
+            return
+
+        yield page, result
+        if pagination.end is not None:
+            end = pagination.end
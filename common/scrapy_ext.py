@@ -0,0 +1,418 @@
+"""Scrapy components shared by ``books_to_scrape`` and ``scrapy_scrapper``.
+
+Enable them from a project's ``settings.py``; see the settings there.
+"""
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from typing import Optional
+
+from scrapy import signals
+from scrapy.dupefilters import BaseDupeFilter
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers, Request, Response
+from scrapy.http.response.html import HtmlResponse
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.project import data_path
+from scrapy.utils.request import fingerprint
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+from common.archive import archive_key, open_archive, open_replay
+from common.failures import FAILURES, FailureBudgetExceeded
+from common.frontier import canonicalize_url, url_shard, BloomFilter
+from common.memory import MemoryMonitor, MemorySample
+from common.storage import DEFAULT_BATCH_SIZE, SQLiteStorage
+
+logger = logging.getLogger(__name__)
+
+
+class CanonicalRequestFingerprinter:
+    """REQUEST_FINGERPRINTER_CLASS that fingerprints the canonical url.
+
+    ``laptops/``, ``laptops?page=1`` and ``laptops?b=2&a=1`` vs
+    ``laptops?a=1&b=2`` all get the same fingerprint.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls()
+
+    def fingerprint(self, request: Request) -> bytes:
+        return fingerprint(request.replace(url=canonicalize_url(request.url)))
+
+
+class BloomDupeFilter(BaseDupeFilter):
+    """DUPEFILTER_CLASS keeping seen fingerprints in a Bloom filter.
+
+    Settings: ``BLOOM_CAPACITY`` (expected number of requests) and
+    ``BLOOM_ERROR_RATE``. With ``JOBDIR`` the filter is saved on close and
+    loaded back when the crawl is resumed.
+    """
+
+    def __init__(self, fingerprinter, capacity: int, error_rate: float, path: str = None):
+        self.fingerprinter = fingerprinter
+        self.seen = BloomFilter(capacity, error_rate)
+        self.path = path
+        self.filtered = 0
+
+        if path and os.path.exists(path):
+            self.seen.load(path)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        job_dir = settings.get("JOBDIR")
+
+        return cls(
+            fingerprinter=crawler.request_fingerprinter,
+            capacity=settings.getint("BLOOM_CAPACITY", 1_000_000),
+            error_rate=settings.getfloat("BLOOM_ERROR_RATE", 0.001),
+            path=os.path.join(job_dir, "requests.bloom") if job_dir else None,
+        )
+
+    def request_seen(self, request: Request) -> bool:
+        if self.seen.add(self.fingerprinter.fingerprint(request)):
+            self.filtered += 1
+            logger.debug("Filtered duplicate request: %s", request)
+            return True
+
+        return False
+
+    def close(self, reason: str) -> None:
+        logger.info("Bloom dupefilter filtered %d requests", self.filtered)
+
+        if self.path:
+            self.seen.dump(self.path)
+
+
+class ShardDownloaderMiddleware:
+    """Only download this shard's part of the requests (see common.sharding).
+
+    Requests whose callback is listed in ``SHARD_CALLBACKS`` are hashed by
+    canonical url into ``SHARD_COUNT`` shards; the other requests (listing
+    pages) are crawled by every shard, so every shard discovers all items.
+    """
+
+    def __init__(self, index: int, count: int, callbacks):
+        self.index = index
+        self.count = count
+        self.callbacks = set(callbacks)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        count = settings.getint("SHARD_COUNT", 1)
+
+        if count <= 1:
+            raise NotConfigured
+
+        return cls(
+            index=settings.getint("SHARD_INDEX"),
+            count=count,
+            callbacks=settings.getlist("SHARD_CALLBACKS"),
+        )
+
+    def process_request(self, request: Request, spider=None):
+        callback = getattr(request.callback, "__name__", None)
+
+        if callback in self.callbacks and url_shard(request.url, self.count) != self.index:
+            raise IgnoreRequest(f"{request.url} belongs to another shard")
+
+
+class DeadLetterMiddleware:
+    """Dead-letter failed pages (see common.failures) and keep a failure budget.
+
+    Enable it twice with the same class: as a spider middleware ordered above
+    ``HttpErrorMiddleware`` (50) it records callback exceptions and error
+    responses such as a 404; as a downloader middleware ordered below
+    ``RetryMiddleware`` (550) it records the requests that still failed after
+    all their retries. Settings: ``DEAD_LETTER_PATH`` (JSONL file) and
+    ``FAILURE_BUDGET``, the failures after which the spider is closed. Both
+    configure the process-wide ``FAILURES``, so items a spider isolates with
+    ``FAILURES.isolate`` end up in the same file and count too.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        budget = settings.get("FAILURE_BUDGET")
+        FAILURES.configure(
+            settings.get("DEAD_LETTER_PATH", FAILURES.path),
+            FAILURES.budget if budget is None else int(budget),
+        )
+        return cls(crawler)
+
+    def _close_spider(self, error: FailureBudgetExceeded) -> None:
+        logger.error("Closing the spider: %s", error)
+        deferred_from_coro(self.crawler.engine.close_spider_async(reason="failure_budget"))
+
+    def _record(self, error: BaseException, url: str) -> None:
+        self.crawler.stats.inc_value("dead_letters/page")
+        try:
+            FAILURES.record("page", error, url)
+        except FailureBudgetExceeded as exceeded:
+            self._close_spider(exceeded)
+
+    def process_spider_exception(self, response: Response, exception: Exception):
+        if isinstance(exception, FailureBudgetExceeded):  # raised by FAILURES.isolate
+            self._close_spider(exception)
+            return []
+
+        self._record(exception, response.url)
+        return None  # still logged, or ignored by HttpErrorMiddleware, as before
+
+    def process_exception(self, request: Request, exception: Exception):
+        if not isinstance(exception, IgnoreRequest):
+            self._record(exception, request.url)
+        return None
+
+
+class SQLitePipeline:
+    """Item pipeline upserting the items into SQLite (see common.storage).
+
+    Subclasses name the table with ``item_type``. Settings: ``SQLITE_PATH``,
+    without it the pipeline is disabled, and ``SQLITE_BATCH_SIZE``, the items
+    buffered per ``executemany``.
+    """
+
+    item_type = "Product"
+
+    def __init__(self, crawler, path: str, batch_size: int):
+        self.crawler = crawler
+        self.path = path
+        self.batch_size = batch_size
+        self.storage = None
+        self.buffer = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get("SQLITE_PATH")
+
+        if not path:
+            raise NotConfigured
+
+        return cls(crawler, path, crawler.settings.getint("SQLITE_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+
+    def open_spider(self) -> None:
+        self.storage = SQLiteStorage(self.path, self.crawler.spider.name, self.batch_size)
+
+    def process_item(self, item):
+        self.buffer.append(item)
+
+        if len(self.buffer) >= self.batch_size:
+            self._flush()
+
+        return item
+
+    def _flush(self) -> None:
+        self.storage.write(self.buffer, self.item_type)
+        self.crawler.stats.inc_value("sqlite/items", len(self.buffer))
+        self.buffer = []
+
+    def close_spider(self) -> None:
+        if self.buffer:
+            self._flush()
+        self.storage.close()
+
+
+class ArchiveDownloaderMiddleware:
+    """Archive raw responses, or replay them without the network (see common.archive).
+
+    ``ARCHIVE_DIR`` appends every successful response to an archive; with
+    ``REPLAY_DIR`` requests are answered from one and a request that is not
+    archived is ignored. Ordered below ``HttpCompressionMiddleware`` (590),
+    so the archive holds decoded bodies; responses from the HTTP cache are
+    not archived again.
+    """
+
+    def __init__(self, crawler, archive_dir, replay_dir):
+        self.crawler = crawler
+        self.archive = open_archive(archive_dir) if archive_dir else None
+        self.replay = open_replay(replay_dir) if replay_dir else None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        archive_dir = crawler.settings.get("ARCHIVE_DIR")
+        replay_dir = crawler.settings.get("REPLAY_DIR")
+
+        if not archive_dir and not replay_dir:
+            raise NotConfigured
+
+        return cls(crawler, archive_dir, replay_dir)
+
+    def process_request(self, request: Request):
+        if self.replay is None:
+            return None
+
+        archived = self.replay.get(request.url)
+        if archived is None:
+            raise IgnoreRequest(f"{request.url} is not in the archive")
+
+        self.crawler.stats.inc_value("archive/replayed")
+        return HtmlResponse(
+            url=request.url,
+            status=archived.status,
+            headers=archived.headers,
+            body=archived.body,
+            request=request,
+            flags=["replayed"],
+        )
+
+    def process_response(self, request: Request, response: Response):
+        # responses from the archive or the HTTP cache were archived when downloaded
+        downloaded = not {"replayed", "cached"} & set(response.flags)
+        if self.archive is not None and downloaded and 200 <= response.status < 300:
+            self.archive.write(
+                response.url,
+                response.body,
+                response.status,
+                response.headers.to_unicode_dict(),
+                key=archive_key(request.url),
+            )
+            self.crawler.stats.inc_value("archive/written")
+        return response
+
+
+class SQLiteCacheStorage:
+    """HTTPCACHE_STORAGE keeping the cache of a spider in one SQLite file.
+
+    ``{HTTPCACHE_DIR}/{spider}.sqlite`` has a row per request fingerprint
+    (its primary key) with the zlib-compressed headers and body, instead of
+    the directory of four small files per request of the filesystem storage.
+    Once the stored bytes pass ``HTTPCACHE_MAX_SIZE`` (0 for no limit) the
+    oldest responses are evicted down to ``HTTPCACHE_EVICT_TO`` of it.
+    ``HTTPCACHE_EXPIRATION_SECS`` and the cache policies work as usual.
+    """
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings["HTTPCACHE_DIR"], createdir=True)
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.max_size = settings.getint("HTTPCACHE_MAX_SIZE")
+        self.evict_to = settings.getfloat("HTTPCACHE_EVICT_TO", 0.8)
+        self.compress_level = settings.getint("HTTPCACHE_COMPRESS_LEVEL", 6)
+        self.connection = None
+        self.size = 0
+
+    def open_spider(self, spider) -> None:
+        path = os.path.join(self.cachedir, f"{spider.name}.sqlite")
+        self.connection = sqlite3.connect(path, isolation_level=None)  # autocommit
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "fingerprint BLOB PRIMARY KEY, stored_at REAL NOT NULL, size INTEGER NOT NULL, "
+            "url TEXT NOT NULL, status INTEGER NOT NULL, headers BLOB, body BLOB)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_stored_at ON responses (stored_at)"
+        )
+        self.size = self._stored_size()
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        logger.debug(f"Using SQLite cache storage in {path}")
+
+    def close_spider(self, spider) -> None:
+        self.connection.close()
+
+    def _stored_size(self) -> int:
+        query = "SELECT COALESCE(SUM(size), 0) FROM responses"
+        return self.connection.execute(query).fetchone()[0]
+
+    def retrieve_response(self, spider, request: Request):
+        row = self.connection.execute(
+            "SELECT stored_at, url, status, headers, body FROM responses WHERE fingerprint = ?",
+            (self._fingerprinter.fingerprint(request),),
+        ).fetchone()
+        if row is None:
+            return None  # not cached
+
+        stored_at, url, status, headers, body = row
+        if 0 < self.expiration_secs < time.time() - stored_at:
+            return None  # expired
+
+        headers = Headers(headers_raw_to_dict(zlib.decompress(headers)))
+        body = zlib.decompress(body)
+        request.meta["cache_timestamp"] = stored_at
+        response_class = responsetypes.from_args(headers=headers, url=url, body=body)
+        return response_class(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider, request: Request, response: Response) -> None:
+        headers = zlib.compress(headers_dict_to_raw(response.headers), self.compress_level)
+        body = zlib.compress(response.body, self.compress_level)
+        size = len(headers) + len(body)
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses "
+            "(fingerprint, stored_at, size, url, status, headers, body) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                self._fingerprinter.fingerprint(request), time.time(), size,
+                response.url, response.status, headers, body,
+            ),
+        )
+        self.size += size  # a replaced row is counted twice until the next eviction
+
+        if self.max_size and self.size > self.max_size:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Delete the oldest responses until the newest fit in ``evict_to`` of the limit."""
+        self.connection.execute(
+            "DELETE FROM responses WHERE fingerprint IN ("
+            "SELECT fingerprint FROM (SELECT fingerprint, "
+            "SUM(size) OVER (ORDER BY stored_at DESC, fingerprint) AS newer_size "
+            "FROM responses) WHERE newer_size > ?)",
+            (self.max_size * self.evict_to,),
+        )
+        self.size = self._stored_size()
+
+
+class MemoryMonitorExtension:
+    """Sample the memory of the run every ``MEMORY_SAMPLE_EVERY`` responses.
+
+    Samples are logged (see common.memory) and their maxima kept in the
+    stats; the browser measured is the spider's ``browser``, a
+    ``RecyclingDriver``, if it has one. ``MEMORY_TRACEMALLOC`` also traces
+    the Python heap.
+    """
+
+    def __init__(self, crawler, monitor: MemoryMonitor):
+        self.crawler = crawler
+        self.monitor = monitor
+        crawler.signals.connect(self.response_received, signal=signals.response_received)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        every = crawler.settings.getint("MEMORY_SAMPLE_EVERY")
+
+        if not every:
+            raise NotConfigured
+
+        return cls(crawler, MemoryMonitor(every, crawler.settings.getbool("MEMORY_TRACEMALLOC")))
+
+    def _browser(self):
+        return getattr(self.crawler.spider, "browser", None)
+
+    def response_received(self) -> None:
+        browser = self._browser()
+        self._record(self.monitor.page_done(None if browser is None else browser.current))
+
+    def _record(self, sample: Optional[MemorySample]) -> None:
+        if sample is not None:
+            stats = self.crawler.stats
+            if sample.browser_rss is not None:
+                stats.max_value("memory/browser_rss_max", sample.browser_rss)
+            if sample.python_peak is not None:
+                stats.max_value("memory/python_peak", sample.python_peak)
+
+    def spider_closed(self) -> None:
+        browser = self._browser()
+        self._record(self.monitor.stop(None if browser is None else browser.current))
+        if browser is not None:
+            self.crawler.stats.set_value("memory/browser_recycled", browser.recycled)
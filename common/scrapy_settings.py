@@ -0,0 +1,38 @@
+"""The production profile shared by the Scrapy projects.
+
+Each project's ``settings.py`` starts with ``from common.scrapy_settings import *``
+and overrides what differs below it. The profile obeys robots.txt, lets
+AutoThrottle pace the requests to the latency of each site within a per-domain
+concurrency cap, and caches responses in one SQLite file per spider
+(``common.scrapy_ext.SQLiteCacheStorage``) rather than in a directory per
+request. ``python -m local_sites.cache_benchmark`` compares the storages
+against the stand-in sites.
+"""
+
+# Crawl responsibly: robots.txt rules, a cap per site, AutoThrottle pacing
+ROBOTSTXT_OBEY = True
+CONCURRENT_REQUESTS = 32
+CONCURRENT_REQUESTS_PER_DOMAIN = 8
+AUTOTHROTTLE_ENABLED = True
+AUTOTHROTTLE_START_DELAY = 1.0
+AUTOTHROTTLE_MAX_DELAY = 30.0
+# requests in flight to one site that AutoThrottle aims at
+AUTOTHROTTLE_TARGET_CONCURRENCY = 4.0
+
+# Ask for compressed pages, and refuse decompression bombs
+COMPRESSION_ENABLED = True
+DOWNLOAD_WARNSIZE = 8 * 1024 * 1024
+DOWNLOAD_MAXSIZE = 64 * 1024 * 1024
+
+# Re-runs within the hour (a crash, a parser fix) are answered from the
+# cache; error pages are not cached so that they are retried
+HTTPCACHE_ENABLED = True
+HTTPCACHE_STORAGE = "common.scrapy_ext.SQLiteCacheStorage"
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_EXPIRATION_SECS = 60 * 60
+HTTPCACHE_IGNORE_HTTP_CODES = [408, 429, 500, 502, 503, 504, 522, 524]
+HTTPCACHE_MAX_SIZE = 1024 * 1024 * 1024  # bytes, compressed
+HTTPCACHE_EVICT_TO = 0.8  # share of the limit kept once it is passed
+HTTPCACHE_COMPRESS_LEVEL = 6
+
+__all__ = [name for name in dir() if name.isupper()]
@@ -0,0 +1,332 @@
+"""Run one scraper as several worker processes and merge their outputs.
+
+Requests-based scrapers (``all_in_one``, ``static_pagination``) are split into
+units of work - one category page each - and the units are sharded across
+worker processes by category, by contiguous page range or by url hash. Every
+worker writes its own shard file of keyed products; the shards are then merged
+in category and page order and written by the module's ``write_all_products``,
+so the output (any ``OUTPUT_FORMAT``, the changefeed, the dead letters) is
+the one a single-process run writes.
+
+Scrapy spiders are sharded by url hash: every shard is a ``scrapy crawl``
+process that only downloads the requests hashed to it (see
+``common.scrapy_ext.ShardDownloaderMiddleware``) and the JSONL shards are
+merged sorted by a key field, ``--key`` or the project's ``SHARD_KEY``. A
+project without ``SHARD_CALLBACKS`` would crawl everything in every shard and
+is not sharded.
+
+All workers share one rate limit, so adding workers adds throughput without
+hitting the site harder than configured.
+
+    python -m common.sharding static_pagination.parse --workers 4 --rate 20
+    python -m common.sharding books --project books_to_scrape -o books.jl
+"""
+import argparse
+import ast
+import asyncio
+import heapq
+import importlib
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from types import ModuleType
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from common.failures import FAILURES, FailureLog, collect_failures, gather_with_retries
+from common.fetch import AsyncFetcher, IntervalRateLimiter, run_sync
+from common.frontier import url_shard
+from common.identity import ProductCache
+from common.logs import configure_logging
+from common.normalize import reporting_run
+from common.pagination import Pagination, fetch_pages
+from common.soup import make_soup
+
+STRATEGIES = ("category", "range", "hash")
+
+
+class SharedRateLimiter(IntervalRateLimiter):
+    """Process-safe rate limit: at most ``rate`` requests per second overall.
+
+    The next free time slot lives in shared memory and is booked under its
+    lock, so the limiter can be handed to worker processes.
+    """
+
+    def __init__(self, rate: float):
+        self._shared_slot = multiprocessing.Value("d", 0.0)
+        super().__init__(rate)
+
+    @property
+    def _next_slot(self) -> float:
+        return self._shared_slot.value
+
+    @_next_slot.setter
+    def _next_slot(self, slot: float) -> None:
+        self._shared_slot.value = slot
+
+    def reserve(self) -> float:
+        with self._shared_slot.get_lock():
+            return super().reserve()
+
+
+@dataclass(frozen=True, order=True)
+class Unit:
+    rank: int  # position of the category in module.PAGES
+    category: str
+    url: str
+    page: int
+
+    @property
+    def params(self) -> Optional[Dict[str, int]]:
+        return {"page": self.page} if self.page > 1 else None
+
+
+def shard_units(units: Sequence[Unit], workers: int, strategy: str) -> List[List[Unit]]:
+    shards = [[] for _ in range(workers)]
+
+    if strategy == "category":
+        for unit in units:
+            shards[unit.rank % workers].append(unit)
+    elif strategy == "range":
+        size = max(1, -(-len(units) // workers))  # ceil, and no zero step without units
+        shards = [list(units[i: i + size]) for i in range(0, len(units), size)]
+    elif strategy == "hash":
+        for unit in units:
+            shards[url_shard(f"{unit.url}?page={unit.page}", workers)].append(unit)
+    else:
+        raise ValueError(f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}")
+
+    return [shard for shard in shards if shard]
+
+
+async def discover_units(fetcher: AsyncFetcher, module: ModuleType) -> List[Unit]:
+    """Every page of every category; a module without ``parse_pagination`` has one."""
+
+    async def read_page(url: str, page: int) -> Tuple[Pagination, None]:
+        content = await fetcher.get(url, params={"page": page} if page > 1 else None)
+        return await fetcher.parse(module.parse_pagination, content, page), None
+
+    async def count_pages(url: str) -> int:
+        if not hasattr(module, "parse_pagination"):
+            return 1
+        first, _ = await read_page(url, 1)
+        if first.end is not None:
+            return first.end
+
+        # the widget hides the last page: walk the listing to where it ends
+        failures = FailureLog()
+        pages = await fetch_pages(lambda page: read_page(url, page), first, failures)
+        if failures:
+            raise RuntimeError(f"Could not find the last page of {url}: {failures.summary()}")
+        return max(pages, default=first.page)
+
+    pages = await asyncio.gather(*(count_pages(url) for url in module.PAGES.values()))
+
+    return [
+        Unit(rank, category, url, page)
+        for rank, ((category, url), num_pages) in enumerate(zip(module.PAGES.items(), pages))
+        for page in range(1, num_pages + 1)
+    ]
+
+
+_rate_limiter: Optional[SharedRateLimiter] = None
+
+
+def _init_worker(rate_limiter: SharedRateLimiter) -> None:
+    global _rate_limiter
+    _rate_limiter = rate_limiter
+
+
+def parse_unit_entries(module_name: str, content: bytes) -> List[Tuple[str, Any]]:
+    """``(key, product)`` of every product on a page, parsed by the module."""
+    module = importlib.import_module(module_name)
+    return module.get_single_page_entries(make_soup(content, module.PARSE_REGION))
+
+
+async def _fetch_units(fetcher: AsyncFetcher, module: ModuleType, units: List[Unit]):
+    async def fetch_unit(unit: Unit):
+        content = await fetcher.get(unit.url, params=unit.params)
+        return await fetcher.parse(parse_unit_entries, module.__name__, content)
+
+    # a unit that keeps failing is dead-lettered, the shard is written without it
+    return await gather_with_retries(fetch_unit, units)
+
+
+def _write_shard(module_name: str, units: List[Unit], shard_path: str) -> str:
+    module = importlib.import_module(module_name)
+    units = sorted(units)
+    units_entries = run_sync(_fetch_units, module, units, rate_limiter=_rate_limiter)
+
+    with open(shard_path, "w") as f:
+        for unit, entries in units_entries.items():
+            f.writelines(
+                json.dumps([unit.rank, unit.page, position, key, asdict(product)]) + "\n"
+                for position, (key, product) in enumerate(entries)
+            )
+
+    return shard_path
+
+
+def run_shard(
+    module_name: str, units: List[Unit], shard_path: str
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """Worker: scrape units into ``[rank, page, position, key, product]`` lines.
+
+    Returns the shard path and the dead letters, which the parent records.
+    """
+    return collect_failures(_write_shard, module_name, units, shard_path)
+
+
+def _read_shard(shard_path: str) -> Iterator[list]:
+    with open(shard_path) as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def merge_shards(module: ModuleType, shard_paths: List[str]) -> None:
+    """Write the merged products with the module's own writer, in page order."""
+    categories = list(module.PAGES)
+    pages = {category: [] for category in categories}
+    cache = ProductCache()
+
+    # units are unique to a shard, so (rank, page, position) never ties
+    for rank, _, _, key, record in heapq.merge(*(_read_shard(path) for path in shard_paths)):
+        pages[categories[rank]].append(cache.add(key, module.Product(**record)))
+
+    module.write_all_products(pages, cache)
+
+
+def run_module(module_name: str, workers: int, strategy: str, rate: float) -> None:
+    module = importlib.import_module(module_name)
+    rate_limiter = SharedRateLimiter(rate)
+
+    with reporting_run("products"):
+        units = run_sync(discover_units, module, rate_limiter=rate_limiter)
+        shards = shard_units(units, workers, strategy)
+
+        if not shards:  # no pages: every category is written empty
+            merge_shards(module, [])
+            return
+
+        with tempfile.TemporaryDirectory(prefix="shards-") as shard_dir:
+            with ProcessPoolExecutor(
+                max_workers=len(shards),
+                initializer=_init_worker,
+                initargs=(rate_limiter,),
+            ) as executor:
+                results = list(
+                    executor.map(
+                        run_shard,
+                        [module_name] * len(shards),
+                        shards,
+                        [os.path.join(shard_dir, f"shard-{i}.jl") for i in range(len(shards))],
+                    )
+                )
+
+            for _, letters in results:
+                FAILURES.add_letters(letters)
+            merge_shards(module, [shard_path for shard_path, _ in results])
+
+
+def merge_jsonl(shard_paths: List[str], output_path: str, key: str) -> None:
+    """Sort every shard by ``key`` and merge them into one JSONL file."""
+    for path in shard_paths:
+        with open(path) as f:
+            lines = sorted(f, key=lambda line: json.loads(line)[key])
+        with open(path, "w") as f:
+            f.writelines(lines)
+
+    files = [open(path) for path in shard_paths]
+    try:
+        with open(output_path, "w") as output:
+            output.writelines(
+                heapq.merge(*files, key=lambda line: json.loads(line)[key])
+            )
+    finally:
+        for f in files:
+            f.close()
+
+
+def project_setting(project_dir: str, name: str) -> Any:
+    """A setting of the Scrapy project in ``project_dir``, None if it is not set."""
+    output = subprocess.run(
+        [sys.executable, "-m", "scrapy", "settings", "--get", name],
+        cwd=project_dir, capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    try:
+        return ast.literal_eval(output)
+    except (ValueError, SyntaxError):
+        return output
+
+
+def run_spider(
+    spider: str,
+    project_dir: str,
+    workers: int,
+    output_path: str,
+    key: Optional[str] = None,
+    rate: float = 0,
+) -> None:
+    """Crawl with ``workers`` shards and merge them by ``key``, or by ``SHARD_KEY``."""
+    if not project_setting(project_dir, "SHARD_CALLBACKS"):
+        raise ValueError(
+            f"{project_dir} sets no SHARD_CALLBACKS: every shard would crawl every item"
+        )
+    key = key or project_setting(project_dir, "SHARD_KEY")
+    if not key:
+        raise ValueError(f"{project_dir} sets no SHARD_KEY to merge by, pass --key")
+
+    # Every shard gets an equal part of the overall rate limit
+    download_delay = workers / rate if rate else 0
+
+    with tempfile.TemporaryDirectory(prefix="shards-") as shard_dir:
+        shard_paths = [os.path.join(shard_dir, f"shard-{i}.jl") for i in range(workers)]
+        processes = [
+            subprocess.Popen(
+                [
+                    sys.executable, "-m", "scrapy", "crawl", spider,
+                    "-O", shard_path,
+                    "-s", f"SHARD_INDEX={i}",
+                    "-s", f"SHARD_COUNT={workers}",
+                    "-s", f"DOWNLOAD_DELAY={download_delay}",
+                ],
+                cwd=project_dir,
+            )
+            for i, shard_path in enumerate(shard_paths)
+        ]
+
+        for process in processes:
+            if process.wait() != 0:
+                raise RuntimeError(f"Shard {process.args} exited with {process.returncode}")
+
+        merge_jsonl(shard_paths, output_path, key)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("target", help="scraper module (static_pagination.parse) or spider name")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--strategy", choices=STRATEGIES, default="range")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="requests per second, 0 for no limit"
+    )
+    parser.add_argument("--project", help="Scrapy project directory, for spiders")
+    parser.add_argument("-o", "--output", help="merged JSONL output, for spiders")
+    parser.add_argument(
+        "--key", help="field to merge spider outputs by, the project's SHARD_KEY by default"
+    )
+    args = parser.parse_args(argv)
+
+    if args.project:
+        run_spider(args.target, args.project, args.workers, args.output, args.key, args.rate)
+    else:
+        configure_logging()
+        run_module(args.target, args.workers, args.strategy, args.rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Soup construction restricted to the part of the page a scraper reads.
+
+Every scraper module declares its ``PARSE_REGION``: a ``Region`` matching the
+elements it selects from (``.thumbnail``, ``.pagination``, ``.quote``...).
+Only those subtrees are built, so headers, scripts, menus and footers cost
+tokenizing time but no tree memory. Set ``PARTIAL_PARSING=0`` in the
+environment to build full documents, e.g. when debugging a selector.
+
+Sites built with CSS modules hash their class names
+(``CourseCard_cardContainer__x1Ab``); ``class_index`` maps the unhashed names
+to their elements in one pass over the tree, instead of a ``[class^=...]``
+selector scanning every element per lookup.
+
+bs4 is imported on the first soup, not with the scraper module.
+"""
+from __future__ import annotations
+
+import os
+from collections import defaultdict
+from functools import cached_property
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, SoupStrainer, Tag
+
+PARSER = "html.parser"
+PARTIAL_PARSING = os.environ.get("PARTIAL_PARSING", "1") != "0"
+
+
+class Region:
+    """``SoupStrainer`` arguments; the strainer is built on first use."""
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    @cached_property
+    def strainer(self) -> SoupStrainer:
+        from bs4 import SoupStrainer
+
+        return SoupStrainer(*self.args, **self.kwargs)
+
+
+def make_soup(
+    markup: Union[str, bytes], region: Optional[Union[Region, SoupStrainer]] = None
+) -> BeautifulSoup:
+    from bs4 import BeautifulSoup
+
+    if isinstance(region, Region):
+        region = region.strainer
+
+    return BeautifulSoup(
+        markup, PARSER, parse_only=region if PARTIAL_PARSING else None
+    )
+
+
+def class_index(soup: BeautifulSoup, separator: str = "__") -> Dict[str, List[Tag]]:
+    """Elements by class name without its CSS-module hash, in document order."""
+    index: Dict[str, List[Tag]] = defaultdict(list)
+
+    for element in soup.find_all(class_=True):
+        names = dict.fromkeys(class_name.split(separator, 1)[0] for class_name in element["class"])
+        for name in names:
+            index[name].append(element)
+
+    return index
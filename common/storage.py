@@ -0,0 +1,212 @@
+"""SQLite storage of scraped items, with history across runs.
+
+Every item type has its table, keyed by the item's natural key (a book's
+UPC, a quote's author and text...), so a run updates the rows it saw instead
+of overwriting a file. Products are keyed like the product cache and the
+changefeed, by ``product_key`` (the canonical url) which the writer passes in
+``keys``, within the ``source`` - the scraper or spider - that found them, as
+the scrapers share one products table. Rows remember the first and the last
+run that saw them, and for items with a price every run adds a snapshot to
+the ``{table}_prices`` table:
+
+    SELECT run_id, price FROM products_prices WHERE source = ? AND url = ? ORDER BY run_id
+
+Items are upserted with one ``executemany`` per batch, each batch in its own
+transaction, and the database runs in WAL mode, so readers can query it
+while a crawl writes. All writes of one process for the same scraper belong
+to one run.
+"""
+import json
+import os
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, is_dataclass
+from enum import Enum
+from itertools import islice
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+DEFAULT_BATCH_SIZE = 1000
+RUN_STARTED = time.time()  # identifies the runs of this process
+
+
+@dataclass(frozen=True)
+class Table:
+    name: str
+    key: Tuple[str, ...]  # natural key columns
+    columns: Tuple[str, ...]  # the other columns
+    price: Optional[str] = None  # column snapshotted into {name}_prices every run
+
+    @property
+    def all_columns(self) -> Tuple[str, ...]:
+        return self.key + self.columns
+
+
+# By item type: the dataclass name, or what a Scrapy pipeline passes for dicts
+TABLES: Dict[str, Table] = {
+    "Product": Table(
+        "products",
+        ("source", "url"),
+        ("title", "description", "price", "rating", "num_of_reviews", "additional_info"),
+        price="price",
+    ),
+    "Book": Table(
+        "books",
+        ("upc",),
+        ("title", "price", "amount_in_stock", "rating", "category", "description"),
+        price="price",
+    ),
+    "Quote": Table("quotes", ("author", "text"), ("tags",)),
+    "Course": Table("courses", ("name", "type"), ("short_description",)),
+}
+
+
+def _sql_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _key_value(value: Any) -> Any:
+    # SQLite keys treat NULLs as distinct, so a NULL would insert a new row every run
+    return "" if value is None else _sql_value(value)
+
+
+def _batches(items: Iterable, size: int) -> Iterable[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class SQLiteStorage:
+    def __init__(self, path: str, scraper: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.scraper = scraper
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # durable enough with WAL
+        self._create_tables()
+        self.run_id = self._start_run(scraper)
+
+    def __enter__(self) -> "SQLiteStorage":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _create_tables(self) -> None:
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "id INTEGER PRIMARY KEY, scraper TEXT NOT NULL, started_at REAL NOT NULL, "
+                "finished_at REAL, UNIQUE (scraper, started_at))"
+            )
+            for table in TABLES.values():
+                key = ", ".join(table.key)
+                key_columns = ", ".join(f"{column} NOT NULL" for column in table.key)
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table.name} ("
+                    f"{key_columns}, {', '.join(table.columns)}, "
+                    f"first_run INTEGER, last_run INTEGER, PRIMARY KEY ({key}))"
+                )
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table.name}_last_run "
+                    f"ON {table.name} (last_run)"
+                )
+                if table.price is not None:
+                    self.connection.execute(
+                        f"CREATE TABLE IF NOT EXISTS {table.name}_prices ("
+                        f"run_id INTEGER, {key_columns}, price REAL, PRIMARY KEY ({key}, run_id))"
+                    )
+
+    def _start_run(self, scraper: str) -> int:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO runs (scraper, started_at) VALUES (?, ?)",
+                (scraper, RUN_STARTED),
+            )
+            (run_id,) = self.connection.execute(
+                "SELECT id FROM runs WHERE scraper = ? AND started_at = ?",
+                (scraper, RUN_STARTED),
+            ).fetchone()
+        return run_id
+
+    def write(
+        self,
+        items: Iterable,
+        item_type: Optional[str] = None,
+        keys: Optional[Sequence[str]] = None,
+    ) -> int:
+        """Upsert dataclass items (or dicts of ``item_type``), return how many.
+
+        ``keys`` are the items' ``product_key``s; without them an item needs a ``url``.
+        """
+        written = 0
+        entries = zip(items, keys) if keys is not None else ((item, None) for item in items)
+
+        for batch in _batches(entries, self.batch_size):
+            table = TABLES[item_type or type(batch[0][0]).__name__]
+            records = [self._record(table, item, key) for item, key in batch]
+            rows = [
+                (
+                    *(_key_value(record.get(column)) for column in table.key),
+                    *(_sql_value(record.get(column)) for column in table.columns),
+                )
+                for record in records
+            ]
+
+            with self.connection:
+                self._upsert(table, rows)
+                if table.price is not None:
+                    self._snapshot_prices(table, records)
+
+            written += len(rows)
+
+        return written
+
+    def _record(self, table: Table, item: Any, key: Optional[str]) -> Dict[str, Any]:
+        record = asdict(item) if is_dataclass(item) else dict(item)
+
+        if "source" in table.key:
+            record["source"] = self.scraper
+        if key is not None:
+            record["url"] = key
+        if "url" in table.key and not record.get("url"):
+            raise ValueError(f"{table.name} are keyed by url: pass the keys of {item!r}")
+        return record
+
+    def _upsert(self, table: Table, rows: list) -> None:
+        columns = ", ".join(table.all_columns)
+        placeholders = ", ".join("?" for _ in table.all_columns)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in table.columns)
+
+        self.connection.executemany(
+            f"INSERT INTO {table.name} ({columns}, first_run, last_run) "
+            f"VALUES ({placeholders}, {self.run_id}, {self.run_id}) "
+            f"ON CONFLICT ({', '.join(table.key)}) DO UPDATE SET "
+            f"{updates}, last_run = excluded.last_run",
+            rows,
+        )
+
+    def _snapshot_prices(self, table: Table, records: list) -> None:
+        columns = ", ".join(table.key)
+        placeholders = ", ".join("?" for _ in table.key)
+
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO {table.name}_prices (run_id, {columns}, price) "
+            f"VALUES ({self.run_id}, {placeholders}, ?)",
+            [
+                (*(_key_value(record.get(column)) for column in table.key), record[table.price])
+                for record in records
+            ],
+        )
+
+    def close(self) -> None:
+        with self.connection:
+            self.connection.execute(
+                "UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), self.run_id)
+            )
+        self.connection.close()
@@ -0,0 +1,77 @@
+import asyncio
+import gzip
+import os
+from urllib.parse import urljoin
+
+import pytest
+
+from common.archive import ArchiveReader, ArchiveWriter, PageDirectory, open_replay
+from common.fetch import AsyncFetcher
+from local_sites.catalog import Catalog
+from local_sites.server import SiteConfig, running_sites
+
+
+def test_records_are_read_back_by_key_and_in_order(tmp_path):
+    archive = ArchiveWriter(str(tmp_path), segment_size=1)  # a segment per record
+    archive.write("http://shop.test/laptops/", b"<p>old</p>", headers={"Content-Encoding": "gzip"})
+    archive.write("http://shop.test/tablets", b"<p>tablets</p>" * 50)
+    archive.write("http://shop.test/laptops?page=1", b"<p>new</p>")
+    archive.close()
+
+    replay = ArchiveReader(str(tmp_path))
+    segments = sorted(name for name in os.listdir(tmp_path) if name.startswith("segment-"))
+
+    assert len(segments) == 3
+    assert len(replay) == 2
+    assert replay.get("http://shop.test/laptops").body == b"<p>new</p>"
+    assert replay.get("http://shop.test/laptops", {"page": 2}) is None
+    assert [response.url for response in replay] == [
+        "http://shop.test/tablets", "http://shop.test/laptops?page=1"
+    ]
+    assert replay.get("http://shop.test/tablets").headers == {}
+
+
+def test_segment_is_one_gzip_stream(tmp_path):
+    archive = ArchiveWriter(str(tmp_path))
+    archive.write("http://shop.test/laptops", b"<p>laptops</p>")
+    archive.write("http://shop.test/tablets", b"<p>tablets</p>")
+    archive.close()
+
+    (segment,) = [name for name in os.listdir(tmp_path) if name.startswith("segment-")]
+    with gzip.open(tmp_path / segment) as f:
+        content = f.read()
+
+    assert content.count(b'"url"') == 2
+    assert content.endswith(b"<p>tablets</p>")
+
+
+def test_saved_pages_are_read_like_an_archive(tmp_path):
+    site = tmp_path / "shop.test:8000" / "laptops"
+    site.mkdir(parents=True)
+    (site / "index.html").write_bytes(b"<p>laptops</p>")
+    (site / "index.html?page=2").write_bytes(b"<p>laptops 2</p>")
+
+    pages = open_replay(str(tmp_path))
+
+    assert isinstance(pages, PageDirectory)
+    assert len(pages) == 2
+    assert pages.get("https://shop.test:8000/laptops/").body == b"<p>laptops</p>"
+    assert pages.get("http://shop.test:8000/laptops", {"page": 2}).body == b"<p>laptops 2</p>"
+    assert pages.get("http://shop.test:8000/tablets") is None
+
+
+def test_fetcher_replays_an_archived_crawl_without_the_network(tmp_path):
+    async def crawl(url, **archive_options):
+        async with AsyncFetcher(4, **archive_options) as fetcher:
+            return await asyncio.gather(*(fetcher.get(url, {"page": page}) for page in (1, 2)))
+
+    with running_sites(SiteConfig(Catalog(30))) as base_urls:
+        url = urljoin(base_urls["webscraper"], "test-sites/e-commerce/static/computers/laptops")
+        archive = ArchiveWriter(str(tmp_path))
+        live = asyncio.run(crawl(url, archive=archive))
+        archive.close()
+
+    replay = ArchiveReader(str(tmp_path))
+    assert asyncio.run(crawl(url, replay=replay)) == live
+    with pytest.raises(LookupError):
+        asyncio.run(crawl(urljoin(url, "tablets"), replay=replay))
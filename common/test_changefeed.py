@@ -0,0 +1,41 @@
+import json
+from dataclasses import dataclass
+
+from common.changefeed import CHANGES_FILE, publish
+
+
+@dataclass
+class Product:
+    title: str
+    price: float
+
+
+def events(directory):
+    with open(directory / CHANGES_FILE) as f:
+        return [(event["op"], event["key"], event.get("item")) for event in map(json.loads, f)]
+
+
+def test_only_changes_since_the_last_run_are_published(tmp_path):
+    first = [("/product/1", Product("Asus", 100.0)), ("/product/2", Product("Acer", 200.0))]
+    assert publish(first, str(tmp_path)) == {"insert": 2}
+
+    second = [("/product/1", Product("Asus", 90.0)), ("/product/3", Product("Dell", 300.0))]
+    assert publish(second, str(tmp_path)) == {"update": 1, "insert": 1, "delete": 1}
+    assert events(tmp_path) == [
+        ("update", "/product/1", {"title": "Asus", "price": 90.0}),
+        ("insert", "/product/3", {"title": "Dell", "price": 300.0}),
+        ("delete", "/product/2", None),
+    ]
+
+    assert publish(second, str(tmp_path)) == {}
+    assert events(tmp_path) == []
+
+
+def test_incomplete_run_deletes_nothing(tmp_path):
+    publish([("/product/1", Product("Asus", 100.0)), ("/product/2", Product("Acer", 200.0))],
+            str(tmp_path))
+
+    assert publish([("/product/1", Product("Asus", 100.0))], str(tmp_path), complete=False) == {}
+    assert publish([("/product/2", Product("Acer", 150.0))], str(tmp_path)) == {
+        "update": 1, "delete": 1
+    }
@@ -0,0 +1,127 @@
+import asyncio
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin
+
+import pytest
+
+from common.failures import FAILURES, FailureBudgetExceeded, FailureLog, gather_with_retries
+from common.fetch import AsyncFetcher
+from local_sites.catalog import Catalog
+from local_sites.server import SiteConfig, running_sites
+
+THUMBNAIL = """
+<div class="thumbnail">
+  <h4 class="price">$1,299.99</h4>
+  <a class="title" href="/test-sites/e-commerce/static/product/{id}" title="Laptop {id}"></a>
+  <p class="description">A laptop</p>
+  <div class="ratings"><p class="pull-right">14 reviews</p><p data-rating="3"></p></div>
+</div>
+"""
+
+
+@pytest.fixture
+def failures(monkeypatch):
+    """The global ``FAILURES`` as a fresh FailureLog, restored after the test."""
+    for name, value in vars(FailureLog()).items():
+        monkeypatch.setattr(FAILURES, name, value)
+    yield FAILURES
+    FAILURES.close()
+
+
+def test_isolate_dead_letters_failed_items(tmp_path):
+    path = tmp_path / "dead_letters.jl"
+    failures = FailureLog(str(path))
+
+    results = failures.isolate(lambda item: 10 // item, [5, 0, 2])
+    failures.close()
+
+    assert results == [2, None, 5]
+    assert len(failures) == 1
+    (letter,) = [json.loads(line) for line in path.read_text().splitlines()]
+    assert letter["kind"] == "item"
+    assert letter["error"].startswith("ZeroDivisionError")
+    assert letter["payload"] == 0
+
+
+def test_budget_stops_the_run():
+    failures = FailureLog(budget=1)
+
+    assert failures.isolate(int, ["1", "x"]) == [1, None]
+    with pytest.raises(FailureBudgetExceeded):
+        failures.isolate(int, ["y"])
+
+
+def test_malformed_product_does_not_lose_the_page(failures):
+    from static_pagination.parse import parse_page_products
+
+    page = THUMBNAIL.format(id=1) + '<div class="thumbnail"></div>' + THUMBNAIL.format(id=2)
+
+    products = parse_page_products(page.encode())
+
+    assert [product.title for product in products] == ["Laptop 1", "Laptop 2"]
+    assert failures.counts == {"item": 1}
+
+
+def test_workers_hand_their_dead_letters_to_the_parent(tmp_path, failures):
+    from static_pagination.parse import parse_page_products
+
+    async def parse(page):
+        with ProcessPoolExecutor(1) as executor:
+            async with AsyncFetcher(executor=executor) as fetcher:
+                assert fetcher.parses_in_processes
+                return await fetcher.parse(parse_page_products, page)
+
+    path = tmp_path / "dead_letters.jl"
+    failures.configure(str(path))
+    page = THUMBNAIL.format(id=1) + '<div class="thumbnail"></div>'
+
+    products = asyncio.run(parse(page.encode()))
+    failures.close()
+
+    assert [product.title for product in products] == ["Laptop 1"]
+    assert failures.counts == {"item": 1}
+    (letter,) = [json.loads(line) for line in path.read_text().splitlines()]
+    assert letter["payload"] == '<div class="thumbnail"></div>'
+
+
+@pytest.mark.parametrize("failed_attempts, fetched", [
+    ({2: 1, 5: 3}, [1, 2, 3, 4, 5, 6]),
+    ({2: 1, 5: 6}, [1, 2, 3, 4, 6]),  # fails in every round
+])
+def test_failed_pages_are_retried_then_dead_lettered(failed_attempts, fetched):
+    attempts = Counter()
+
+    async def fetch(page):
+        attempts[page] += 1
+        if attempts[page] <= failed_attempts.get(page, 0):
+            raise ConnectionError(f"page {page} failed")
+        return page
+
+    failures = FailureLog()
+    pages = asyncio.run(gather_with_retries(fetch, range(1, 7), failures, rounds=5, delay=0.01))
+
+    assert list(pages) == fetched
+    assert attempts[5] == min(failed_attempts[5] + 1, 6)
+    assert failures.counts["page"] == 6 - len(fetched)
+
+
+def test_pages_of_a_failing_site_are_dead_lettered():
+    async def crawl(url):
+        async with AsyncFetcher(4) as fetcher:
+            return await gather_with_retries(
+                lambda page: fetcher.get(url, {"page": page}),
+                range(1, 7),
+                failures,
+                rounds=2,
+                delay=0.01,
+            )
+
+    failures = FailureLog()
+    with running_sites(SiteConfig(Catalog(60), error_rate=1.0)) as base_urls:
+        url = urljoin(base_urls["webscraper"], "test-sites/e-commerce/static/computers/laptops")
+        pages = asyncio.run(crawl(url))
+
+    assert pages == {}
+    assert failures.counts["page"] == 6
@@ -0,0 +1,59 @@
+import asyncio
+from urllib.parse import urljoin
+
+from common.fetch import AsyncFetcher, IntervalRateLimiter, ResponseCache, make_client
+from local_sites.catalog import Catalog
+from local_sites.server import SiteConfig, running_sites
+
+
+def test_interval_rate_limiter_books_consecutive_slots():
+    limiter = IntervalRateLimiter(rate=10)
+
+    waits = [limiter.reserve() for _ in range(3)]
+
+    assert waits[0] == 0
+    assert 0.09 < waits[1] <= 0.1
+    assert 0.19 < waits[2] <= 0.2
+
+
+def test_shared_cache_downloads_each_page_once():
+    async def crawl(url):
+        cache = ResponseCache()
+        async with make_client() as client:
+            async with AsyncFetcher(2, client=client, cache=cache) as first, \
+                    AsyncFetcher(2, client=client, cache=cache) as second:
+                pages = await asyncio.gather(
+                    first.get(url, {"page": 2}),
+                    second.get(url, {"page": 2}),
+                    first.get(url, {"page": 3}),
+                )
+        return cache, pages
+
+    with running_sites(SiteConfig(Catalog(30))) as base_urls:
+        url = urljoin(base_urls["webscraper"], "test-sites/e-commerce/static/computers/laptops")
+        cache, pages = asyncio.run(crawl(url))
+
+    assert len(cache) == 2
+    assert cache.hits == 1
+    assert pages[0] == pages[1] != pages[2]
+
+
+def test_cache_drops_the_least_recently_requested_bodies():
+    async def fetch(key):
+        async def download():
+            return key.encode() * 10
+        return await cache.get_or_fetch(f"http://shop.test/{key}", None, download)
+
+    async def crawl():
+        for key in "abca":
+            await fetch(key)
+        await fetch("d")  # drops b, the least recently requested
+
+    cache = ResponseCache(max_bytes=30)
+    asyncio.run(crawl())
+
+    assert [url for url, _ in cache._responses] == [
+        "http://shop.test/c", "http://shop.test/a", "http://shop.test/d"
+    ]
+    assert cache.size == 30
+    assert cache.hits == 1
@@ -0,0 +1,66 @@
+import pytest
+
+from common.frontier import canonicalize_url, url_shard, BloomFilter
+
+LAPTOPS_URL = "https://webscraper.io/test-sites/e-commerce/static/computers/laptops"
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        LAPTOPS_URL,
+        LAPTOPS_URL + "/",
+        LAPTOPS_URL + "?page=1",
+        LAPTOPS_URL + "/?page=1#top",
+        "HTTPS://WebScraper.io:443/test-sites/e-commerce/static/computers/laptops",
+    ],
+)
+def test_same_page_urls_are_canonicalized_equally(url):
+    assert canonicalize_url(url) == canonicalize_url(LAPTOPS_URL)
+
+
+def test_query_order_does_not_matter():
+    assert canonicalize_url(LAPTOPS_URL + "?page=2&sort=price") == canonicalize_url(
+        LAPTOPS_URL + "?sort=price&page=2"
+    )
+
+
+def test_different_pages_stay_different():
+    assert canonicalize_url(LAPTOPS_URL + "?page=2") != canonicalize_url(LAPTOPS_URL)
+
+
+def test_bloom_filter_remembers_added_keys():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    keys = [f"url-{i}".encode() for i in range(10_000)]
+
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    assert all(bloom.add(key) for key in keys)
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    for i in range(10_000):
+        bloom.add(f"url-{i}".encode())
+
+    false_positives = sum(f"other-{i}".encode() in bloom for i in range(10_000))
+
+    assert false_positives < 200
+
+
+def test_bloom_filter_dump_and_load(tmp_path):
+    path = str(tmp_path / "seen.bloom")
+    bloom = BloomFilter(capacity=100)
+    bloom.add(b"page")
+    bloom.dump(path)
+
+    restored = BloomFilter(capacity=100)
+    restored.load(path)
+
+    assert b"page" in restored
+
+
+def test_url_shard_is_stable_for_same_page():
+    assert url_shard(LAPTOPS_URL + "/", 8) == url_shard(LAPTOPS_URL + "?page=1", 8)
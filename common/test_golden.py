@@ -0,0 +1,52 @@
+import csv
+
+import pytest
+
+from common.golden import compare_csv, assert_csv_matches
+
+ROWS = [["title", "price"]] + [[f"Product {i}", str(i)] for i in range(25)]
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def expected(tmp_path):
+    return write_csv(tmp_path / "correct.csv", ROWS)
+
+
+def test_equal_files(tmp_path, expected):
+    actual = write_csv(tmp_path / "result.csv", ROWS)
+
+    comparison = compare_csv(expected, actual, chunk_size=10)
+
+    assert comparison.equal
+    assert comparison.rows == len(ROWS)
+
+
+def test_reports_changed_row(tmp_path, expected):
+    rows = [row[:] for row in ROWS]
+    rows[12][1] = "100"
+    actual = write_csv(tmp_path / "result.csv", rows)
+
+    divergences = compare_csv(expected, actual, chunk_size=10).divergences
+
+    assert [divergence.row for divergence in divergences] == [13]
+    assert divergences[0].actual == ["Product 11", "100"]
+
+
+@pytest.mark.parametrize("rows", [ROWS[:-3], ROWS + [["Extra", "1"]]])
+def test_different_length_is_a_divergence(tmp_path, expected, rows):
+    actual = write_csv(tmp_path / "result.csv", rows)
+
+    with pytest.raises(AssertionError):
+        assert_csv_matches(expected, actual, chunk_size=10)
+
+
+def test_stops_after_max_divergences(tmp_path, expected):
+    actual = write_csv(tmp_path / "result.csv", [["other"]] * len(ROWS))
+
+    assert len(compare_csv(expected, actual, max_divergences=3).divergences) == 3
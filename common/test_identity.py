@@ -0,0 +1,66 @@
+import pytest
+
+from common.identity import ProductCache, parse_unknown, product_key
+
+BASE_URL = "https://webscraper.io/"
+
+
+def test_product_key_is_canonical_detail_url():
+    assert product_key(BASE_URL, "/test-sites/e-commerce/static/product/31") == product_key(
+        "https://webscraper.io/test-sites/e-commerce/static/", "product/31/"
+    )
+
+
+def test_products_are_parsed_once():
+    cache = ProductCache()
+    parsed = []
+
+    for key in ["a", "b", "a", "a"]:
+        cache.get_or_parse(key, lambda: parsed.append(key) or key.upper())
+
+    assert parsed == ["a", "b"]
+    assert cache.products() == ["A", "B"]
+    assert cache.hits == 2
+
+
+def test_skipped_product_must_be_known():
+    cache = ProductCache()
+    cache.add("a", "A")
+
+    assert cache.add("a", None) == "A"
+    with pytest.raises(KeyError):
+        cache.add("b", None)
+
+
+def test_only_unknown_items_are_parsed_in_one_batch():
+    batches = []
+
+    def parse_batch(items):
+        batches.append(items)
+        return [None if item == "bad" else item.upper() for item in items]
+
+    entries = parse_unknown(["a", "b", "c", "d"], ["a", "b", "bad", "d"], {"b"}, parse_batch)
+
+    assert batches == [["a", "bad", "d"]]
+    assert entries == [("a", "A"), ("b", None), ("d", "D")]
+
+
+def test_known_keys_grow_without_copying():
+    cache = ProductCache()
+    known_keys = cache.known_keys()
+
+    cache.add("a", "A")
+
+    assert "a" in known_keys and len(known_keys) == 1
+
+
+def test_keys_stored_while_parsing_keep_the_entries_aligned():
+    cache = ProductCache()
+
+    def parse_batch(items):
+        cache.add("b", "B")  # another page stored it meanwhile
+        return [item.upper() for item in items]
+
+    entries = parse_unknown(["a", "b"], ["a", "b"], cache.known_keys(), parse_batch)
+
+    assert entries == [("a", "A"), ("b", "B")]
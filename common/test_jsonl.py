@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+from common.jsonl import DIGEST_SIZE, INDEX_HEADER, JsonlReader, diff
+
+BOOKS = [
+    {"title": "A Light in the Attic", "price": 51.77, "upc": "a897fe39b1053632"},
+    {"title": "Tipping the Velvet", "price": 53.74, "upc": "90fa61229261140a"},
+    {"title": "Soumission", "price": 50.1, "upc": "6957f44c3847a760"},
+]
+
+
+def write_jsonl(path, items):
+    with open(path, "w") as f:
+        f.writelines(json.dumps(item) + "\n" for item in items)
+    return str(path)
+
+
+@pytest.fixture
+def books_path(tmp_path):
+    return write_jsonl(tmp_path / "books.jl", BOOKS)
+
+
+def test_get_by_key(books_path):
+    with JsonlReader(books_path) as books:
+        assert books.get("90fa61229261140a") == BOOKS[1]
+        assert books.get("missing") is None
+
+
+def test_index_is_reused_and_rebuilt_on_change(books_path):
+    JsonlReader(books_path).close()
+    write_jsonl(books_path, BOOKS[:1])
+
+    with JsonlReader(books_path) as books:
+        assert len(books) == 1
+
+
+def test_index_has_fixed_width_entries(books_path):
+    with open(f"{books_path}.upc.idx", "w") as f:
+        f.write("1 0 0 upc\n")  # an index of an older version
+
+    with JsonlReader(books_path) as books:
+        assert books.keys() == sorted(book["upc"] for book in BOOKS)
+        entries = os.path.getsize(books.index_path) - INDEX_HEADER.size
+        assert entries == len(BOOKS) * (16 + 8 + 4 + DIGEST_SIZE)
+
+
+def test_keys_of_any_width_and_script(tmp_path):
+    titles = ["Été", "A", "Zebra crossing", "Ärger", ""]
+    path = write_jsonl(tmp_path / "titles.jl", [{"title": title} for title in titles])
+
+    with JsonlReader(path, key="title") as books:
+        assert books.keys() == sorted(titles)
+        assert all(books.get(title) == {"title": title} for title in titles)
+        assert books.get("Zebra") is None
+
+    empty = write_jsonl(tmp_path / "empty.jl", [])
+    with JsonlReader(empty) as books:
+        assert len(books) == 0 and books.get("a") is None and list(books.range("")) == []
+
+
+def test_range_scan_in_key_order(books_path):
+    with JsonlReader(books_path, key="title") as books:
+        titles = [book["title"] for book in books.range("S", "U")]
+
+    assert titles == ["Soumission", "Tipping the Velvet"]
+
+
+def test_iter_items_with_projection(books_path):
+    with JsonlReader(books_path) as books:
+        assert list(books.iter_items(fields=["price"])) == [(51.77,), (53.74,), (50.1,)]
+
+
+def test_diff(tmp_path, books_path):
+    today = [
+        dict(BOOKS[0], price=40.0), BOOKS[1], {"title": "Sharp Objects", "upc": "e00eb4fd7b871a48"}
+    ]
+    today_path = write_jsonl(tmp_path / "today.jl", today)
+
+    with JsonlReader(books_path) as old, JsonlReader(today_path) as new:
+        changes = sorted(diff(old, new))
+
+    assert changes == [
+        ("added", "e00eb4fd7b871a48"),
+        ("changed", "a897fe39b1053632"),
+        ("removed", "6957f44c3847a760"),
+    ]
@@ -0,0 +1,91 @@
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from common.memory import MemoryMonitor, RecyclingDriver, browser_rss
+
+ALLOCATE = "import time; block = bytearray(64 * 2 ** 20); print(flush=True); time.sleep(30)"
+
+
+class FakeDriver:
+    """Stands in for a WebDriver whose chromedriver is the given process."""
+
+    def __init__(self, process):
+        self.service = SimpleNamespace(process=process)
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+def start_browser() -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, "-c", ALLOCATE], stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()  # the block is allocated
+    return process
+
+
+def test_browser_memory_covers_the_process_tree():
+    # a parent whose child holds the memory, like chromedriver and chrome
+    run_child = f"import subprocess, sys; subprocess.run([sys.executable, '-c', {ALLOCATE!r}])"
+    parent = subprocess.Popen([sys.executable, "-c", run_child], stdout=subprocess.PIPE, text=True)
+    try:
+        parent.stdout.readline()
+        assert browser_rss(FakeDriver(parent)) > 64 * 2 ** 20
+    finally:
+        parent.kill()
+        parent.wait()
+
+
+def test_driver_is_recycled_over_the_memory_limit():
+    processes, drivers = [], []
+
+    def make():
+        processes.append(start_browser())
+        drivers.append(FakeDriver(processes[-1]))
+        return drivers[-1]
+
+    monitor = MemoryMonitor(every=2, trace=True)
+    try:
+        with RecyclingDriver(make, max_rss=32 * 2 ** 20, monitor=monitor) as browser:
+            for _ in range(3):
+                with browser.page() as driver:
+                    assert driver is drivers[-1]
+    finally:
+        monitor.stop()
+        for process in processes:
+            process.kill()
+            process.wait()
+
+    assert browser.recycled == 3
+    assert len(drivers) == 3 and all(driver.quit_called for driver in drivers)
+    # every 2 pages, and the last one when the monitor stopped
+    assert [sample.pages for sample in monitor.samples] == [2, 3]
+    assert monitor.samples[0].python_current is not None
+
+
+def test_recycled_after_max_pages():
+    drivers = []
+
+    def make():
+        drivers.append(FakeDriver(None))
+        return drivers[-1]
+
+    with RecyclingDriver(make, max_rss=0, max_pages=2) as browser:
+        for _ in range(5):
+            with browser.page():
+                pass
+
+    assert len(drivers) == 3
+    assert browser.recycled == 2
+
+
+def test_steps_within_a_page_are_sampled_and_stop_samples_the_rest():
+    monitor = MemoryMonitor(every=2)
+
+    for _ in range(5):
+        monitor.step_done()
+    monitor.page_done()
+
+    assert [(sample.pages, sample.steps) for sample in monitor.samples] == [(0, 2), (0, 4)]
+    assert (monitor.stop().pages, monitor.samples[-1].steps) == (1, 5)
+    assert monitor.stop() is None  # nothing counted since
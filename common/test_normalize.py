@@ -0,0 +1,109 @@
+import pytest
+
+from common.failures import FailureLog
+from common.normalize import (
+    NormalizationErrors, clean_text, counts, normalize_records, parse_count, parse_price, prices,
+    reporting_run,
+)
+
+
+def test_prices_with_currencies_and_locales():
+    column = prices(["$1,299.99", "£51.77", " 12.5 ", "USD 5"])
+
+    assert column.tolist() == [1299.99, 51.77, 12.5, 5.0]
+    assert prices(["1.299,99 €", "12,5"], locale="de").tolist() == [1299.99, 12.5]
+    assert prices(["1 299,99 €"], locale="fr").tolist() == [1299.99]
+    assert parse_price("£51.77") == 51.77
+    assert parse_price("1\xa0299,99\xa0€", locale="fr") == 1299.99
+
+
+def test_counts_take_the_first_number():
+    assert counts(["14 reviews", "In stock (22 available)", 3, "1,234 reviews"]).tolist() == [
+        14, 22, 3, 1234
+    ]
+    assert parse_count("0 reviews") == 0
+
+    with pytest.raises(ValueError):
+        parse_count("no reviews")
+
+
+@pytest.mark.parametrize("text", [
+    "$12abc", "$20 - $30", "12-34", "3x", "$1.299,99", "nan", "inf", "$", "12,5", float("nan")
+])
+def test_prices_must_match_whole(text):
+    errors = NormalizationErrors()
+
+    assert prices(["$1", text, "$2"], errors=errors).tolist() == [1.0, None, 2.0]
+    assert errors.counts == {"price": 1}
+    with pytest.raises(ValueError):
+        parse_price(text)
+
+
+@pytest.mark.parametrize("text", ["3x", "12-34", "1.5 reviews", "nan", "inf", "14 of 20", "-3"])
+def test_counts_must_hold_one_whole_number(text):
+    errors = NormalizationErrors()
+
+    assert counts(["1", text, "2 reviews"], errors=errors).tolist() == [1, None, 2]
+    assert errors.counts == {"count": 1}
+    with pytest.raises(ValueError):
+        parse_count(text)
+
+
+def test_errors_reset_between_runs():
+    errors = NormalizationErrors()
+    prices(["call us"], errors=errors)
+
+    errors.reset()
+
+    assert not errors and errors.summary() == ""
+
+
+def test_a_run_starts_clean_and_reports_what_it_skipped(caplog):
+    errors, failures = NormalizationErrors(), FailureLog()
+    prices(["left over"], errors=errors)
+
+    with reporting_run("books", errors, failures):
+        assert not errors
+        prices(["call us"], errors=errors)
+        failures.record("page", ValueError("bad page"), "https://example.com/2")
+
+    assert len(errors) == 1
+    assert "Skipped books with bad fields: price: 1 (e.g. 'call us')" in caplog.text
+    assert "Dead-lettered: page: 1" in caplog.text
+
+
+def test_bad_values_are_masked_and_counted():
+    errors = NormalizationErrors()
+
+    column = prices(["$10", "call us", None, "$7.5"], errors=errors)
+
+    assert column.tolist() == [10.0, None, None, 7.5]
+    assert len(errors) == 2
+    assert errors.counts == {"price": 2}
+    assert "call us" in errors.summary()
+
+
+def test_records_with_a_bad_field_are_dropped():
+    errors = NormalizationErrors()
+    records = [
+        {"title": "  Asus\n  VivoBook ", "price": "$295.99", "reviews": "14 reviews", "upc": "a"},
+        {"title": "Broken", "price": "$", "reviews": "3 reviews", "upc": "b"},
+    ]
+
+    rows = normalize_records(
+        records, {"title": "text", "price": "price", "reviews": "count"}, errors=errors
+    )
+
+    assert rows == [
+        {"title": "Asus VivoBook", "price": 295.99, "reviews": 14, "upc": "a"},
+        None,
+    ]
+    assert errors.counts == {"price": 1}
+    assert type(rows[0]["price"]) is float and type(rows[0]["reviews"]) is int
+
+
+def test_empty_columns():
+    assert prices([]).tolist() == []
+    assert counts([]).tolist() == []
+    assert normalize_records([], {"price": "price"}) == []
+    assert clean_text(" a \t b ") == "a b"
@@ -0,0 +1,96 @@
+import asyncio
+from urllib.parse import urljoin
+
+import pytest
+from bs4 import BeautifulSoup
+
+from common.fetch import AsyncFetcher
+from common.pagination import (
+    Pagination, fetch_pages, read_pagination, scroll_pagination, walk_pages
+)
+from local_sites.catalog import Catalog
+from local_sites.server import SiteConfig, running_sites
+
+
+def widget(*items: str) -> BeautifulSoup:
+    lis = "".join(
+        f'<li><a href="?page={item}">{item}</a></li>' if item.isdigit() or item == "›"
+        else f"<li><span>{item}</span></li>"
+        for item in items
+    )
+    return BeautifulSoup(f'<ul class="pagination">{lis}</ul>', "html.parser")
+
+
+@pytest.mark.parametrize("page, items, last_page, highest_page, more", [
+    (1, ["1", "2", "3", "4", "›"], 4, 4, True),
+    (4, ["1", "2", "3", "4"], 4, 4, False),
+    (5, ["1", "…", "4", "5", "6", "…", "40", "›"], 40, 40, True),
+    (1, ["1", "2", "3", "…", "›"], None, 3, True),
+    (3, ["1", "2", "3", "›"], None, 3, True),
+    (7, ["‹", "›"], None, 7, True),
+])
+def test_layouts(page, items, last_page, highest_page, more):
+    assert read_pagination(widget(*items), page) == Pagination(
+        page, last_page, highest_page, more
+    )
+
+
+def test_pages_without_widget_or_items():
+    assert read_pagination(BeautifulSoup("<div></div>", "html.parser")).end == 1
+    assert read_pagination(widget("1", "2", "›"), page=3, items=0).end == 2
+    assert scroll_pagination(4, items=6).end is None
+    assert scroll_pagination(4, items=6, last=True).end == 4
+
+
+def next_link_site(num_pages: int, requested: list):
+    """Pages that only link to the next one."""
+
+    async def fetch(page: int):
+        requested.append(page)
+        await asyncio.sleep(0.01)
+        if page > num_pages:
+            return scroll_pagination(page, 0), []
+        return read_pagination(widget("›") if page < num_pages else widget(), page), [page]
+
+    return fetch
+
+
+def test_pages_are_prefetched_and_overfetches_cancelled():
+    requested = []
+    fetch = next_link_site(10, requested)
+
+    pages = asyncio.run(fetch_pages(fetch, read_pagination(widget("›"), 1), prefetch=3))
+
+    assert list(pages) == list(range(2, 11))
+    # up to three pages ahead are in flight at once, and no more past the end
+    assert max(requested) <= 10 + 3
+    assert len(requested) == len(set(requested))
+
+
+def test_walk_pages_stops_at_the_last_page():
+    requested = []
+    fetch = next_link_site(5, requested)
+
+    def fetch_sync(page):
+        return asyncio.run(fetch(page))
+
+    first = read_pagination(widget("›"), 1)
+    assert [page for page, _ in walk_pages(fetch_sync, first)] == [2, 3, 4, 5]
+    assert requested == [2, 3, 4, 5]
+
+
+def test_infinite_scroll_listing_is_read_to_the_end():
+    async def crawl(url):
+        async def fetch(page):
+            html = await fetcher.get(f"{url}/items", {"page": page})
+            items = BeautifulSoup(html, "html.parser").select(".thumbnail")
+            return scroll_pagination(page, len(items)), items
+
+        async with AsyncFetcher(4) as fetcher:
+            first, items = await fetch(1)
+            pages = await fetch_pages(fetch, first)
+            return len(items) + sum(len(page_items) for page_items in pages.values())
+
+    with running_sites(SiteConfig(Catalog(40))) as base_urls:
+        url = urljoin(base_urls["webscraper"], "test-sites/e-commerce/more/computers/laptops")
+        assert asyncio.run(crawl(url)) == 40
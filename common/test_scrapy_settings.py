@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import time
+
+import pytest
+from scrapy import Spider
+from scrapy.http import HtmlResponse, Request
+from scrapy.settings import Settings
+from scrapy.utils.test import get_crawler
+
+from common import scrapy_settings
+from common.archive import ArchiveReader
+from common.scrapy_ext import ArchiveDownloaderMiddleware, SQLiteCacheStorage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("project", ["books_to_scrape", "scrapy_scrapper"])
+def test_projects_use_the_production_profile(project, monkeypatch):
+    monkeypatch.syspath_prepend(os.path.join(ROOT, project))
+    settings = Settings()
+    settings.setmodule(f"{project}.settings")
+
+    for name in scrapy_settings.__all__:
+        assert settings[name] == getattr(scrapy_settings, name), name
+    assert settings["BOT_NAME"] == project
+
+
+def open_storage(tmp_path, **settings):
+    crawler = get_crawler(Spider, {"HTTPCACHE_DIR": str(tmp_path), **settings})
+    storage = SQLiteCacheStorage(crawler.settings)
+    storage.open_spider(Spider.from_crawler(crawler, name="shop"))
+    return storage
+
+
+def page(url, size=100):
+    headers = {"Content-Type": "text/html", "X-Page": url}
+    return HtmlResponse(url, body=b"<p>product</p>" * size, headers=headers)
+
+
+def test_cache_round_trip_and_expiration(tmp_path, monkeypatch):
+    storage = open_storage(tmp_path, HTTPCACHE_EXPIRATION_SECS=60)
+    request = Request("http://shop.test/laptops")
+
+    assert storage.retrieve_response(None, request) is None
+    storage.store_response(None, request, page(request.url))
+    cached = storage.retrieve_response(None, Request("http://shop.test/laptops"))
+
+    assert type(cached) is HtmlResponse
+    assert cached.body == page(request.url).body
+    assert cached.headers["X-Page"] == b"http://shop.test/laptops"
+    # stored compressed, in one file per spider
+    assert storage.size < len(cached.body) / 10
+    assert min(os.listdir(tmp_path)) == "shop.sqlite"
+
+    now = time.time()
+    monkeypatch.setattr("common.scrapy_ext.time.time", lambda: now + 61)
+    assert storage.retrieve_response(None, request) is None
+    storage.close_spider(None)
+
+
+def test_oldest_responses_are_evicted_over_the_size_limit(tmp_path):
+    storage = open_storage(tmp_path)
+    storage.store_response(None, Request("http://shop.test/0"), page("http://shop.test/0"))
+    entry_size = storage.size
+    storage.close_spider(None)
+
+    storage = open_storage(tmp_path, HTTPCACHE_MAX_SIZE=entry_size * 5, HTTPCACHE_EVICT_TO=0.6)
+    for number in range(1, 6):
+        url = f"http://shop.test/{number}"
+        storage.store_response(None, Request(url), page(url))
+
+    connection = sqlite3.connect(tmp_path / "shop.sqlite")
+    urls = [url for (url,) in connection.execute("SELECT url FROM responses ORDER BY stored_at")]
+    assert urls == ["http://shop.test/3", "http://shop.test/4", "http://shop.test/5"]
+    assert storage.size == 3 * entry_size
+    storage.close_spider(None)
+
+
+def test_responses_from_the_cache_are_not_archived_again(tmp_path):
+    crawler = get_crawler(Spider, {"ARCHIVE_DIR": str(tmp_path)})
+    middleware = ArchiveDownloaderMiddleware.from_crawler(crawler)
+
+    for url, flags in [("http://shop.test/new", []), ("http://shop.test/old", ["cached"])]:
+        response = page(url).replace(flags=flags)
+        assert middleware.process_response(Request(url), response) is response
+    middleware.archive.close()
+
+    archive = ArchiveReader(str(tmp_path))
+    assert len(archive) == 1 and archive.get("http://shop.test/new") is not None
+    archive.close()
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from common.pagination import scroll_pagination
+from common.sharding import (
+    STRATEGIES, Unit, SharedRateLimiter, discover_units, run_module, run_spider, shard_units
+)
+from local_sites.catalog import Catalog
+from local_sites.server import SiteConfig, running_sites
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+UNITS = [
+    Unit(rank, category, f"https://example.com/{category}", page)
+    for rank, category in enumerate(["laptops", "tablets", "touch"])
+    for page in range(1, 5)
+]
+
+
+@pytest.mark.parametrize("strategy", ["category", "range", "hash"])
+def test_every_unit_is_in_exactly_one_shard(strategy):
+    shards = shard_units(UNITS, 2, strategy)
+
+    assert sorted(unit for shard in shards for unit in shard) == sorted(UNITS)
+
+
+def test_category_strategy_keeps_categories_together():
+    for shard in shard_units(UNITS, 2, "category"):
+        for unit in shard:
+            assert all(other.rank % 2 == unit.rank % 2 for other in shard)
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_no_units_make_no_shards(strategy):
+    assert shard_units([], 2, strategy) == []
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        shard_units(UNITS, 2, "random")
+
+
+def test_rate_limiter_spaces_requests():
+    rate_limiter = SharedRateLimiter(rate=10)
+    delays = [rate_limiter.reserve() for _ in range(3)]
+
+    assert delays[0] == pytest.approx(0, abs=0.01)
+    assert delays[2] == pytest.approx(0.2, abs=0.01)
+
+
+class ListingFetcher:
+    """Pages of one listing of 5 pages whose widget never shows the last."""
+
+    async def get(self, url, params=None):
+        return (params or {}).get("page", 1)
+
+    async def parse(self, parser, *args):
+        return parser(*args)
+
+
+def listing_module(**attributes):
+    return SimpleNamespace(PAGES={"laptops": "https://example.com/laptops"}, **attributes)
+
+
+def test_units_are_discovered_when_the_last_page_is_hidden():
+    module = listing_module(
+        parse_pagination=lambda content, page: scroll_pagination(page, items=int(content <= 5))
+    )
+
+    units = asyncio.run(discover_units(ListingFetcher(), module))
+
+    assert [unit.page for unit in units] == [1, 2, 3, 4, 5]
+
+
+def test_discovery_fails_loudly_when_the_end_is_not_found():
+    def parse_pagination(content, page):
+        if page > 1:
+            raise ValueError("layout changed")
+        return scroll_pagination(page, items=1)
+
+    with pytest.raises(RuntimeError, match="last page"):
+        asyncio.run(discover_units(ListingFetcher(), listing_module(
+            parse_pagination=parse_pagination
+        )))
+
+
+def test_no_units_write_empty_categories_without_workers(monkeypatch):
+    written = []
+    module = SimpleNamespace(
+        PAGES={}, write_all_products=lambda pages, cache: written.append((pages, len(cache)))
+    )
+    monkeypatch.setitem(sys.modules, "empty_scraper", module)
+
+    run_module("empty_scraper", workers=2, strategy="range", rate=0)
+
+    assert written == [({}, 0)]
+
+
+@pytest.mark.parametrize("module, data_path", [
+    ("static_pagination.parse", "products"),
+    ("all_in_one.parse", os.path.join("all_in_one", "products")),
+])
+def test_sharded_run_writes_what_a_single_process_writes(tmp_path, module, data_path):
+    def run(args, directory):
+        os.makedirs(directory)
+        subprocess.run([sys.executable, "-m", *args], cwd=directory, env=env, check=True)
+        output = os.path.join(directory, data_path)
+        return {
+            name: open(os.path.join(output, name)).read()
+            for name in os.listdir(output) if name.endswith(".jsonl")
+        }
+
+    with running_sites(SiteConfig(Catalog(20))) as base_urls:
+        env = dict(
+            os.environ, PYTHONPATH=ROOT, OUTPUT_FORMAT="jsonl",
+            WEBSCRAPER_BASE_URL=base_urls["webscraper"],
+        )
+        single = run([module], tmp_path / "single")
+        sharded = run(["common.sharding", module, "--workers", "3"], tmp_path / "sharded")
+
+    assert sorted(single) == ["home.jsonl", "laptops.jsonl", "phones.jsonl", "tablets.jsonl"]
+    assert sharded == single
+
+
+def test_spiders_without_shard_callbacks_are_not_sharded(tmp_path):
+    with pytest.raises(ValueError, match="SHARD_CALLBACKS"):
+        run_spider("products", os.path.join(ROOT, "scrapy_scrapper"), 2, str(tmp_path / "p.jl"))
@@ -0,0 +1,122 @@
+import sqlite3
+from dataclasses import asdict, dataclass
+from enum import Enum
+
+import pytest
+
+from common import storage
+from common.output import write_items
+from common.storage import SQLiteStorage
+
+
+@dataclass
+class Product:
+    title: str
+    description: str
+    price: float
+    rating: int
+    num_of_reviews: int
+
+
+class CourseType(Enum):
+    FULL_TIME = "full-time"
+
+
+@dataclass
+class Course:
+    name: str
+    short_description: str
+    type: CourseType
+
+
+def test_runs_upsert_items_and_keep_price_history(tmp_path, monkeypatch):
+    path = str(tmp_path / "items.sqlite")
+
+    with SQLiteStorage(path, "static_pagination", batch_size=2) as first:
+        assert first.write([
+            Product("Asus", "14 inch", 100.0, 3, 5),
+            Product("Acer", "15 inch", 200.0, 4, 7),
+            Product("Dell", "13 inch", 300.0, 5, 9),
+        ], keys=["/product/1", "/product/2", "/product/3"]) == 3
+
+    monkeypatch.setattr(storage, "RUN_STARTED", storage.RUN_STARTED + 1)
+    with SQLiteStorage(path, "static_pagination") as second:
+        second.write([Product("Asus", "14 inch", 90.0, 3, 6)], keys=["/product/1"])
+
+    connection = sqlite3.connect(path)
+    assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert connection.execute(
+        "SELECT title, price, num_of_reviews, first_run, last_run FROM products ORDER BY title"
+    ).fetchall() == [
+        ("Acer", 200.0, 7, 1, 1),
+        ("Asus", 90.0, 6, 1, 2),
+        ("Dell", 300.0, 9, 1, 1),
+    ]
+    assert connection.execute(
+        "SELECT run_id, price FROM products_prices WHERE url = '/product/1' ORDER BY run_id"
+    ).fetchall() == [(1, 100.0), (2, 90.0)]
+    finished = connection.execute("SELECT count(*) FROM runs WHERE finished_at IS NOT NULL")
+    assert finished.fetchone() == (2,)
+
+
+def test_writes_of_one_process_are_one_run(tmp_path):
+    path = str(tmp_path / "items.sqlite")
+
+    for page in ("laptops", "tablets"):
+        write_items(str(tmp_path / page), Course, [
+            Course(f"Python {page}", "Backend", CourseType.FULL_TIME)
+        ], "sqlite")
+    with SQLiteStorage(path, "books") as books:
+        books.write([{"upc": "a1", "title": "Book", "price": 9.5}], "Book")
+
+    connection = sqlite3.connect(path)
+    assert connection.execute("SELECT id, scraper FROM runs ORDER BY id").fetchall() == [
+        (1, Course.__module__.split(".")[0]), (2, "books")
+    ]
+    assert connection.execute("SELECT name, type, last_run FROM courses").fetchall() == [
+        ("Python laptops", "full-time", 1), ("Python tablets", "full-time", 1)
+    ]
+    assert connection.execute("SELECT run_id, upc, price FROM books_prices").fetchall() == [
+        (2, "a1", 9.5)
+    ]
+
+
+def test_missing_key_fields_still_upsert(tmp_path, monkeypatch):
+    path = str(tmp_path / "items.sqlite")
+
+    with SQLiteStorage(path, "books") as first:
+        first.write([{"upc": None, "title": "Book", "price": 10.0}], "Book")
+    monkeypatch.setattr(storage, "RUN_STARTED", storage.RUN_STARTED + 1)
+    with SQLiteStorage(path, "books") as second:
+        second.write([{"upc": None, "title": "Book", "price": 9.0}], "Book")
+
+    connection = sqlite3.connect(path)
+    assert connection.execute(
+        "SELECT upc, title, price, first_run, last_run FROM books"
+    ).fetchall() == [("", "Book", 9.0, 1, 2)]
+    assert connection.execute("SELECT run_id, price FROM books_prices").fetchall() == [
+        (1, 10.0), (2, 9.0)
+    ]
+
+
+def test_products_are_keyed_by_url_within_their_source(tmp_path, monkeypatch):
+    path = str(tmp_path / "items.sqlite")
+    same_title = [Product("Asus", "14 inch", 100.0, 3, 5), Product("Asus", "14 inch", 120.0, 3, 5)]
+
+    with SQLiteStorage(path, "static_pagination") as first:
+        first.write(same_title, keys=["/product/1", "/product/2"])
+    monkeypatch.setattr(storage, "RUN_STARTED", storage.RUN_STARTED + 1)
+    with SQLiteStorage(path, "products") as spider:
+        spider.write([dict(asdict(same_title[0]), url="/product/1", price=90.0)], "Product")
+
+    connection = sqlite3.connect(path)
+    assert connection.execute(
+        "SELECT source, url, price, first_run, last_run FROM products ORDER BY source, url"
+    ).fetchall() == [
+        ("products", "/product/1", 90.0, 2, 2),
+        ("static_pagination", "/product/1", 100.0, 1, 1),
+        ("static_pagination", "/product/2", 120.0, 1, 1),
+    ]
+    with SQLiteStorage(path, "static_pagination") as storage_without_keys:
+        with pytest.raises(ValueError, match="keyed by url"):
+            storage_without_keys.write(same_title)
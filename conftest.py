@@ -0,0 +1,50 @@
+import os
+import shutil
+
+import pytest
+
+from local_sites.server import ENV_VARS, running_sites
+
+CHROME_BINARIES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser")
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--offline",
+        action="store_true",
+        help="run the scrapers against the local stand-in sites (local_sites)",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "golden: compares with outputs recorded from the real sites, not with --offline"
+    )
+    config.addinivalue_line("markers", "network: needs a real site without a stand-in")
+    config.addinivalue_line("markers", "browser: drives Chrome, skipped where it is not installed")
+
+    # Scraper modules read their base urls on import, so the stand-in sites
+    # have to be up before the test modules are collected
+    if config.getoption("offline"):
+        config.stand_in_sites = running_sites()
+        for site, base_url in config.stand_in_sites.__enter__().items():
+            os.environ[ENV_VARS[site]] = base_url
+
+
+def pytest_unconfigure(config):
+    if hasattr(config, "stand_in_sites"):
+        config.stand_in_sites.__exit__(None, None, None)
+
+
+def pytest_collection_modifyitems(config, items):
+    skips = {}
+    if config.getoption("offline"):
+        skips["golden"] = pytest.mark.skip(reason="goldens come from the real sites")
+        skips["network"] = pytest.mark.skip(reason="no stand-in site for it")
+    if not any(shutil.which(binary) for binary in CHROME_BINARIES):
+        skips["browser"] = pytest.mark.skip(reason="Chrome is not installed")
+
+    for item in items:
+        for marker, skip in skips.items():
+            if marker in item.keywords:
+                item.add_marker(skip)
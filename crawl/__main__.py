@@ -0,0 +1,123 @@
+"""Run scrapers side by side in one process: ``python -m crawl JOB [JOB ...]``.
+
+Jobs are the scrapers registered in ``crawl.jobs``; ``all`` runs every one.
+Options given once apply to every selected job, ``--set`` changes a single
+job's profile:
+
+    python -m crawl static_pagination quotes_to_scrape --format jsonl
+    python -m crawl all --rate 5 --set static_pagination.concurrency=32
+
+``--archive DIR`` keeps every downloaded page in a compressed archive and
+``--replay DIR`` re-runs the jobs over one (or over a directory of saved
+pages) without the network, writing the same outputs as the live run. With
+``--workers N`` pages are parsed in N processes, so re-parsing a large
+archive after a selector changed uses every core:
+
+    python -m crawl static_pagination --archive archive/
+    python -m crawl static_pagination --replay archive/ --workers 8
+
+Items and pages that fail are written to ``{output_dir}/dead_letters.jl``;
+with ``--failure-budget N`` the jobs stop at the failure after the N-th.
+
+Only the selected scraper modules are imported, after the arguments are
+parsed.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from common.failures import FAILURES
+from common.logs import configure_logging
+from common.output import FORMATS
+from crawl.jobs import CACHE_POLICIES, JOBS, Job, Profile, run_jobs
+
+DEFAULT_OUTPUT_DIR = "crawl_output"
+DEAD_LETTER_FILE = "dead_letters.jl"
+
+
+def parse_overrides(settings: Sequence[str]) -> Dict[str, List[Tuple[str, str]]]:
+    """``["job.option=value", ...]`` to ``{job: [(option, value), ...]}``."""
+    overrides: Dict[str, List[Tuple[str, str]]] = {}
+
+    for setting in settings:
+        target, separator, value = setting.partition("=")
+        job_name, dot, option = target.partition(".")
+        if not separator or not dot:
+            raise ValueError(f"Expected JOB.OPTION=VALUE, got {setting!r}")
+        if job_name not in JOBS:
+            raise ValueError(f"Unknown job {job_name!r} in {setting!r}")
+        overrides.setdefault(job_name, []).append((option, value))
+
+    return overrides
+
+
+def select_jobs(args: argparse.Namespace) -> List[Tuple[Job, Profile]]:
+    names = list(JOBS) if "all" in args.jobs else list(dict.fromkeys(args.jobs))
+    overrides = parse_overrides(args.set)
+    common = {
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "cache": args.cache,
+        "output_format": args.format,
+    }
+
+    selected = []
+    for name in names:
+        job = JOBS[name]
+        profile = job.profile
+        for option, value in common.items():
+            if value is not None:
+                profile = profile.update(option, str(value))
+        for option, value in overrides.get(name, []):
+            profile = profile.update(option, value)
+        selected.append((job, profile))
+
+    return selected
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m crawl", description=__doc__.split("\n\n")[0])
+    parser.add_argument("jobs", nargs="+", choices=[*JOBS, "all"], metavar="JOB")
+    parser.add_argument("--concurrency", type=int, help="requests in flight per job")
+    parser.add_argument("--rate", type=float, help="requests per second per job, 0 for no limit")
+    parser.add_argument("--cache", choices=CACHE_POLICIES, help="response cache policy")
+    parser.add_argument("--format", choices=FORMATS, help="output format")
+    parser.add_argument(
+        "--set", action="append", default=[], metavar="JOB.OPTION=VALUE",
+        help="profile option of one job (concurrency, rate, cache, output_format)",
+    )
+    parser.add_argument("-o", "--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--archive", metavar="DIR", help="archive the downloaded pages")
+    parser.add_argument("--replay", metavar="DIR", help="read the pages from an archive")
+    parser.add_argument(
+        "--workers", type=int, default=0, metavar="N", help="parse pages in N processes"
+    )
+    parser.add_argument(
+        "--dead-letters", metavar="PATH", help=f"default: OUTPUT_DIR/{DEAD_LETTER_FILE}"
+    )
+    parser.add_argument(
+        "--failure-budget", type=int, metavar="N", help="failed items and pages the run may have"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = select_jobs(args)
+    except ValueError as error:
+        parser.error(str(error))
+
+    configure_logging(args.output_dir)
+    FAILURES.configure(
+        args.dead_letters or os.path.join(args.output_dir, DEAD_LETTER_FILE), args.failure_budget
+    )
+    errors = asyncio.run(
+        run_jobs(jobs, args.output_dir, args.archive, args.replay, args.workers)
+    )
+
+    if any(errors.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
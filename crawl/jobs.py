@@ -0,0 +1,204 @@
+"""The scrapers as jobs of one crawl process.
+
+Every job has a ``Profile``: how many requests it keeps in flight, its rate
+limit, whether its responses go through the run's shared ``ResponseCache``
+(so e.g. the webscraper.io home page is downloaded once for all jobs), and
+the output format. The requests-based jobs share one httpx client, so one
+connection pool, while each keeps its own semaphore and rate limiter. Browser
+jobs run their Selenium code in a worker thread next to them.
+
+With ``workers`` the pages are parsed in that many processes instead of
+threads. Replaying an archive is then bound by the CPUs, not the network:
+every stored page is handed to the pool as soon as it is read.
+
+Outputs are written to ``{output_dir}/{job}/{page}.{csv|jsonl}``, or upserted into
+``{output_dir}/{job}/items.sqlite``.
+"""
+import asyncio
+import importlib
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field, fields, replace
+from types import ModuleType
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from common.archive import ArchiveWriter, ReplaySource, open_archive, open_replay
+from common.fetch import AsyncFetcher, IntervalRateLimiter, ResponseCache, make_client
+from common.identity import ProductCache
+from common.normalize import reporting_run
+from common.output import FORMATS, write_items
+
+CACHE_POLICIES = ("none", "job", "shared")
+
+Pages = Dict[str, list]  # output page name -> scraped items
+
+
+@dataclass
+class Profile:
+    concurrency: int = 8
+    rate: float = 0.0  # requests per second, 0 for no limit
+    cache: str = "shared"  # response cache: "none", per "job" or "shared" by the run
+    output_format: str = "csv"
+
+    def __post_init__(self):
+        if self.cache not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy {self.cache!r}, use one of {CACHE_POLICIES}")
+        if self.output_format not in FORMATS:
+            raise ValueError(f"Unknown output format {self.output_format!r}, use one of {FORMATS}")
+        if self.concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+    def update(self, option: str, value: str) -> "Profile":
+        """Copy with one option set from its command line string."""
+        if option not in {profile_field.name for profile_field in fields(self)}:
+            raise ValueError(f"Unknown profile option {option!r}")
+
+        return replace(self, **{option: type(getattr(self, option))(value)})
+
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    module: str
+    item: str  # name of the module's item dataclass
+    # products are added to the cache, which gives their keys to the storage
+    collect: Callable[[ModuleType, AsyncFetcher, ProductCache], Awaitable[Pages]]
+    profile: Profile = field(default_factory=Profile)
+    browser: bool = False  # drives Chrome; concurrency and rate do not apply
+
+
+async def collect_products(
+    module: ModuleType, fetcher: AsyncFetcher, cache: ProductCache
+) -> Pages:
+    return await module.fetch_all_products(fetcher, cache)
+
+
+async def collect_quotes(module: ModuleType, fetcher: AsyncFetcher, cache: ProductCache) -> Pages:
+    return {"quotes": await module.fetch_all_quotes(fetcher)}
+
+
+async def collect_courses(module: ModuleType, fetcher: AsyncFetcher, cache: ProductCache) -> Pages:
+    return {"courses": await module.fetch_all_courses(fetcher)}
+
+
+async def collect_in_browser(
+    module: ModuleType, fetcher: AsyncFetcher, cache: ProductCache
+) -> Pages:
+    return await asyncio.to_thread(module.get_pages_products, cache)
+
+
+JOBS: Dict[str, Job] = {
+    job.name: job
+    for job in [
+        Job("all_in_one", "all_in_one.parse", "Product", collect_products),
+        Job("static_pagination", "static_pagination.parse", "Product", collect_products),
+        Job(
+            "more_products", "more_products.parse", "Product", collect_in_browser,
+            Profile(concurrency=1), browser=True,
+        ),
+        Job(
+            "selenium_button_clicks", "selenium_button_clicks.parse", "Product",
+            collect_in_browser, Profile(concurrency=1), browser=True,
+        ),
+        # pages only link to the next one, there is nothing to do in parallel
+        Job(
+            "quotes_to_scrape", "quotes_to_scrape.parse", "Quote", collect_quotes,
+            Profile(concurrency=1),
+        ),
+        Job(
+            "mate_scrapping", "mate_scrapping.parse", "Course", collect_courses,
+            Profile(concurrency=1),
+        ),
+    ]
+}
+
+
+async def run_job(
+    job: Job,
+    profile: Profile,
+    output_dir: str,
+    client,
+    shared_cache: ResponseCache,
+    archive: Optional[ArchiveWriter] = None,
+    replay: Optional[ReplaySource] = None,
+    executor: Optional[Executor] = None,
+) -> List[str]:
+    """Scrape one job and write its outputs, return the written files."""
+    module = importlib.import_module(job.module)
+    cache = {"none": None, "job": ResponseCache(), "shared": shared_cache}[profile.cache]
+    rate_limiter = IntervalRateLimiter(profile.rate) if profile.rate else None
+    products = ProductCache()
+
+    async with AsyncFetcher(
+        profile.concurrency,
+        rate_limiter=rate_limiter,
+        client=client,
+        cache=cache,
+        archive=archive,
+        replay=replay,
+        executor=executor,
+    ) as fetcher:
+        pages = await job.collect(module, fetcher, products)
+
+    item_type = getattr(module, job.item)
+    files = [
+        write_items(
+            os.path.join(output_dir, job.name, page),
+            item_type,
+            items,
+            profile.output_format,
+            products.keys_of(items) if products else None,
+        )
+        for page, items in pages.items()
+    ]
+    return list(dict.fromkeys(files))  # every page goes to the same SQLite file
+
+
+async def run_jobs(
+    jobs: Sequence[Tuple[Job, Profile]],
+    output_dir: str,
+    archive_dir: Optional[str] = None,
+    replay_dir: Optional[str] = None,
+    workers: int = 0,
+) -> Dict[str, Optional[BaseException]]:
+    """Run the jobs side by side; a failing job does not stop the others.
+
+    The requests-based jobs archive their responses to ``archive_dir``, or
+    read them from ``replay_dir`` (an archive or a directory of saved pages)
+    instead of the network, and parse in ``workers`` processes if given.
+    """
+    with reporting_run("items"):
+        shared_cache = ResponseCache()
+        archive = open_archive(archive_dir) if archive_dir else None
+        replay = open_replay(replay_dir) if replay_dir else None
+        max_connections = sum(profile.concurrency for job, profile in jobs if not job.browser)
+        executor = ProcessPoolExecutor(workers) if workers else None
+
+        try:
+            async with make_client(max(1, max_connections)) as client:
+                results = await asyncio.gather(
+                    *(
+                        run_job(
+                            job, profile, output_dir, client, shared_cache, archive, replay,
+                            executor,
+                        )
+                        for job, profile in jobs
+                    ),
+                    return_exceptions=True,
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        errors = {}
+        for (job, _), result in zip(jobs, results):
+            if isinstance(result, BaseException):
+                logging.error(f"Job {job.name} failed", exc_info=result)
+                errors[job.name] = result
+            else:
+                logging.info(f"Job {job.name} wrote {', '.join(result)}")
+                errors[job.name] = None
+
+        logging.info(f"Responses downloaded once and reused: {shared_cache.hits}")
+    return errors
@@ -0,0 +1,105 @@
+import csv
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from crawl.__main__ import main, parse_overrides
+from crawl.jobs import JOBS, Profile
+from local_sites.catalog import Catalog
+from local_sites.server import ENV_VARS, SiteConfig, running_sites
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("bs4", "httpx", "requests", "selenium")
+
+
+@pytest.mark.parametrize("module", [job.module for job in JOBS.values()])
+def test_import_is_light_and_has_no_side_effects(module, tmp_path):
+    # a fresh interpreter in an empty directory: no products/ to log into
+    check = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", check],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == ""
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unknown_job_is_rejected():
+    with pytest.raises(SystemExit):
+        main(["no_such_job"])
+
+
+def test_overrides():
+    overrides = parse_overrides(["static_pagination.concurrency=4", "static_pagination.rate=2"])
+
+    assert overrides == {"static_pagination": [("concurrency", "4"), ("rate", "2")]}
+    assert Profile().update("concurrency", "4").update("rate", "2") == Profile(4, 2.0)
+
+    with pytest.raises(ValueError):
+        parse_overrides(["static_pagination=4"])
+    with pytest.raises(ValueError):
+        Profile().update("output_format", "xml")
+
+
+def test_jobs_run_side_by_side(tmp_path):
+    with running_sites(SiteConfig(Catalog(12))) as base_urls:
+        env = {ENV_VARS[site]: base_url for site, base_url in base_urls.items()}
+        subprocess.run(
+            [
+                sys.executable, "-m", "crawl", "all_in_one", "static_pagination",
+                "quotes_to_scrape", "--set", "quotes_to_scrape.output_format=jsonl",
+                "--set", "static_pagination.output_format=sqlite", "-o", str(tmp_path),
+            ],
+            cwd=tmp_path,
+            env={**os.environ, **env, "PYTHONPATH": ROOT},
+            capture_output=True,
+            check=True,
+        )
+
+    connection = sqlite3.connect(tmp_path / "static_pagination" / "items.sqlite")
+    # every product once, by its url, though "home" shows some of them again
+    assert connection.execute(
+        "SELECT source, count(DISTINCT url), count(*) FROM products GROUP BY source"
+    ).fetchall() == [("static_pagination", 36, 36)]
+    with open(tmp_path / "all_in_one" / "home.csv") as f:
+        assert len(list(csv.DictReader(f))) == 3
+    with open(tmp_path / "quotes_to_scrape" / "quotes.jsonl") as f:
+        assert len([json.loads(line) for line in f]) == 12
+
+
+def test_replay_writes_the_outputs_of_the_live_run(tmp_path):
+    def crawl(output_dir, *options, env=None):
+        subprocess.run(
+            [
+                sys.executable, "-m", "crawl", "static_pagination", "quotes_to_scrape",
+                "-o", str(tmp_path / output_dir), *options,
+            ],
+            cwd=tmp_path,
+            env={**os.environ, **(env or {}), "PYTHONPATH": ROOT},
+            capture_output=True,
+            check=True,
+        )
+
+    with running_sites(SiteConfig(Catalog(30))) as base_urls:
+        env = {ENV_VARS[site]: base_url for site, base_url in base_urls.items()}
+        crawl("live", "--archive", str(tmp_path / "archive"), env=env)
+
+    # the sites are gone, every page comes from the archive
+    crawl("replayed", "--replay", str(tmp_path / "archive"), "--workers", "2", env=env)
+
+    for output in ("static_pagination/laptops.csv", "quotes_to_scrape/quotes.csv"):
+        live = (tmp_path / "live" / output).read_text()
+        assert live.count("\n") > 1
+        assert (tmp_path / "replayed" / output).read_text() == live
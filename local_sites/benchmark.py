@@ -0,0 +1,149 @@
+"""Scaling benchmarks of the parsers on synthetic catalogs.
+
+Every benchmark renders one synthetic page holding ``size`` items and runs a
+scraper's parsing code on it, once for wall time and once under tracemalloc
+for peak memory, then prints how both grow with the catalog:
+
+    python -m local_sites.benchmark --sizes 100 1000 10000 100000
+    python -m local_sites.benchmark --browser  # show_all_products in Chrome too
+"""
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import urljoin
+
+from local_sites import generate
+from local_sites.catalog import Catalog
+from local_sites.server import SiteConfig, running_sites
+
+SIZES = (100, 1000, 10_000)
+CATEGORY = "computers/laptops"
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "books_to_scrape"))
+
+
+def bench_get_num_of_pages(catalog: Catalog) -> Callable[[], object]:
+    from common.soup import make_soup
+    from static_pagination.parse import get_num_of_pages, PARSE_REGION
+
+    html = generate.static_page(catalog, CATEGORY, page=max(1, catalog.size // 12))
+    return lambda: get_num_of_pages(make_soup(html, PARSE_REGION))
+
+
+def bench_get_single_page_products(catalog: Catalog) -> Callable[[], object]:
+    from common.soup import make_soup
+    from static_pagination.parse import get_single_page_products, PARSE_REGION
+
+    html = generate.static_page(catalog, CATEGORY, per_page=catalog.size)
+    return lambda: get_single_page_products(make_soup(html, PARSE_REGION))
+
+
+def bench_more_products_page(catalog: Catalog) -> Callable[[], object]:
+    from common.soup import make_soup
+    from more_products.parse import parse_products, PARSE_REGION
+
+    # the page_source get_page_products parses once show_all_products is done
+    html = generate.more_page(catalog, CATEGORY, loaded_pages=catalog.size)
+    return lambda: parse_products(make_soup(html, PARSE_REGION).select(".thumbnail"))
+
+
+def bench_quotes_page(catalog: Catalog) -> Callable[[], object]:
+    from quotes_to_scrape.parse import parse_page_quotes
+
+    html = generate.quotes_listing(catalog, 1, per_page=catalog.size).encode()
+    return lambda: parse_page_quotes(html)
+
+
+def bench_books_listing(catalog: Catalog) -> Callable[[], object]:
+    from scrapy.http import HtmlResponse
+    from scrapy.settings import Settings
+    from books_to_scrape.spiders.books import BooksSpider
+
+    spider = BooksSpider()
+    spider.settings = Settings()
+    spider.settings.setmodule("books_to_scrape.settings")
+    html = generate.books_listing(catalog, 1, per_page=catalog.size)
+    response = HtmlResponse("https://books.toscrape.com/", body=html, encoding="utf-8")
+    return lambda: list(spider.parse(response))
+
+
+BENCHMARKS: Dict[str, Callable[[Catalog], Callable[[], object]]] = {
+    "static_pagination.get_num_of_pages": bench_get_num_of_pages,
+    "static_pagination.get_single_page_products": bench_get_single_page_products,
+    "more_products.get_page_products (parse)": bench_more_products_page,
+    "quotes_to_scrape.parse_page_quotes": bench_quotes_page,
+    "BooksSpider.parse": bench_books_listing,
+}
+
+
+def measure(run: Callable[[], object]) -> Tuple[float, float]:
+    """Seconds and peak MiB of one run, measured in separate runs."""
+    gc.collect()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak / 2 ** 20
+
+
+def bench_show_all_products(size: int) -> float:
+    from more_products.parse import get_page_products, make_browser
+
+    # timed in the scraper's own browser, with its resource blocking
+    with running_sites(SiteConfig(Catalog(size))) as base_urls:
+        url = urljoin(base_urls["webscraper"], f"test-sites/e-commerce/more/{CATEGORY}")
+        with make_browser() as driver:
+            start = time.perf_counter()
+            get_page_products(driver, url)
+            return time.perf_counter() - start
+
+
+def report(name: str, results: List[Tuple[int, float, float]]) -> None:
+    print(name)
+    previous = None
+    for size, seconds, peak in results:
+        growth = ""
+        if previous:
+            growth = f"  x{seconds / previous[1]:.1f} time, x{peak / previous[2]:.1f} memory"
+        print(f"  {size:>9} items {seconds:9.4f} s {peak:9.2f} MiB{growth}")
+        previous = (size, seconds, peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parser scaling benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help="run benchmarks whose name contains this")
+    parser.add_argument("--browser", action="store_true", help="also run show_all_products")
+    args = parser.parse_args()
+
+    # the scrapers import bs4 and numpy on first use, keep that out of the timings
+    import bs4  # noqa: F401
+    import numpy  # noqa: F401
+
+    for name, bench in BENCHMARKS.items():
+        if args.only and args.only not in name:
+            continue
+        results = []
+        for size in args.sizes:
+            results.append((size, *measure(bench(Catalog(size, args.seed)))))
+        report(name, results)
+
+    if args.browser:
+        print("more_products.show_all_products (Chrome)")
+        for size in args.sizes:
+            print(f"  {size:>9} items {bench_show_all_products(size):9.4f} s")
+
+
+if __name__ == "__main__":
+    main()
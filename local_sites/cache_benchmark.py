@@ -0,0 +1,104 @@
+"""Throughput of the Scrapy HTTP cache storages against the stand-in sites.
+
+Crawls the stand-in books.toscrape.com with ``BooksSpider`` once without a
+cache, then with every storage twice: cold (downloading and storing every
+page) and warm (every page from the cache). Each crawl is a ``scrapy crawl``
+in its own process with the production profile, so the numbers include
+what a real run pays:
+
+    python -m local_sites.cache_benchmark --size 2000 --latency 0.01
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from local_sites.catalog import Catalog
+from local_sites.server import ENV_VARS, SiteConfig, running_sites
+
+ROOT = Path(__file__).resolve().parents[1]
+PROJECT = ROOT / "books_to_scrape"
+
+STORAGES = {
+    "sqlite": "common.scrapy_ext.SQLiteCacheStorage",
+    "filesystem": "scrapy.extensions.httpcache.FilesystemCacheStorage",
+}
+# the pace of a polite crawl is not what is measured here
+UNTHROTTLED = {"AUTOTHROTTLE_ENABLED": "False", "CONCURRENT_REQUESTS_PER_DOMAIN": "32"}
+
+
+def crawl(env: Dict[str, str], settings: Dict[str, str]) -> Tuple[float, int, int]:
+    """Seconds, responses and cache hits of one ``scrapy crawl books``."""
+    options = [
+        option
+        for name, value in {**UNTHROTTLED, **settings, "LOG_LEVEL": "INFO"}.items()
+        for option in ("-s", f"{name}={value}")
+    ]
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "scrapy", "crawl", "books", *options],
+        cwd=PROJECT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    def stat(name: str) -> int:
+        match = re.search(rf"'{re.escape(name)}': (\d+)", result.stderr)
+        return int(match.group(1)) if match else 0
+
+    return elapsed, stat("response_received_count"), stat("httpcache/hit")
+
+
+def disk_usage(directory: str) -> Tuple[int, int]:
+    """Files and bytes under directory."""
+    files = size = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+
+def report(
+    name: str, seconds: float, responses: int, hits: int, usage: Optional[Tuple[int, int]]
+) -> None:
+    line = f"  {name:<17} {seconds:8.2f} s {responses / seconds:9.1f} pages/s {hits:>7} hits"
+    if usage is not None:
+        files, size = usage
+        line += f" {files:>8} files {size / 2 ** 20:9.2f} MiB"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrapy HTTP cache storage benchmark")
+    parser.add_argument("--size", type=int, default=1000, help="books in the catalog")
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = SiteConfig(Catalog(args.size), latency=args.latency)
+    with running_sites(config) as base_urls, tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            **{ENV_VARS[site]: base_url for site, base_url in base_urls.items()},
+            "PYTHONPATH": str(ROOT),
+        }
+        print(f"BooksSpider, {args.size} books")
+        report("no cache", *crawl(env, {"HTTPCACHE_ENABLED": "False"}), None)
+
+        for name, storage in STORAGES.items():
+            cache_dir = os.path.join(directory, name)
+            settings = {"HTTPCACHE_STORAGE": storage, "HTTPCACHE_DIR": cache_dir}
+            for run in ("cold", "warm"):
+                report(f"{name} {run}", *crawl(env, settings), disk_usage(cache_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Deterministic synthetic data behind the local stand-in sites.
+
+Every item is derived from ``(seed, kind, index)`` alone, so any page of any
+size of catalog is generated on demand, in constant memory, and is the same
+in every run and every process.
+"""
+import random
+from dataclasses import dataclass
+from typing import Dict, List
+
+DEFAULT_SIZE = 100
+DEFAULT_SEED = 0
+
+PRODUCT_CATEGORIES = ["computers/laptops", "computers/tablets", "phones/touch"]
+BOOK_CATEGORIES = ["Poetry", "Travel", "Mystery", "Historical Fiction", "Science"]
+HDD_SIZES = ["128", "256", "512", "1024"]
+RATINGS = ["Zero", "One", "Two", "Three", "Four", "Five"]
+
+BRANDS = ["Asus", "Acer", "Lenovo", "Dell", "HP", "Apple", "Samsung", "Nokia", "Huawei"]
+MODELS = ["VivoBook", "Aspire", "ThinkPad", "Inspiron", "ProBook", "Galaxy", "Lumia", "Iconia"]
+WORDS = (
+    "fast light thin bright screen battery memory core display storage quiet "
+    "sturdy compact wireless sharp smooth reliable modern classic portable"
+).split()
+AUTHORS = ["Albert Einstein", "Jane Austen", "Mark Twain", "J.K. Rowling", "Marilyn Monroe"]
+TAGS = ["life", "love", "inspirational", "humor", "books", "truth", "friendship"]
+
+
+@dataclass(frozen=True)
+class Product:
+    id: int
+    title: str
+    description: str
+    price: float
+    rating: int
+    num_of_reviews: int
+    hdd_prices: Dict[str, float]  # missing sizes are rendered as disabled swatches
+
+
+@dataclass(frozen=True)
+class Quote:
+    text: str
+    author: str
+    tags: List[str]
+
+
+@dataclass(frozen=True)
+class Book:
+    id: int
+    title: str
+    price: float
+    amount_in_stock: int
+    rating: int
+    category: str
+    description: str
+    upc: str
+
+    @property
+    def slug(self) -> str:
+        return "-".join(self.title.lower().split()) + f"_{self.id}"
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+class Catalog:
+    def __init__(self, size: int = DEFAULT_SIZE, seed: int = DEFAULT_SEED):
+        self.size = size  # items per product category, quotes and books
+        self.seed = seed
+
+    def _rng(self, kind: str, index: int) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}:{index}")
+
+    def product(self, category: str, index: int) -> Product:
+        product_id = PRODUCT_CATEGORIES.index(category) * self.size + index
+        rng = self._rng("product", product_id)
+        price = round(rng.uniform(20, 1500), 2)
+
+        hdd_prices = {}
+        for step, hdd in enumerate(HDD_SIZES):
+            if step == 0 or rng.random() > 0.2:
+                hdd_prices[hdd] = round(price + 20 * step, 2)
+
+        return Product(
+            id=product_id,
+            title=f"{rng.choice(BRANDS)} {rng.choice(MODELS)} {rng.randint(100, 999)}",
+            description=_sentence(rng, rng.randint(6, 14)),
+            price=price,
+            rating=rng.randint(1, 5),
+            num_of_reviews=rng.randint(0, 15),
+            hdd_prices=hdd_prices,
+        )
+
+    def products(self, category: str, start: int = 0, stop: int = None) -> List[Product]:
+        stop = self.size if stop is None else min(stop, self.size)
+        return [self.product(category, index) for index in range(start, stop)]
+
+    def featured(self, count: int = 3) -> List[Product]:
+        rng = self._rng("featured", 0)
+        return [
+            self.product(rng.choice(PRODUCT_CATEGORIES), rng.randrange(self.size))
+            for _ in range(count)
+        ]
+
+    def quote(self, index: int) -> Quote:
+        rng = self._rng("quote", index)
+        return Quote(
+            text=f"“{_sentence(rng, rng.randint(8, 20))}.”",
+            author=rng.choice(AUTHORS),
+            tags=sorted(rng.sample(TAGS, rng.randint(0, 3))),
+        )
+
+    def book(self, index: int) -> Book:
+        rng = self._rng("book", index)
+        return Book(
+            id=index + 1,
+            title=" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title(),
+            price=round(rng.uniform(10, 60), 2),
+            amount_in_stock=rng.randint(1, 22),
+            rating=rng.randint(1, 5),
+            category=rng.choice(BOOK_CATEGORIES),
+            description=_sentence(rng, rng.randint(20, 60)),
+            upc=f"{rng.getrandbits(64):016x}",
+        )
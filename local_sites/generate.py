@@ -0,0 +1,149 @@
+"""Synthetic pages for catalogs of any size, deterministic from the seed.
+
+The stand-in server renders every response through these functions, and they
+can be used directly to get the HTML of a static category page, a load-more
+page after any number of clicks or a books listing for scale tests:
+
+    python -m local_sites.generate static --size 100000 --out /tmp/laptops
+
+Pagination is truncated with "…" around the current page on large catalogs,
+like the real sites do, so page HTML stays small however big the catalog is.
+"""
+import argparse
+import math
+import os
+from typing import Optional, Tuple
+
+from local_sites import pages
+from local_sites.catalog import Catalog
+
+PRODUCTS_PER_PAGE = 6
+QUOTES_PER_PAGE = 10
+BOOKS_PER_PAGE = 20
+PAGINATION_WINDOW = 2  # pages shown on each side of the current one
+
+STATIC_ROOT = "/test-sites/e-commerce/static"
+MORE_ROOT = "/test-sites/e-commerce/more"
+
+
+def num_pages(size: int, per_page: int) -> int:
+    return max(1, math.ceil(size / per_page))
+
+
+def _slice(page: int, per_page: int, size: int) -> Tuple[int, int]:
+    start = (page - 1) * per_page
+    return start, min(start + per_page, size)
+
+
+def featured_page(catalog: Catalog, title: str, root: str = STATIC_ROOT) -> str:
+    return pages.products_page(title, catalog.featured(), f"{root}/product/")
+
+
+def static_page(
+    catalog: Catalog, category: str, page: int = 1, per_page: int = PRODUCTS_PER_PAGE
+) -> str:
+    title = category.split("/")[-1].capitalize()
+    detail_path = f"{STATIC_ROOT}/product/"
+    total_pages = num_pages(catalog.size, per_page)
+
+    if page > total_pages:
+        return pages.products_page(title, [], detail_path)
+
+    products = catalog.products(category, *_slice(page, per_page, catalog.size))
+    pager = pages.pagination(f"{STATIC_ROOT}/{category}", page, total_pages, PAGINATION_WINDOW)
+    return pages.products_page(title, products, detail_path, pager)
+
+
+def more_page(
+    catalog: Catalog, category: str, loaded_pages: int = 1, per_page: int = PRODUCTS_PER_PAGE
+) -> str:
+    """The load-more page as it looks after ``loaded_pages - 1`` clicks."""
+    total_pages = num_pages(catalog.size, per_page)
+    loaded_pages = min(loaded_pages, total_pages)
+
+    return pages.more_products_page(
+        category.split("/")[-1].capitalize(),
+        catalog.products(category, 0, loaded_pages * per_page),
+        f"{MORE_ROOT}/product/",
+        f"{MORE_ROOT}/{category}/items",
+        has_more=loaded_pages < total_pages,
+    )
+
+
+def more_items(
+    catalog: Catalog, category: str, page: int, per_page: int = PRODUCTS_PER_PAGE
+) -> Tuple[str, bool]:
+    """HTML fragment the "more" button appends, and whether it is the last."""
+    products = catalog.products(category, *_slice(page, per_page, catalog.size))
+    fragment = "\n".join(
+        pages.product_thumbnail(product, f"{MORE_ROOT}/product/") for product in products
+    )
+    return fragment, page >= num_pages(catalog.size, per_page)
+
+
+def quotes_listing(catalog: Catalog, page: int, per_page: int = QUOTES_PER_PAGE) -> str:
+    quotes = [catalog.quote(index) for index in range(*_slice(page, per_page, catalog.size))]
+    has_next = page < num_pages(catalog.size, per_page)
+    return pages.quotes_page(quotes, page + 1 if has_next else None)
+
+
+def books_listing(
+    catalog: Catalog, page: int, per_page: int = BOOKS_PER_PAGE
+) -> Optional[str]:
+    if page > num_pages(catalog.size, per_page):
+        return None
+
+    books = [catalog.book(index) for index in range(*_slice(page, per_page, catalog.size))]
+    prefix = "catalogue/" if page == 1 else ""
+    next_href = None
+    if page < num_pages(catalog.size, per_page):
+        next_href = f"{prefix}page-{page + 1}.html"
+
+    return pages.books_page(books, prefix, next_href)
+
+
+LAYOUTS = ("static", "more", "books", "quotes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic pages to a directory")
+    parser.add_argument("layout", choices=LAYOUTS)
+    parser.add_argument("--size", type=int, default=1000, help="items in the catalog")
+    parser.add_argument("--per-page", type=int, help="items per page")
+    parser.add_argument("--pages", type=int, help="only the first N pages")
+    parser.add_argument("--category", default="computers/laptops")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    catalog = Catalog(args.size, args.seed)
+    per_page = args.per_page or {
+        "static": PRODUCTS_PER_PAGE,
+        "more": PRODUCTS_PER_PAGE,
+        "books": BOOKS_PER_PAGE,
+        "quotes": QUOTES_PER_PAGE,
+    }[args.layout]
+    total_pages = num_pages(args.size, per_page)
+    os.makedirs(args.out, exist_ok=True)
+
+    if args.layout == "more":
+        # one fully expanded page, the page_source after all clicks
+        generated = [("all.html", more_page(catalog, args.category, total_pages, per_page))]
+    else:
+        render = {
+            "static": lambda page: static_page(catalog, args.category, page, per_page),
+            "books": lambda page: books_listing(catalog, page, per_page),
+            "quotes": lambda page: quotes_listing(catalog, page, per_page),
+        }[args.layout]
+        last_page = min(total_pages, args.pages or total_pages)
+        generated = (
+            (f"page-{page}.html", render(page)) for page in range(1, last_page + 1)
+        )
+
+    for name, html in generated:
+        with open(os.path.join(args.out, name), "w") as f:
+            f.write(html)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""HTML of the stand-in sites, structurally faithful to the real ones.
+
+Only the markup the scrapers rely on is reproduced: classes, attributes,
+nesting and links of product thumbnails, pagination, the "more" button,
+product swatches, quotes with their pager and book listings and details.
+"""
+import json
+from html import escape
+from typing import List, Optional
+
+from local_sites.catalog import Book, Product, Quote, HDD_SIZES, RATINGS
+
+LAYOUT = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<link rel="stylesheet" href="/static/site.css">
+<script src="/static/analytics.js"></script>
+</head>
+<body>
+<header class="navbar"><a href="/">Home</a></header>
+<div class="container">
+{body}
+</div>
+<footer><p>Stand-in for offline testing</p></footer>
+</body>
+</html>
+"""
+
+
+def layout(title: str, body: str) -> str:
+    return LAYOUT.format(title=escape(title), body=body)
+
+
+def product_thumbnail(product: Product, detail_path: str) -> str:
+    stars = '<span class="glyphicon glyphicon-star"></span>' * product.rating
+    return f"""<div class="col-sm-4 col-lg-4 col-md-4">
+<div class="thumbnail">
+<img src="/images/item.png" class="img-responsive" alt="item">
+<div class="caption">
+<h4 class="pull-right price">${product.price:.2f}</h4>
+<h4><a href="{detail_path}{product.id}" class="title" title="{escape(product.title)}">{escape(product.title[:20])}</a></h4>
+<p class="description">{escape(product.description)}</p>
+</div>
+<div class="ratings">
+<p class="pull-right">{product.num_of_reviews} reviews</p>
+<p data-rating="{product.rating}">{stars}</p>
+</div>
+</div>
+</div>"""
+
+
+def pagination(path: str, page: int, num_pages: int, window: Optional[int] = None) -> str:
+    """Numbered pages and a next arrow; with ``window`` the middle is truncated."""
+    if num_pages <= 1:
+        return ""
+
+    numbers = range(1, num_pages + 1)
+    if window is not None:
+        numbers = sorted(
+            {1, num_pages} | set(range(max(1, page - window), min(num_pages, page + window) + 1))
+        )
+
+    items = []
+    for previous, number in zip([0, *numbers], numbers):
+        if number - previous > 1:
+            items.append('<li class="page-item disabled"><span class="page-link">…</span></li>')
+        items.append(
+            f'<li class="page-item{" active" if number == page else ""}">'
+            f'<a class="page-link" href="{path}?page={number}">{number}</a></li>'
+        )
+    if page < num_pages:
+        items.append(
+            f'<li class="page-item"><a class="page-link" href="{path}?page={page + 1}" '
+            f'rel="next">›</a></li>'
+        )
+    else:
+        items.append('<li class="page-item disabled"><span class="page-link">›</span></li>')
+
+    return f'<ul class="pagination">{"".join(items)}</ul>'
+
+
+def products_page(
+    title: str, products: List[Product], detail_path: str, pager: str = ""
+) -> str:
+    thumbnails = "\n".join(product_thumbnail(product, detail_path) for product in products)
+    return layout(title, f'<div class="row">\n{thumbnails}\n</div>\n{pager}')
+
+
+def more_products_page(
+    title: str, products: List[Product], detail_path: str, items_path: str, has_more: bool
+) -> str:
+    thumbnails = "\n".join(product_thumbnail(product, detail_path) for product in products)
+    button_style = "" if has_more else ' style="display: none"'
+    body = f"""<div id="cookieBanner"><button class="acceptCookies" onclick="this.parentNode.remove()">Accept &amp; Continue</button></div>
+<div class="row ecomerce-items">
+{thumbnails}
+</div>
+<a class="btn btn-primary ecomerce-items-scroll-more" href="#"{button_style}>More</a>
+<script>
+var nextPage = 2;
+document.querySelector(".ecomerce-items-scroll-more").addEventListener("click", function (event) {{
+  event.preventDefault();
+  var button = this;
+  fetch("{items_path}?page=" + nextPage++).then(function (response) {{
+    if (response.headers.get("X-Last-Page") === "1") button.style.display = "none";
+    return response.text();
+  }}).then(function (html) {{
+    document.querySelector(".ecomerce-items").insertAdjacentHTML("beforeend", html);
+  }});
+}});
+</script>"""
+    return layout(title, body)
+
+
+def product_detail_page(product: Product) -> str:
+    swatches = "".join(
+        f'<button type="button" class="btn swatch" value="{hdd}"'
+        f'{"" if hdd in product.hdd_prices else " disabled"}>{hdd}</button>'
+        for hdd in HDD_SIZES
+    )
+    body = f"""<div class="thumbnail">
+<div class="caption">
+<h4 class="pull-right price">${product.price:.2f}</h4>
+<h4>{escape(product.title)}</h4>
+<p class="description">{escape(product.description)}</p>
+<div class="swatches">{swatches}</div>
+</div>
+</div>
+<script>
+var prices = {json.dumps(product.hdd_prices)};
+document.querySelectorAll(".swatch").forEach(function (button) {{
+  button.addEventListener("click", function () {{
+    document.querySelector(".price").textContent = "$" + prices[button.value].toFixed(2);
+  }});
+}});
+</script>"""
+    return layout(product.title, body)
+
+
+def quote_block(quote: Quote) -> str:
+    tags = "".join(
+        f'<a class="tag" href="/tag/{tag}/page/1/">{tag}</a>' for tag in quote.tags
+    )
+    return f"""<div class="quote" itemscope itemtype="http://schema.org/CreativeWork">
+<span class="text" itemprop="text">{escape(quote.text)}</span>
+<span>by <small class="author" itemprop="author">{escape(quote.author)}</small></span>
+<div class="tags">Tags: {tags}</div>
+</div>"""
+
+
+def quotes_page(quotes: List[Quote], next_page: Optional[int]) -> str:
+    blocks = "\n".join(quote_block(quote) for quote in quotes)
+    pager = ""
+    if next_page:
+        pager = f'<li class="next"><a href="/page/{next_page}/">Next <span>→</span></a></li>'
+
+    return layout("Quotes to Scrape", f'{blocks}\n<nav><ul class="pager">{pager}</ul></nav>')
+
+
+def book_pod(book: Book, prefix: str) -> str:
+    return f"""<li class="col-xs-6 col-sm-4 col-md-3 col-lg-3"><article class="product_pod">
+<p class="star-rating {RATINGS[book.rating]}"></p>
+<h3><a href="{prefix}{book.slug}/index.html" title="{escape(book.title)}">{escape(book.title[:30])}</a></h3>
+<div class="product_price"><p class="price_color">£{book.price:.2f}</p></div>
+</article></li>"""
+
+
+def books_page(books: List[Book], prefix: str, next_href: Optional[str]) -> str:
+    pods = "\n".join(book_pod(book, prefix) for book in books)
+    pager = ""
+    if next_href:
+        pager = f'<ul class="pager"><li class="next"><a href="{next_href}">next</a></li></ul>'
+
+    return layout("All products | Books to Scrape", f'<ol class="row">\n{pods}\n</ol>\n{pager}')
+
+
+def book_detail_page(book: Book) -> str:
+    body = f"""<ul class="breadcrumb">
+<li><a href="../../index.html">Home</a></li>
+<li><a href="../category/books_1/index.html">Books</a></li>
+<li><a href="../category/books/{book.category.lower()}/index.html">{escape(book.category)}</a></li>
+<li class="active">{escape(book.title)}</li>
+</ul>
+<div class="row"><div class="col-sm-6 product_main">
+<h1>{escape(book.title)}</h1>
+<p class="price_color">£{book.price:.2f}</p>
+<p class="instock availability"><i class="icon-ok"></i> In stock ({book.amount_in_stock} available)</p>
+<p class="star-rating {RATINGS[book.rating]}"></p>
+</div></div>
+<div id="product_description" class="sub-header"><h2>Product Description</h2></div>
+<p>{escape(book.description)}</p>
+<table class="table table-striped">
+<tr><th>UPC</th><td>{book.upc}</td></tr>
+<tr><th>Product Type</th><td>Books</td></tr>
+</table>"""
+    return layout(book.title, body)
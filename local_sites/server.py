@@ -0,0 +1,214 @@
+"""Local stand-in servers for webscraper.io, quotes.toscrape.com and books.toscrape.com.
+
+Every site runs on its own port with the same paths as the real one, so the
+scrapers only need their base url switched (``WEBSCRAPER_BASE_URL``,
+``QUOTES_BASE_URL`` and ``BOOKS_BASE_URL``). Catalog size, latency and an
+error rate are configurable to load-test the concurrent fetchers:
+
+    python -m local_sites.server --size 10000 --latency 0.05 --error-rate 0.01
+
+In tests use ``running_sites()`` or ``pytest --offline`` (see conftest.py).
+"""
+import argparse
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from local_sites import generate, pages
+from local_sites.catalog import Catalog, PRODUCT_CATEGORIES
+
+ENV_VARS = {
+    "webscraper": "WEBSCRAPER_BASE_URL",
+    "quotes": "QUOTES_BASE_URL",
+    "books": "BOOKS_BASE_URL",
+}
+
+Page = Tuple[int, str, Dict[str, str]]  # status, html, extra headers
+NOT_FOUND: Page = (404, pages.layout("Not found", "<h1>404</h1>"), {})
+
+
+@dataclass
+class SiteConfig:
+    catalog: Catalog = field(default_factory=Catalog)
+    latency: float = 0.0  # seconds added to every response
+    error_rate: float = 0.0  # share of responses replaced by a 503
+    seed: int = 0
+    products_per_page: int = generate.PRODUCTS_PER_PAGE
+    quotes_per_page: int = generate.QUOTES_PER_PAGE
+    books_per_page: int = generate.BOOKS_PER_PAGE
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def inject_error(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+
+def _page_number(query: Dict[str, list]) -> int:
+    try:
+        return max(1, int(query.get("page", ["1"])[0]))
+    except ValueError:
+        return 1
+
+
+def webscraper_site(config: SiteConfig, path: str, query: Dict[str, list]) -> Page:
+    match = re.fullmatch(r"/test-sites/e-commerce/(static|more)(?:/(.*))?", path)
+    if match is None:
+        return NOT_FOUND
+
+    layout, rest = match.group(1), match.group(2) or ""
+    catalog, per_page = config.catalog, config.products_per_page
+    root = generate.MORE_ROOT if layout == "more" else generate.STATIC_ROOT
+
+    if rest in ("", "computers", "phones"):
+        return 200, generate.featured_page(catalog, rest.capitalize() or "Home", root), {}
+
+    if product_match := re.fullmatch(r"product/(\d+)", rest):
+        category, index = divmod(int(product_match.group(1)), catalog.size)
+        if category >= len(PRODUCT_CATEGORIES):
+            return NOT_FOUND
+        product = catalog.product(PRODUCT_CATEGORIES[category], index)
+        return 200, pages.product_detail_page(product), {}
+
+    category, items = rest, False
+    if rest.endswith("/items"):
+        category, items = rest[: -len("/items")], True
+    if category not in PRODUCT_CATEGORIES:
+        return NOT_FOUND
+
+    page = _page_number(query)
+
+    if items:
+        fragment, last = generate.more_items(catalog, category, page, per_page)
+        return 200, fragment, {"X-Last-Page": "1" if last else "0"}
+
+    if layout == "more":
+        return 200, generate.more_page(catalog, category, 1, per_page), {}
+
+    return 200, generate.static_page(catalog, category, page, per_page), {}
+
+
+def quotes_site(config: SiteConfig, path: str, query: Dict[str, list]) -> Page:
+    match = re.fullmatch(r"/(?:page/(\d+)/?)?", path)
+    if match is None:
+        return NOT_FOUND
+
+    page = int(match.group(1) or 1)
+    return 200, generate.quotes_listing(config.catalog, page, config.quotes_per_page), {}
+
+
+def books_site(config: SiteConfig, path: str, query: Dict[str, list]) -> Page:
+    if path in ("/", "/index.html"):
+        page = 1
+    elif match := re.fullmatch(r"/catalogue/page-(\d+)\.html", path):
+        page = int(match.group(1))
+    elif match := re.fullmatch(r"/catalogue/[\w-]+_(\d+)/index\.html", path):
+        index = int(match.group(1)) - 1
+        if index >= config.catalog.size:
+            return NOT_FOUND
+        return 200, pages.book_detail_page(config.catalog.book(index)), {}
+    else:
+        return NOT_FOUND
+
+    html = generate.books_listing(config.catalog, page, config.books_per_page)
+    return (200, html, {}) if html is not None else NOT_FOUND
+
+
+SITES: Dict[str, Callable[[SiteConfig, str, Dict[str, list]], Page]] = {
+    "webscraper": webscraper_site,
+    "quotes": quotes_site,
+    "books": books_site,
+}
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        config: SiteConfig = self.server.config
+
+        if config.latency:
+            time.sleep(config.latency)
+
+        if config.inject_error():
+            status, html, headers = 503, pages.layout("Unavailable", "<h1>503</h1>"), {}
+        else:
+            url = urlsplit(self.path)
+            status, html, headers = self.server.site(config, url.path, parse_qs(url.query))
+
+        body = html.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(site: str, config: SiteConfig, host: str = "127.0.0.1", port: int = 0):
+    server = ThreadingHTTPServer((host, port), SiteHandler)
+    server.daemon_threads = True
+    server.site = SITES[site]
+    server.config = config
+    return server
+
+
+@contextmanager
+def running_sites(
+    config: Optional[SiteConfig] = None, host: str = "127.0.0.1"
+) -> Iterator[Dict[str, str]]:
+    """Serve all sites on free ports in background threads, yield base urls."""
+    config = config or SiteConfig()
+    servers = {site: make_server(site, config, host) for site in SITES}
+
+    for server in servers.values():
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        yield {site: f"http://{host}:{server.server_port}/" for site, server in servers.items()}
+    finally:
+        for server in servers.values():
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the stand-in sites locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001, help="first port, one per site")
+    parser.add_argument("--size", type=int, default=100, help="items per category")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = SiteConfig(Catalog(args.size, args.seed), args.latency, args.error_rate, args.seed)
+    servers = [
+        make_server(site, config, args.host, args.port + i) for i, site in enumerate(SITES)
+    ]
+
+    for site, server in zip(SITES, servers):
+        print(f"export {ENV_VARS[site]}=http://{args.host}:{server.server_port}/")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+from bs4 import BeautifulSoup
+
+from local_sites import generate
+from local_sites.catalog import Catalog
+
+CATEGORY = "computers/laptops"
+
+
+def test_pages_are_deterministic_from_seed():
+    assert generate.static_page(Catalog(1000, seed=3), CATEGORY, 7) == generate.static_page(
+        Catalog(1000, seed=3), CATEGORY, 7
+    )
+    assert generate.static_page(Catalog(1000, seed=3), CATEGORY) != generate.static_page(
+        Catalog(1000, seed=4), CATEGORY
+    )
+
+
+def test_large_catalog_pagination_is_truncated():
+    soup = BeautifulSoup(generate.static_page(Catalog(100_000), CATEGORY, 500), "html.parser")
+    items = [li.text for li in soup.select(".pagination > li")]
+
+    assert items == ["1", "…", "498", "499", "500", "501", "502", "…", "16667", "›"]
+
+
+def test_more_page_holds_all_loaded_pages():
+    html = generate.more_page(Catalog(100), CATEGORY, loaded_pages=3, per_page=10)
+    soup = BeautifulSoup(html, "html.parser")
+
+    more_button = soup.select_one(".ecomerce-items-scroll-more")
+
+    assert len(soup.select(".thumbnail")) == 30
+    assert "display: none" not in more_button.attrs.get("style", "")
+
+
+def test_last_books_page_has_no_next_link():
+    assert "page-3.html" in generate.books_listing(Catalog(50), 2)
+    assert 'class="next"' not in generate.books_listing(Catalog(50), 3)
+    assert generate.books_listing(Catalog(50), 4) is None
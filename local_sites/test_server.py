@@ -0,0 +1,44 @@
+from urllib.parse import urljoin
+
+import httpx
+import pytest
+
+import all_in_one.parse
+import quotes_to_scrape.parse
+from local_sites.catalog import Catalog
+from local_sites.server import SiteConfig, running_sites
+
+CATALOG = Catalog(size=25, seed=1)
+
+
+@pytest.fixture(scope="module")
+def sites():
+    with running_sites(SiteConfig(CATALOG)) as base_urls:
+        yield base_urls
+
+
+def test_static_category_products(sites):
+    url = urljoin(sites["webscraper"], "test-sites/e-commerce/static/computers/laptops")
+
+    products = all_in_one.parse.get_page_products(url)
+
+    assert [product.title for product in products] == [
+        product.title for product in CATALOG.products("computers/laptops", 0, 6)
+    ]
+
+
+def test_all_quotes_are_followed(sites, monkeypatch):
+    monkeypatch.setattr(quotes_to_scrape.parse, "BASE_URL", sites["quotes"])
+
+    quotes = quotes_to_scrape.parse.get_all_quotes()
+
+    assert [quote.text for quote in quotes] == [CATALOG.quote(i).text for i in range(25)]
+
+
+def test_unknown_page_is_not_found(sites):
+    assert httpx.get(urljoin(sites["books"], "catalogue/page-99.html")).status_code == 404
+
+
+def test_error_injection():
+    with running_sites(SiteConfig(CATALOG, error_rate=1.0)) as base_urls:
+        assert httpx.get(base_urls["quotes"]).status_code == 503
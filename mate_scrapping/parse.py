@@ -1,18 +1,45 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
 from dataclasses import dataclass
 from enum import Enum
-from typing import List
+from typing import TYPE_CHECKING, Any, Iterator, List, Optional
+
+from common.failures import FAILURES
+from common.fetch import AsyncFetcher, run_sync
+from common.soup import Region, class_index, make_soup
 
-import requests
-from bs4 import BeautifulSoup
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
 HOME_URL = "https://mate.academy/"
 
+# Parsed courses are reused for this many seconds, so polling every minute
+# downloads the page at most once a minute and parses it only when it changed
+COURSES_TTL = float(os.environ.get("MATE_COURSES_TTL", "60"))
+
+# The Next.js page state, read without building a soup at all
+NEXT_DATA = re.compile(rb'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL)
+NAME_KEYS = ("name", "title")
+DESCRIPTION_KEYS = ("shortDescription", "description")
+TYPE_KEYS = ("type", "courseType", "format")
+
+COURSE_CARD = "CourseCard_cardContainer"
+
 
 class CourseType(Enum):
     FULL_TIME = "full-time"
     PART_TIME = "part-time"
 
 
+# Only the course sections (their ids are the course types) are built
+PARSE_REGION = Region(id=[course_type.value for course_type in CourseType])
+
+
 @dataclass
 class Course:
     name: str
@@ -20,6 +47,16 @@ class Course:
     type: CourseType
 
 
+@dataclass
+class CachedCourses:
+    courses: List[Course]
+    digest: bytes  # of the page they were parsed from
+    fetched_at: float
+
+
+_cached: Optional[CachedCourses] = None
+
+
 def parse_single_course(course_soup: BeautifulSoup, course_type: CourseType) -> Course:
     return Course(
         name=course_soup.select_one("a > span").text,
@@ -29,20 +66,97 @@ def parse_single_course(course_soup: BeautifulSoup, course_type: CourseType) ->
 
 
 def parse_section_courses(section_soup: BeautifulSoup, course_type: CourseType) -> List[Course]:
-    return [
-        parse_single_course(course_soup, course_type)
-        for course_soup in section_soup.select("[class^=CourseCard_cardContainer]")
-    ]
+    courses = FAILURES.isolate(
+        lambda course_soup: parse_single_course(course_soup, course_type),
+        class_index(section_soup)[COURSE_CARD],
+    )
+    return [course for course in courses if course is not None]
 
 
-def get_all_courses() -> List[Course]:
-    page = requests.get(HOME_URL).content
-    soup = BeautifulSoup(page, "html.parser")
+def _course_type(value: Any) -> Optional[CourseType]:
+    if not isinstance(value, str):
+        return None
+
+    try:
+        return CourseType(value.lower().replace("_", "-"))
+    except ValueError:
+        return None
+
+
+def _first(data: dict, keys) -> Optional[str]:
+    return next((data[key] for key in keys if isinstance(data.get(key), str)), None)
+
+
+def _walk_courses(data: Any) -> Iterator[Course]:
+    if isinstance(data, list):
+        for value in data:
+            yield from _walk_courses(value)
+    elif isinstance(data, dict):
+        name = _first(data, NAME_KEYS)
+        description = _first(data, DESCRIPTION_KEYS)
+        course_type = next(
+            filter(None, (_course_type(data.get(key)) for key in TYPE_KEYS)), None
+        )
 
-    return [
-        *parse_section_courses(soup.select_one("#full-time > .large-6"), CourseType.FULL_TIME),
-        *parse_section_courses(soup.select_one("#part-time > .large-6"), CourseType.PART_TIME),
-    ]
+        if name and description is not None and course_type is not None:
+            yield Course(name=name, short_description=description, type=course_type)
+        else:
+            for value in data.values():
+                yield from _walk_courses(value)
+
+
+def parse_next_data_courses(page: bytes) -> List[Course]:
+    """Courses from the embedded ``__NEXT_DATA__`` JSON, [] if the page has none."""
+    match = NEXT_DATA.search(page)
+    if match is None:
+        return []
+
+    try:
+        data = json.loads(match.group(1))
+    except ValueError:
+        return []
+
+    unique = {(course.name, course.type): course for course in _walk_courses(data)}
+    return list(unique.values())
+
+
+def parse_home_page_courses(page: bytes) -> List[Course]:
+    if courses := parse_next_data_courses(page):
+        return courses
+
+    soup = make_soup(page, PARSE_REGION)
+    courses = []
+
+    for course_type in CourseType:
+        section_soup = soup.select_one(f"#{course_type.value} > .large-6")
+        if section_soup is None:
+            FAILURES.record("page", ValueError(f"No {course_type.value} section"), HOME_URL)
+            continue
+        courses.extend(parse_section_courses(section_soup, course_type))
+
+    return courses
+
+
+async def fetch_all_courses(fetcher: AsyncFetcher, ttl: float = COURSES_TTL) -> List[Course]:
+    global _cached
+
+    if _cached is not None and time.monotonic() - _cached.fetched_at < ttl:
+        return list(_cached.courses)
+
+    page = await fetcher.get(HOME_URL)
+    digest = hashlib.blake2b(page, digest_size=16).digest()
+
+    if _cached is not None and _cached.digest == digest:
+        courses = _cached.courses  # page unchanged, not parsed again
+    else:
+        courses = await fetcher.parse(parse_home_page_courses, page)
+
+    _cached = CachedCourses(courses, digest, time.monotonic())
+    return list(courses)
+
+
+def get_all_courses() -> List[Course]:
+    return run_sync(fetch_all_courses)
 
 
 def main():
@@ -1,4 +1,12 @@
-from mate_scrapping.parse import get_all_courses, CourseType
+import asyncio
+import json
+
+import pytest
+
+from mate_scrapping import parse
+from mate_scrapping.parse import (
+    Course, CourseType, fetch_all_courses, get_all_courses, parse_home_page_courses
+)
 
 
 FOR_SURE_THIS_COURSES = [
@@ -8,6 +16,7 @@ FOR_SURE_THIS_COURSES = [
 ]  # frontend is web development sometimes
 
 
+@pytest.mark.network
 def test_get_all_courses():
     all_courses = get_all_courses()
 
@@ -20,3 +29,74 @@ def test_get_all_courses():
             assert any(
                 course.lower() in course_name.lower() for course_name in course_names
             ), f"Course '{course}' have not been parsed for '{course_type}'"
+
+
+COURSE_CARD = """
+<div class="CourseCard_cardContainer__x1Ab typography_body__9">
+  <a href="/courses/{slug}"><span>{name}</span></a><div><p>{description}</p></div>
+</div>
+"""
+
+
+def section(course_type, *names):
+    cards = "".join(
+        COURSE_CARD.format(slug=name.lower(), name=name, description=f"Learn {name}")
+        for name in names
+    )
+    return f'<section id="{course_type.value}"><div class="large-6">{cards}</div></section>'
+
+
+def test_embedded_json_is_preferred():
+    data = {"props": {"pageProps": {"courses": [
+        {"slug": "python", "name": "Python", "shortDescription": "Backend", "type": "FULL_TIME"},
+        {"slug": "qa", "name": "QA", "shortDescription": "Testing", "type": "PART_TIME"},
+        {"slug": "meta", "name": "Ignored", "type": "FULL_TIME"},
+    ]}}}
+    page = (
+        f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(data)}</script>'
+        + section(CourseType.FULL_TIME, "Java")
+    )
+
+    assert parse_home_page_courses(page.encode()) == [
+        Course("Python", "Backend", CourseType.FULL_TIME),
+        Course("QA", "Testing", CourseType.PART_TIME),
+    ]
+
+
+def test_css_fallback_finds_hashed_course_cards():
+    page = section(CourseType.FULL_TIME, "Python", "Java") + section(CourseType.PART_TIME, "QA")
+
+    assert [(course.name, course.type) for course in parse_home_page_courses(page.encode())] == [
+        ("Python", CourseType.FULL_TIME),
+        ("Java", CourseType.FULL_TIME),
+        ("QA", CourseType.PART_TIME),
+    ]
+
+
+class CountingFetcher:
+    def __init__(self, page: bytes):
+        self.page = page
+        self.downloads = 0
+        self.parses = 0
+
+    async def get(self, url, params=None):
+        self.downloads += 1
+        return self.page
+
+    async def parse(self, parser, *args):
+        self.parses += 1
+        return parser(*args)
+
+
+def test_courses_are_cached_and_unchanged_pages_not_parsed_again(monkeypatch):
+    monkeypatch.setattr(parse, "_cached", None)
+    page = section(CourseType.FULL_TIME, "Python") + section(CourseType.PART_TIME, "QA")
+    fetcher = CountingFetcher(page.encode())
+
+    first = asyncio.run(fetch_all_courses(fetcher, ttl=60))
+    second = asyncio.run(fetch_all_courses(fetcher, ttl=60))
+    assert first == second
+    assert (fetcher.downloads, fetcher.parses) == (1, 1)
+
+    asyncio.run(fetch_all_courses(fetcher, ttl=0))
+    assert (fetcher.downloads, fetcher.parses) == (2, 1)
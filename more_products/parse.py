@@ -1,18 +1,39 @@
-import csv
+from __future__ import annotations
+
+import logging
+import os
 import time
-from dataclasses import dataclass, fields, astuple
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
 from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.common import NoSuchElementException
-from selenium.webdriver.common.by import By
-from selenium.webdriver.remote.webdriver import WebDriver
-from selenium.webdriver.remote.webelement import WebElement
-
-BASE_URL = "https://webscraper.io/"
+from common.browser import BrowserOptions, make_driver
+from common.dom import BATCHED_EXTRACTION, extract_thumbnails
+from common.changefeed import CHANGEFEED, publish as publish_changes
+from common.failures import FAILURES
+from common.identity import ProductCache, parse_unknown, product_key
+from common.logs import configure_logging
+from common.memory import MemoryMonitor, RecyclingDriver
+from common.normalize import extract_records, reporting_run
+from common.output import OUTPUT_FORMAT, write_items
+from common.soup import Region, make_soup
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+    from selenium.webdriver.remote.webdriver import WebDriver
+    from selenium.webdriver.remote.webelement import WebElement
+
+BASE_URL = os.environ.get("WEBSCRAPER_BASE_URL", "https://webscraper.io/")
 HOME_URL = urljoin(BASE_URL, "test-sites/e-commerce/more/")
 
+COMBINED_PAGE = "all_products"  # every product once, across categories
+CHANGEFEED_PATH = "more_products/changefeed/"
+LOG_PATH = "more_products/logs/"  # parser.log and the dead letters
+DEAD_LETTER_FILE = "dead_letters.jl"
+
+# Only these subtrees are built into the soup
+PARSE_REGION = Region(class_="thumbnail")
+
 PAGES = {
     "home": HOME_URL,
     "computers": urljoin(HOME_URL, "computers"),
@@ -32,22 +53,68 @@ class Product:
     num_of_reviews: int
 
 
-PRODUCT_FIELDS = [field.name for field in fields(Product)]
 
+PRODUCT_SCHEMA = {
+    "title": "text",
+    "description": "text",
+    "price": "price",
+    "rating": "count",
+    "num_of_reviews": "count",
+}
+
+
+def raw_product_fields(product_soup: BeautifulSoup) -> dict:
+    return {
+        "title": product_soup.select_one(".title")["title"],
+        "description": product_soup.select_one(".description").text,
+        "price": product_soup.select_one(".price").text,
+        "rating": len(product_soup.select(".glyphicon-star")),
+        "num_of_reviews": product_soup.select_one(".ratings > p.pull-right").text,
+    }
 
-def parse_single_product(product_soup: BeautifulSoup) -> Product:
-    return Product(
-        title=product_soup.select_one(".title")["title"],
-        description=product_soup.select_one(".description").text,
-        price=float(product_soup.select_one(".price").text.replace("$", "")),
-        rating=len(product_soup.select(".glyphicon-star")),
-        num_of_reviews=int(
-            product_soup.select_one(".ratings > p.pull-right").text.split()[0]
-        ),
+
+def products_from_rows(rows: list[dict | None]) -> list[Product | None]:
+    return [None if row is None else Product(**row) for row in rows]
+
+
+def product_soup_key(product_soup: BeautifulSoup) -> str:
+    return product_key(BASE_URL, product_soup.select_one(".title")["href"])
+
+
+def parse_products(product_soups: list[BeautifulSoup]) -> list[Product | None]:
+    """Products at once, None for malformed ones (dead-lettered)."""
+    return products_from_rows(
+        extract_records(product_soups, raw_product_fields, PRODUCT_SCHEMA)
     )
 
 
+def parse_single_product(product_soup: BeautifulSoup) -> Product | None:
+    return parse_products([product_soup])[0]
+
+
+def raw_thumbnail_fields(fields: dict) -> dict:
+    return {
+        "title": fields["title"],
+        "description": fields["description"],
+        "price": fields["price"],
+        "rating": fields["stars"],
+        "num_of_reviews": fields["reviews"],
+    }
+
+
+def products_from_fields(thumbnails: list[dict]) -> list[Product | None]:
+    """Products from what ``extract_thumbnails`` returned."""
+    return products_from_rows(extract_records(thumbnails, raw_thumbnail_fields, PRODUCT_SCHEMA))
+
+
+def product_from_fields(fields: dict) -> Product | None:
+    return products_from_fields([fields])[0]
+
+
 def get_element_or_none(driver, class_name: str) -> WebElement | None:
+    from selenium.common import NoSuchElementException
+    from selenium.webdriver.common.by import By
+
     try:
         return driver.find_element(By.CLASS_NAME, class_name)
     except NoSuchElementException:
@@ -62,7 +129,8 @@ def check_and_click_cookies_button(driver: WebDriver) -> None:
             cookie_button.click()
 
 
-def show_all_products(driver: WebDriver) -> None:
+def show_all_products(driver: WebDriver, monitor: MemoryMonitor | None = None) -> None:
+    """Click "more" until every item is loaded; every click is a ``monitor`` step."""
     while True:
         check_and_click_cookies_button(driver)
 
@@ -72,39 +140,103 @@ def show_all_products(driver: WebDriver) -> None:
             break
 
         more_button.click()
+        if monitor is not None:
+            monitor.step_done(driver)
 
 
-def get_page_products(driver: WebDriver, url: str) -> list[Product]:
+def get_page_products(
+    driver: WebDriver,
+    url: str,
+    cache: ProductCache | None = None,
+    monitor: MemoryMonitor | None = None,
+) -> list[Product]:
+    cache = ProductCache() if cache is None else cache
     driver.get(url)
     time.sleep(0.5)
-    show_all_products(driver)
-    soup = BeautifulSoup(driver.page_source, "html.parser")
-    all_products = soup.select(".thumbnail")
-
-    return [parse_single_product(product_soup=product) for product in all_products]
-
-
-def get_all_products() -> list[Product]:
+    show_all_products(driver, monitor)
+
+    if BATCHED_EXTRACTION:
+        thumbnails = extract_thumbnails(driver)
+        keys = FAILURES.isolate(lambda fields: product_key(BASE_URL, fields["href"]), thumbnails)
+        entries = parse_unknown(keys, thumbnails, cache.known_keys(), products_from_fields)
+    else:
+        soup = make_soup(driver.page_source, PARSE_REGION)
+        try:
+            all_products = soup.select(".thumbnail")
+            keys = FAILURES.isolate(product_soup_key, all_products)
+            entries = parse_unknown(keys, all_products, cache.known_keys(), parse_products)
+        finally:
+            soup.decompose()  # the products hold plain strings, free the tree now
+
+    return [cache.add(key, product) for key, product in entries]
+
+
+def make_browser() -> WebDriver:
+    # stylesheets stay: show_all_products relies on is_displayed()
+    return make_driver(BrowserOptions(block_stylesheets=False))
+
+
+def get_browser_page_products(
+    browser: RecyclingDriver, url: str, cache: ProductCache
+) -> list[Product]:
+    with browser.page() as driver:
+        return get_page_products(driver, url, cache, browser.monitor)
+
+
+def get_pages_products(cache: ProductCache | None = None) -> dict[str, list[Product]]:
+    cache = ProductCache() if cache is None else cache
+    monitor = MemoryMonitor()
+
+    # the browser is restarted when it grows too big (see common.memory);
+    # a page that failed is dead-lettered and left out, the others are kept
+    with RecyclingDriver(make_browser, monitor=monitor) as browser:
+        pages_products = FAILURES.isolate(
+            lambda page_url: get_browser_page_products(browser, page_url, cache),
+            PAGES.values(),
+            "page",
+        )
+        monitor.stop(browser.current)
+
+    return {
+        page_name: products
+        for page_name, products in zip(PAGES, pages_products)
+        if products is not None
+    }
+
+
+def get_all_products(
+    combined: bool = False, changefeed_path: str | None = CHANGEFEED_PATH if CHANGEFEED else None
+) -> list[Product]:
+    """Write every page's products; ``changefeed_path`` gets the changes since the last run."""
     all_products = []
+    cache = ProductCache()
 
-    with webdriver.Chrome() as driver:
-        for page_name, page_url in PAGES.items():
-            products = get_page_products(driver, page_url)
+    with reporting_run("products"):
+        for page_name, products in get_pages_products(cache).items():
+            logging.info(f"Successfully parsed: {page_name} {products}")
             all_products.extend(products)
-            write_products_to_csv(page_name, products)
+            write_products(page_name, products, cache.keys_of(products))
+
+        logging.info(f"Unique products: {len(cache)}, parsed once and reused: {cache.hits}")
+
+    if combined:
+        write_products(COMBINED_PAGE, cache.products(), list(cache.known_keys()))
+    if changefeed_path is not None:
+        changes = publish_changes(cache.items(), changefeed_path, complete=not FAILURES)
+        logging.info(f"Changes since the last run: {dict(changes)}")
 
     return all_products
 
 
-def write_products_to_csv(page_name: str, products: list[Product]):
-    with open(f"{page_name}.csv", "w") as f:
-        writer = csv.writer(f)
-        writer.writerow(PRODUCT_FIELDS)
-        writer.writerows([astuple(product) for product in products])
+def write_products(page: str, products: list[Product], keys: list[str] | None = None) -> None:
+    write_items(page, Product, products, OUTPUT_FORMAT, keys)
 
 
 def main():
-    print(get_all_products())
+    configure_logging(LOG_PATH)
+    if FAILURES.path is None:
+        FAILURES.configure(os.path.join(LOG_PATH, DEAD_LETTER_FILE), FAILURES.budget)
+    get_all_products()
 
 
 if __name__ == "__main__":
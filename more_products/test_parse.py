@@ -1,31 +1,64 @@
-import csv
 import os.path
 
 import pytest
 
-from more_products.parse import get_all_products, Product
+from selenium.common import NoSuchElementException
 
+from common.golden import assert_csv_matches
+from common.memory import MemoryMonitor
+from more_products import parse
+from more_products.parse import get_all_products, show_all_products
 
-@pytest.fixture(scope="session", autouse=True)
-def run_scraper():
-    get_all_products()
 
+@pytest.fixture(scope="session")
+def run_scraper(tmp_path_factory):
+    get_all_products(changefeed_path=str(tmp_path_factory.mktemp("changefeed")))
 
+
+@pytest.mark.browser
+@pytest.mark.usefixtures("run_scraper")
 @pytest.mark.parametrize("page", ["home", "computers", "phones"])
 def test_random_pages_csv_file_is_created(page):
     assert os.path.exists(f"{page}.csv")
 
 
+@pytest.mark.browser
+@pytest.mark.golden
+@pytest.mark.usefixtures("run_scraper")
 @pytest.mark.parametrize("page", ["laptops", "tablets", "touch"])
 def test_static_products_are_correct(page):
-    with open(f"correct_{page}.csv", "r") as correct_file, open(f"{page}.csv", "r") as result_file:
-        correct_reader = csv.reader(correct_file)
-        result_reader = csv.reader(result_file)
+    assert_csv_matches(f"correct_{page}.csv", f"{page}.csv")
+
+
+class MoreButton:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def is_displayed(self):
+        return self.driver.clicks < self.driver.loads
+
+    def click(self):
+        self.driver.clicks += 1
+
+
+class LoadMoreDriver:
+    """A listing whose "more" button loads items ``loads`` times."""
+
+    def __init__(self, loads):
+        self.loads = loads
+        self.clicks = 0
+
+    def find_element(self, by, name):
+        if name == "ecomerce-items-scroll-more":
+            return MoreButton(self)
+        raise NoSuchElementException(name)
+
 
-        for correct_row in correct_reader:
-            result_row = next(result_reader)
+def test_memory_is_sampled_while_items_load(monkeypatch):
+    monkeypatch.setattr(parse.time, "sleep", lambda seconds: None)
+    monitor = MemoryMonitor(every=3)
 
-            correct_product = Product(*correct_row)
-            result_product = Product(*result_row)
+    show_all_products(LoadMoreDriver(loads=7), monitor)
+    monitor.stop()
 
-            assert correct_product == result_product
+    assert [sample.steps for sample in monitor.samples] == [3, 6, 7]
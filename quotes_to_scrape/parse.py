@@ -1,13 +1,24 @@
+from __future__ import annotations
+
 import csv
+import os
+from typing import TYPE_CHECKING, Optional, Tuple
 from urllib.parse import urljoin
 
-import requests
-
 from dataclasses import dataclass, fields, astuple
 
-from bs4 import BeautifulSoup
+from common.failures import FAILURES, gather_with_retries
+from common.fetch import AsyncFetcher, run_sync
+from common.output import OUTPUT_FORMAT, write_items
+from common.soup import Region, make_soup
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
-BASE_URL = "https://quotes.toscrape.com/"
+BASE_URL = os.environ.get("QUOTES_BASE_URL", "https://quotes.toscrape.com/")
+
+# Only these subtrees are built into the soup
+PARSE_REGION = Region(class_=["quote", "pager"])
 
 
 @dataclass
@@ -28,15 +39,38 @@ def parse_single_quote(quote_soup: BeautifulSoup) -> Quote:
     )
 
 
-def get_page_quotes(url: str, quotes: list[Quote]):
-    page = requests.get(url).content
-    soup = BeautifulSoup(page, "html.parser")
-
-    quotes.extend([parse_single_quote(quote_soup) for quote_soup in soup.select(".quote")])
+def parse_page_quotes(page: bytes) -> Tuple[list[Quote], Optional[str]]:
+    soup = make_soup(page, PARSE_REGION)
 
     next_page = soup.select_one(".pager > .next > a")
-    if next_page is not None:
-        get_page_quotes(urljoin(BASE_URL, next_page["href"]), quotes)
+    next_href = next_page["href"] if next_page is not None else None
+
+    quotes = FAILURES.isolate(parse_single_quote, soup.select(".quote"))
+    return [quote for quote in quotes if quote is not None], next_href
+
+
+async def fetch_page_quotes(fetcher: AsyncFetcher, url: str, quotes: list[Quote]):
+    # Each page only links to the next one, so pages are fetched in turn
+    while url is not None:
+        pages = await gather_with_retries(fetcher.get, [url])
+        if url not in pages:  # dead-lettered, the quotes so far are kept
+            break
+
+        page_quotes, next_href = await fetcher.parse(parse_page_quotes, pages[url])
+        quotes.extend(page_quotes)
+
+        url = urljoin(BASE_URL, next_href) if next_href is not None else None
+
+
+async def fetch_all_quotes(fetcher: AsyncFetcher) -> list[Quote]:
+    quotes = []
+    await fetch_page_quotes(fetcher, BASE_URL, quotes)
+
+    return quotes
+
+
+def get_page_quotes(url: str, quotes: list[Quote]):
+    run_sync(fetch_page_quotes, url, quotes)
 
 
 def get_all_quotes() -> list[Quote]:
@@ -56,7 +90,11 @@ def write_quotes_to_csv(output_csv_path: str, quotes: list[Quote]):
 def main(output_csv_path: str) -> None:
     quotes = get_all_quotes()
     print(quotes)
-    write_quotes_to_csv(output_csv_path, quotes)
+
+    if OUTPUT_FORMAT == "csv":
+        write_quotes_to_csv(output_csv_path, quotes)
+    else:
+        write_items(os.path.splitext(output_csv_path)[0], Quote, quotes, OUTPUT_FORMAT)
 
 
 if __name__ == "__main__":
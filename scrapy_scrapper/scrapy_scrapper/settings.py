@@ -7,17 +7,35 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import sys
+from pathlib import Path
+
+# Shared crawl components live in the top-level ``common`` package
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+# The production profile shared by both projects: robots.txt, AutoThrottle,
+# the SQLite HTTP cache (see common.scrapy_settings); the settings below
+# override it
+from common.scrapy_settings import *  # noqa: E402,F401,F403
+
 BOT_NAME = "scrapy_scrapper"
 
 SPIDER_MODULES = ["scrapy_scrapper.spiders"]
 NEWSPIDER_MODULE = "scrapy_scrapper.spiders"
 
 
+# Deduplicate canonical urls (trailing slash, query order, ?page=1) with a
+# Bloom filter instead of an unbounded set of fingerprints
+REQUEST_FINGERPRINTER_CLASS = "common.scrapy_ext.CanonicalRequestFingerprinter"
+DUPEFILTER_CLASS = "common.scrapy_ext.BloomDupeFilter"
+BLOOM_CAPACITY = 1_000_000
+BLOOM_ERROR_RATE = 0.001
+
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
 # USER_AGENT = 'scrapy_scrapper (+http://www.yourdomain.com)'
 
 # Obey robots.txt rules
-ROBOTSTXT_OBEY = False
+ROBOTSTXT_OBEY = True
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
 # CONCURRENT_REQUESTS = 32
@@ -30,6 +48,25 @@ ROBOTSTXT_OBEY = False
 # CONCURRENT_REQUESTS_PER_DOMAIN = 16
 # CONCURRENT_REQUESTS_PER_IP = 16
 
+# No SHARD_CALLBACKS, so python -m common.sharding refuses this project: the
+# products are read from the listing pages that every shard crawls, and their
+# detail pages are rendered in Chrome rather than requested through Scrapy
+
+# Failed pages and items go to a dead-letter file instead of only the log
+# (see common.scrapy_ext.DeadLetterMiddleware); after FAILURE_BUDGET of them
+# the spider is closed. Failed downloads are retried first: a retried request
+# is rescheduled with a lower priority, so it waits behind the fresh ones.
+DEAD_LETTER_PATH = "dead_letters.jl"
+FAILURE_BUDGET = 100
+RETRY_TIMES = 3
+RETRY_HTTP_CODES = [500, 502, 503, 504, 522, 524, 408, 429]
+RETRY_PRIORITY_ADJUST = -1
+
+# Keep the raw pages in a compressed archive (-s ARCHIVE_DIR=archive), and
+# re-run changed parsers over it without the network (-s REPLAY_DIR=archive)
+ARCHIVE_DIR = None
+REPLAY_DIR = None
+
 # Disable cookies (enabled by default)
 # COOKIES_ENABLED = False
 
@@ -44,45 +81,46 @@ ROBOTSTXT_OBEY = False
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-# SPIDER_MIDDLEWARES = {
-#    'scrapy_scrapper.middlewares.ScrapyScrapperSpiderMiddleware': 543,
-# }
+SPIDER_MIDDLEWARES = {
+    #    'scrapy_scrapper.middlewares.ScrapyScrapperSpiderMiddleware': 543,
+    "common.scrapy_ext.DeadLetterMiddleware": 60,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-# DOWNLOADER_MIDDLEWARES = {
-#    'scrapy_scrapper.middlewares.ScrapyScrapperDownloaderMiddleware': 543,
-# }
+DOWNLOADER_MIDDLEWARES = {
+    #    'scrapy_scrapper.middlewares.ScrapyScrapperDownloaderMiddleware': 543,
+    "common.scrapy_ext.DeadLetterMiddleware": 540,
+    "common.scrapy_ext.ArchiveDownloaderMiddleware": 580,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-# EXTENSIONS = {
-#    'scrapy.extensions.telnet.TelnetConsole': None,
-# }
+EXTENSIONS = {
+    #    'scrapy.extensions.telnet.TelnetConsole': None,
+    "common.scrapy_ext.MemoryMonitorExtension": 500,
+}
+# Log the memory of the run every MEMORY_SAMPLE_EVERY responses (0 for
+# never), with the Python heap traced too if MEMORY_TRACEMALLOC. Chrome is
+# restarted once it passes BROWSER_MAX_RSS_MB, or after DRIVER_MAX_PAGES
+# detail pages (0 for no limit)
+MEMORY_SAMPLE_EVERY = 100
+MEMORY_TRACEMALLOC = False
+BROWSER_MAX_RSS_MB = 2048
+DRIVER_MAX_PAGES = 0
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-# ITEM_PIPELINES = {
-#    'scrapy_scrapper.pipelines.ScrapyScrapperPipeline': 300,
-# }
-
-# Enable and configure the AutoThrottle extension (disabled by default)
+ITEM_PIPELINES = {
+    #    'scrapy_scrapper.pipelines.ScrapyScrapperPipeline': 300,
+    "scrapy_scrapper.pipelines.ProductsSQLitePipeline": 800,
+}
+# Upsert the products into SQLite, with a price snapshot per run; off unless a
+# path is given (scrapy crawl products -s SQLITE_PATH=products.sqlite)
+SQLITE_PATH = None
+SQLITE_BATCH_SIZE = 1000
+
+# AutoThrottle and the HTTP cache are configured by the production profile;
+# e.g. -s HTTPCACHE_ENABLED=False crawls without the cache
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-# AUTOTHROTTLE_ENABLED = True
-# The initial download delay
-# AUTOTHROTTLE_START_DELAY = 5
-# The maximum download delay to be set in case of high latencies
-# AUTOTHROTTLE_MAX_DELAY = 60
-# The average number of requests Scrapy should be sending in parallel to
-# each remote server
-# AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
-# Enable showing throttling stats for every response received:
-# AUTOTHROTTLE_DEBUG = False
-
-# Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-# HTTPCACHE_ENABLED = True
-# HTTPCACHE_EXPIRATION_SECS = 0
-# HTTPCACHE_DIR = 'httpcache'
-# HTTPCACHE_IGNORE_HTTP_CODES = []
-# HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
@@ -1,41 +1,61 @@
+import os
 from typing import Dict
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit
 
 import scrapy
 from scrapy import Selector
 from scrapy.http import Response
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 
+from common.browser import make_driver
+from common.dom import BATCHED_EXTRACTION, collect_swatch_prices
+from common.failures import FAILURES
+from common.identity import product_key
+from common.memory import RecyclingDriver
+from common.normalize import extract_records, parse_price, prices as normalize_prices
+
+BASE_URL = os.environ.get("WEBSCRAPER_BASE_URL", "https://webscraper.io/")
+
+PRODUCT_SCHEMA = {
+    "title": "text",
+    "description": "text",
+    "price": "price",
+    "rating": "count",
+    "num_of_reviews": "count",
+}
+
 
 class ProductsSpider(scrapy.Spider):
     name = "products"
-    allowed_domains = ["webscraper.io"]
-    start_urls = [
-        "https://webscraper.io/test-sites/e-commerce/static/computers/laptops/"
-    ]
+    allowed_domains = [urlsplit(BASE_URL).hostname]
+    start_urls = [urljoin(BASE_URL, "test-sites/e-commerce/static/computers/laptops/")]
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.driver = webdriver.Chrome()
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # detail pages are rendered in Chrome, restarted once it grows too big
+        spider.browser = RecyclingDriver(
+            make_driver,
+            max_rss=crawler.settings.getint("BROWSER_MAX_RSS_MB") * 2 ** 20,
+            max_pages=crawler.settings.getint("DRIVER_MAX_PAGES"),
+        )
+        return spider
 
     def close(self, reason):
-        self.driver.close()
+        self.browser.close()
 
     def parse(self, response: Response, **kwargs):
-        for product in response.css(".thumbnail"):
-            yield {
-                "title": product.css(".title::attr(title)").get(),
-                "description": product.css(".description::text").get(),
-                "price": float(product.css(".price::text").get().replace("$", "")),
-                "rating": int(product.css("p[data-rating]::attr(data-rating)").get()),
-                "num_of_reviews": int(
-                    product.css(".ratings > p.pull-right::text").get().split()[0]
-                ),
-                "additional_info": {
-                    "hdd_prices": self._parse_hdd_block_prices(response, product)
-                },
-            }
+        # a malformed product is dead-lettered and skipped, not the whole page;
+        # detail pages are only rendered for the products that are not
+        thumbnails = response.css(".thumbnail")
+        rows = extract_records(
+            thumbnails, lambda product: self._product_fields(response, product), PRODUCT_SCHEMA
+        )
+        products = FAILURES.isolate(
+            lambda product_row: self._parse_product(response, *product_row),
+            [(product, row) for product, row in zip(thumbnails, rows) if row is not None],
+        )
+        yield from (product for product in products if product is not None)
 
         next_page = response.css(".pagination > li")[-1].css("a::attr(href)")
         yield from response.follow_all(next_page)
@@ -47,23 +67,51 @@ class ProductsSpider(scrapy.Spider):
         #     # same, but shorter
         #     yield response.follow(next_page, callback=self.parse)
 
+    def _product_fields(self, response: Response, product: Selector) -> dict:
+        href = product.css(".title::attr(href)").get()
+        if href is None:
+            raise ValueError("Product without a detail link")
+
+        return {
+            "url": product_key(response.url, href),
+            "title": product.css(".title::attr(title)").get(),
+            "description": product.css(".description::text").get(),
+            "price": product.css(".price::text").get(),
+            "rating": product.css("p[data-rating]::attr(data-rating)").get(),
+            "num_of_reviews": product.css(".ratings > p.pull-right::text").get(),
+        }
+
+    def _parse_product(self, response: Response, product: Selector, row: dict) -> dict:
+        return {
+            **row,
+            "additional_info": {
+                "hdd_prices": self._parse_hdd_block_prices(response, product)
+            },
+        }
+
     def _parse_hdd_block_prices(
         self, response: Response, product: Selector
     ) -> Dict[str, float]:
         prices = {}
         detailed_url = response.urljoin(product.css(".title::attr(href)").get())
 
-        self.driver.get(detailed_url)
-        swatches = self.driver.find_element(By.CLASS_NAME, "swatches")
-        buttons = swatches.find_elements(By.TAG_NAME, "button")
+        with self.browser.page() as driver:
+            driver.get(detailed_url)
 
-        for button in buttons:
-            if not button.get_property("disabled"):
-                button.click()
-                prices[button.get_property("value")] = float(
-                    self.driver.find_element(By.CLASS_NAME, "price").text.replace(
-                        "$", ""
-                    )
+            if BATCHED_EXTRACTION:
+                swatch_prices = collect_swatch_prices(driver)
+                return dict(
+                    zip(swatch_prices, normalize_prices(list(swatch_prices.values())).tolist())
                 )
 
+            swatches = driver.find_element(By.CLASS_NAME, "swatches")
+            buttons = swatches.find_elements(By.TAG_NAME, "button")
+
+            for button in buttons:
+                if not button.get_property("disabled"):
+                    button.click()
+                    prices[button.get_property("value")] = parse_price(
+                        driver.find_element(By.CLASS_NAME, "price").text
+                    )
+
         return prices
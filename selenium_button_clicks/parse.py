@@ -1,22 +1,35 @@
-import csv
+from __future__ import annotations
+
 import logging
 import os
-import sys
-from dataclasses import dataclass, astuple, fields
-from typing import List, Dict, Optional
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.remote.webdriver import WebDriver
+from common.browser import make_driver
+from common.dom import BATCHED_EXTRACTION, collect_swatch_prices
+from common.failures import FAILURES
+from common.identity import ProductCache, parse_unknown, product_key
+from common.logs import configure_logging
+from common.normalize import (
+    extract_records, parse_price, prices as normalize_prices, reporting_run
+)
+from common.output import OUTPUT_FORMAT, write_items
+from common.pagination import Pagination, read_pagination, walk_pages
+from common.soup import Region, make_soup
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+    from selenium.webdriver.remote.webdriver import WebDriver
 
 
-BASE_URL = "https://webscraper.io/"
+BASE_URL = os.environ.get("WEBSCRAPER_BASE_URL", "https://webscraper.io/")
 HOME_URL = urljoin(BASE_URL, "test-sites/e-commerce/static/")
 DATA_PATH = "products/"
+DEAD_LETTER_FILE = "dead_letters.jl"
 
+# Only these subtrees are built into the soup
+PARSE_REGION = Region(class_=["thumbnail", "pagination"])
 
 PAGES = {
     # "home": HOME_URL,
@@ -25,15 +38,6 @@ PAGES = {
     # "phones": urljoin(HOME_URL, "phones/touch"),
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(levelname)8s]:  %(message)s",
-    handlers=[
-        logging.FileHandler(os.path.join(DATA_PATH, "parser.log")),
-        logging.StreamHandler(sys.stdout),
-    ],
-)
-
 _driver: Optional[WebDriver] = None
 
 
@@ -56,7 +60,13 @@ class Product:
     additional_info: dict
 
 
-PRODUCT_FIELDS = [field.name for field in fields(Product)]
+PRODUCT_SCHEMA = {
+    "title": "text",
+    "description": "text",
+    "price": "price",
+    "rating": "count",
+    "num_of_reviews": "count",
+}
 
 
 def parse_hdd_block_prices(product_soup: BeautifulSoup) -> Dict[str, float]:
@@ -65,88 +75,149 @@ def parse_hdd_block_prices(product_soup: BeautifulSoup) -> Dict[str, float]:
 
     driver = get_driver()
     driver.get(detailed_url)
+
+    if BATCHED_EXTRACTION:
+        swatch_prices = collect_swatch_prices(driver)
+        return dict(zip(swatch_prices, normalize_prices(list(swatch_prices.values())).tolist()))
+
+    from selenium.webdriver.common.by import By
+
     swatches = driver.find_element(By.CLASS_NAME, "swatches")
     buttons = swatches.find_elements(By.TAG_NAME, "button")
 
     for button in buttons:
         if not button.get_property("disabled"):
             button.click()
-            prices[button.get_property("value")] = float(
-                driver.find_element(By.CLASS_NAME, "price").text.replace("$", "")
+            prices[button.get_property("value")] = parse_price(
+                driver.find_element(By.CLASS_NAME, "price").text
             )
 
     return prices
 
 
-def parse_single_product(product_soup: BeautifulSoup) -> Product:
-    hdd_prices = parse_hdd_block_prices(product_soup)
+def raw_product_fields(product_soup: BeautifulSoup) -> Dict[str, str]:
+    return {
+        "title": product_soup.select_one(".title")["title"],
+        "description": product_soup.select_one(".description").text,
+        "price": product_soup.select_one(".price").text,
+        "rating": product_soup.select_one("p[data-rating]")["data-rating"],
+        "num_of_reviews": product_soup.select_one(".ratings > p.pull-right").text,
+    }
 
-    return Product(
-        title=product_soup.select_one(".title")["title"],
-        description=product_soup.select_one(".description").text,
-        price=float(product_soup.select_one(".price").text.replace("$", "")),
-        rating=int(product_soup.select_one("p[data-rating]")["data-rating"]),
-        num_of_reviews=int(
-            product_soup.select_one(".ratings > p.pull-right").text.split()[0]
-        ),
-        additional_info={"hdd_prices": hdd_prices},
-    )
 
+def product_soup_key(product_soup: BeautifulSoup) -> str:
+    return product_key(BASE_URL, product_soup.select_one(".title")["href"])
 
-def get_num_of_pages(page_soup: BeautifulSoup) -> int:
-    pagination = page_soup.select_one(".pagination")
 
-    if pagination is None:
-        return 1
+def parse_product_details(soup_and_row: Tuple[BeautifulSoup, Dict]) -> Product:
+    product_soup, row = soup_and_row
+    return Product(**row, additional_info={"hdd_prices": parse_hdd_block_prices(product_soup)})
+
+
+def parse_products(product_soups: List[BeautifulSoup]) -> List[Optional[Product]]:
+    """Products of a page, None for malformed ones (dead-lettered).
+
+    Detail pages are only visited for the products that are not.
+    """
+    rows = extract_records(product_soups, raw_product_fields, PRODUCT_SCHEMA)
+    products = iter(FAILURES.isolate(
+        parse_product_details,
+        [(product_soup, row) for product_soup, row in zip(product_soups, rows) if row is not None],
+    ))
+
+    return [None if row is None else next(products) for row in rows]
 
-    return int(pagination.select("li")[-2].text)
 
+def parse_single_product(product_soup: BeautifulSoup) -> Optional[Product]:
+    return parse_products([product_soup])[0]
 
-def get_single_page_products(page_soup: BeautifulSoup) -> List[Product]:
+
+def get_num_of_pages(page_soup: BeautifulSoup) -> int:
+    """Pages of the listing; the highest linked so far if the last is not shown."""
+    pagination = read_pagination(page_soup)
+    return pagination.last_page or pagination.highest_page
+
+
+def get_single_page_products(
+    page_soup: BeautifulSoup, cache: Optional[ProductCache] = None
+) -> List[Product]:
+    """Products of the page; detail pages of cached products are not visited."""
+    cache = ProductCache() if cache is None else cache
     products = page_soup.select(".thumbnail")
-    return [parse_single_product(product_soup=product) for product in products]
+    keys = FAILURES.isolate(product_soup_key, products)
+    entries = parse_unknown(keys, products, cache.known_keys(), parse_products)
 
+    return [cache.add(key, product) for key, product in entries]
 
-def get_category_products(url: str) -> List[Product]:
-    category_page = requests.get(url)
-    soup = BeautifulSoup(category_page.content, "html.parser")
 
-    num_pages = get_num_of_pages(soup)
+def get_listing_page(
+    url: str, page: int, cache: Optional[ProductCache] = None
+) -> Tuple[Pagination, List[Product]]:
+    import requests
 
-    all_products = get_single_page_products(soup)
+    logging.debug(f"Parsing page #{page}")
+    response = requests.get(url, params={"page": page} if page > 1 else None)
+    response.raise_for_status()
+    soup = make_soup(response.content, PARSE_REGION)
+    try:
+        pagination = read_pagination(soup, page, len(soup.select(".thumbnail")))
+        return pagination, get_single_page_products(soup, cache)
+    finally:
+        soup.decompose()
 
-    for page in range(2, num_pages + 1):
-        logging.debug(f"Parsing page #{page}")
-        page = requests.get(url, params={"page": page})
-        soup = BeautifulSoup(page.content, "html.parser")
-        all_products.extend(get_single_page_products(soup))
-        break
+
+def get_category_products(url: str, cache: Optional[ProductCache] = None) -> List[Product]:
+    cache = ProductCache() if cache is None else cache
+    # one page at a time: detail pages are visited in the one browser
+    first, all_products = get_listing_page(url, 1, cache)
+
+    for _, page_products in walk_pages(lambda page: get_listing_page(url, page, cache), first):
+        all_products.extend(page_products)
 
     return all_products
 
 
-def write_products_to_csv(page: str, products: List[Product]):
-    with open(
-        os.path.join(
-            DATA_PATH,
-            f"{page}.csv",
-        ),
-        "w",
-    ) as f:
-        writer = csv.writer(f)
-        writer.writerow(PRODUCT_FIELDS)
-        writer.writerows([astuple(product) for product in products])
+def write_products(page: str, products: List[Product], keys: Optional[List[str]] = None) -> None:
+    write_items(os.path.join(DATA_PATH, page), Product, products, OUTPUT_FORMAT, keys)
+
+
+def get_pages_products(cache: Optional[ProductCache] = None) -> Dict[str, List[Product]]:
+    """Products of every page in ``PAGES``, with its own browser."""
+    cache = ProductCache() if cache is None else cache
+
+    with make_driver() as chrome_driver:
+        set_driver(chrome_driver)
+        return get_categories_products(cache)
+
+
+def get_categories_products(cache: ProductCache) -> Dict[str, List[Product]]:
+    """Products per page; a category that failed is dead-lettered and left out."""
+    categories_products = FAILURES.isolate(
+        lambda page_url: get_category_products(page_url, cache), PAGES.values(), "page"
+    )
+    return {
+        page: category_products
+        for page, category_products in zip(PAGES, categories_products)
+        if category_products is not None
+    }
 
 
 def get_all_products():
-    for page, page_url in PAGES.items():
-        category_products = get_category_products(page_url)
-        logging.info(f"Successfully parsed: {page} {category_products}")
-        write_products_to_csv(page, category_products)
+    cache = ProductCache()
+
+    with reporting_run("products"):
+        for page, category_products in get_categories_products(cache).items():
+            logging.info(f"Successfully parsed: {page} {category_products}")
+            write_products(page, category_products, cache.keys_of(category_products))
+
+        logging.info(f"Unique products: {len(cache)}, parsed once and reused: {cache.hits}")
 
 
 def main():
-    with webdriver.Chrome() as chrome_driver:
+    configure_logging(DATA_PATH)
+    if FAILURES.path is None:
+        FAILURES.configure(os.path.join(DATA_PATH, DEAD_LETTER_FILE), FAILURES.budget)
+    with make_driver() as chrome_driver:
         set_driver(chrome_driver)
         get_all_products()
 
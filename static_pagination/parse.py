@@ -1,19 +1,33 @@
-import csv
+from __future__ import annotations
+
 import logging
 import os
-import sys
-from dataclasses import dataclass, fields, astuple
-from typing import List, Dict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Dict, Collection, Optional, Tuple
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
+from common.changefeed import CHANGEFEED, publish as publish_changes
+from common.failures import FAILURES, gather_with_retries
+from common.fetch import AsyncFetcher, run_sync
+from common.identity import ProductCache, parse_unknown, product_key
+from common.normalize import extract_records, reporting_run
+from common.logs import configure_logging
+from common.output import OUTPUT_FORMAT, write_items
+from common.pagination import Pagination, fetch_pages, read_pagination
+from common.soup import Region, make_soup
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
 
-BASE_URL = "https://webscraper.io/"
+BASE_URL = os.environ.get("WEBSCRAPER_BASE_URL", "https://webscraper.io/")
 HOME_URL = urljoin(BASE_URL, "test-sites/e-commerce/static/")
 DATA_PATH = "products/"
+COMBINED_PAGE = "all_products"  # every product once, across categories
+DEAD_LETTER_FILE = "dead_letters.jl"
 
+# Only these subtrees are built into the soup
+PARSE_REGION = Region(class_=["thumbnail", "pagination"])
 
 PAGES = {
     "home": HOME_URL,
@@ -22,15 +36,6 @@ PAGES = {
     "phones": urljoin(HOME_URL, "phones/touch"),
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(levelname)8s]:  %(message)s",
-    handlers=[
-        logging.FileHandler(os.path.join(DATA_PATH, "parser.log")),
-        logging.StreamHandler(sys.stdout),
-    ],
-)
-
 
 @dataclass
 class Product:
@@ -41,76 +46,155 @@ class Product:
     num_of_reviews: int
 
 
-PRODUCT_FIELDS = [field.name for field in fields(Product)]
+ProductEntry = Tuple[str, Optional[Product]]  # key, None when already known
 
+PRODUCT_SCHEMA = {
+    "title": "text",
+    "description": "text",
+    "price": "price",
+    "rating": "count",
+    "num_of_reviews": "count",
+}
 
-def parse_single_product(product_soup: BeautifulSoup) -> Product:
-    return Product(
-        title=product_soup.select_one(".title")["title"],
-        description=product_soup.select_one(".description").text,
-        price=float(product_soup.select_one(".price").text.replace("$", "")),
-        rating=int(product_soup.select_one("p[data-rating]")["data-rating"]),
-        num_of_reviews=int(
-            product_soup.select_one(".ratings > p.pull-right").text.split()[0]
-        ),
-    )
 
+def raw_product_fields(product_soup: BeautifulSoup) -> Dict[str, str]:
+    return {
+        "title": product_soup.select_one(".title")["title"],
+        "description": product_soup.select_one(".description").text,
+        "price": product_soup.select_one(".price").text,
+        "rating": product_soup.select_one("p[data-rating]")["data-rating"],
+        "num_of_reviews": product_soup.select_one(".ratings > p.pull-right").text,
+    }
 
-def get_num_of_pages(page_soup: BeautifulSoup) -> int:
-    pagination = page_soup.select_one(".pagination")
 
-    if pagination is None:
-        return 1
+def product_soup_key(product_soup: BeautifulSoup) -> str:
+    return product_key(BASE_URL, product_soup.select_one(".title")["href"])
+
+
+def parse_products(product_soups: List[BeautifulSoup]) -> List[Optional[Product]]:
+    """Products of a page at once, None for malformed ones (dead-lettered)."""
+    rows = extract_records(product_soups, raw_product_fields, PRODUCT_SCHEMA)
+    return [None if row is None else Product(**row) for row in rows]
+
 
-    return int(pagination.select("li")[-2].text)
+def parse_single_product(product_soup: BeautifulSoup) -> Optional[Product]:
+    return parse_products([product_soup])[0]
+
+
+def get_num_of_pages(page_soup: BeautifulSoup) -> int:
+    """Pages of the listing; the highest linked so far if the last is not shown."""
+    pagination = read_pagination(page_soup)
+    return pagination.last_page or pagination.highest_page
 
 
 def get_single_page_products(page_soup: BeautifulSoup) -> List[Product]:
-    products = page_soup.select(".thumbnail")
-    return [parse_single_product(product_soup=product) for product in products]
+    products = parse_products(page_soup.select(".thumbnail"))
+    return [product for product in products if product is not None]
 
 
-def get_category_products(url: str) -> List[Product]:
-    category_page = requests.get(url)
-    soup = BeautifulSoup(category_page.content, "html.parser")
+def get_single_page_entries(
+    page_soup: BeautifulSoup, known_keys: Collection[str] = frozenset()
+) -> List[ProductEntry]:
+    product_soups = page_soup.select(".thumbnail")
+    keys = FAILURES.isolate(product_soup_key, product_soups)
+    return parse_unknown(keys, product_soups, known_keys, parse_products)
+
+
+def parse_page_entries(
+    content: bytes, known_keys: Collection[str] = frozenset(), page: int = 1
+) -> Tuple[Pagination, List[ProductEntry]]:
+    soup = make_soup(content, PARSE_REGION)
+    pagination = read_pagination(soup, page, len(soup.select(".thumbnail")))
+    return pagination, get_single_page_entries(soup, known_keys)
+
+
+def parse_pagination(content: bytes, page: int = 1) -> Pagination:
+    soup = make_soup(content, PARSE_REGION)
+    return read_pagination(soup, page, len(soup.select(".thumbnail")))
 
-    num_pages = get_num_of_pages(soup)
 
-    all_products = get_single_page_products(soup)
+def parse_page_products(content: bytes) -> List[Product]:
+    return get_single_page_products(make_soup(content, PARSE_REGION))
 
-    for page in range(2, num_pages + 1):
-        logging.debug(f"Parsing page #{page}")
-        page = requests.get(url, params={"page": page})
-        soup = BeautifulSoup(page.content, "html.parser")
-        all_products.extend(get_single_page_products(soup))
+
+async def fetch_page_products(
+    fetcher: AsyncFetcher, url: str, page: int, cache: ProductCache
+) -> Tuple[Pagination, List[Product]]:
+    logging.debug(f"Parsing page #{page}")
+    content = await fetcher.get(url, params={"page": page} if page > 1 else None)
+    # workers in other processes would get a copy of the keys with every page:
+    # they parse every product instead, and the cache keeps the first copy
+    known_keys = frozenset() if fetcher.parses_in_processes else cache.known_keys()
+    pagination, entries = await fetcher.parse(parse_page_entries, content, known_keys, page)
+
+    return pagination, [cache.add(key, product) for key, product in entries]
+
+
+async def fetch_category_products(
+    fetcher: AsyncFetcher, url: str, cache: Optional[ProductCache] = None
+) -> List[Product]:
+    cache = ProductCache() if cache is None else cache
+    first, all_products = await fetch_page_products(fetcher, url, 1, cache)
+
+    # the pages after the first are prefetched even where the widget hides the
+    # last one; pages that keep failing are retried, then skipped
+    pages_products = await fetch_pages(
+        lambda page: fetch_page_products(fetcher, url, page, cache), first
+    )
+    for page_products in pages_products.values():
+        all_products.extend(page_products)
 
     return all_products
 
 
-def write_products_to_csv(page: str, products: List[Product]):
-    with open(
-        os.path.join(
-            DATA_PATH,
-            f"{page}.csv",
-        ),
-        "w",
-    ) as f:
-        writer = csv.writer(f)
-        writer.writerow(PRODUCT_FIELDS)
-        writer.writerows([astuple(product) for product in products])
+async def fetch_all_products(
+    fetcher: AsyncFetcher, cache: Optional[ProductCache] = None
+) -> Dict[str, List[Product]]:
+    """Products per category; a category whose first page keeps failing is left out."""
+    cache = ProductCache() if cache is None else cache
+    return await gather_with_retries(
+        lambda page: fetch_category_products(fetcher, PAGES[page], cache), list(PAGES)
+    )
+
+
+def get_category_products(url: str) -> List[Product]:
+    return run_sync(fetch_category_products, url)
+
+
+def write_products(page: str, products: List[Product], keys: Optional[List[str]] = None) -> None:
+    write_items(os.path.join(DATA_PATH, page), Product, products, OUTPUT_FORMAT, keys)
 
 
-def get_all_products():
-    for page, page_url in PAGES.items():
-        category_products = get_category_products(page_url)
+def write_all_products(
+    pages: Dict[str, List[Product]], cache: ProductCache, combined: bool = False
+) -> None:
+    """Write every category, the combined page and the changes of the products in ``cache``."""
+    for page, category_products in pages.items():
         logging.info(f"Successfully parsed: {page} {category_products}")
-        write_products_to_csv(page, category_products)
+        write_products(page, category_products, cache.keys_of(category_products))
+
+    logging.info(f"Unique products: {len(cache)}, parsed once and reused: {cache.hits}")
+    if combined:
+        write_products(COMBINED_PAGE, cache.products(), list(cache.known_keys()))
+    if CHANGEFEED:
+        changes = publish_changes(cache.items(), DATA_PATH, complete=not FAILURES)
+        logging.info(f"Changes since the last run: {dict(changes)}")
+
+
+def get_all_products(combined: bool = False):
+    cache = ProductCache()
+
+    with reporting_run("products"):
+        write_all_products(run_sync(fetch_all_products, cache), cache, combined)
 
 
 def main():
     # 1. Check API - does not exists
     # 2. CSS-selectors
     # 3. Attrs
+    configure_logging(DATA_PATH)
+    if FAILURES.path is None:
+        FAILURES.configure(os.path.join(DATA_PATH, DEAD_LETTER_FILE), FAILURES.budget)
     get_all_products()
 
 